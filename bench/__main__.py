@@ -0,0 +1,36 @@
+# Benchmark runner: python3 -m bench [--out results.json] [name ...]
+
+import argparse
+import contextlib
+import io
+import sys
+
+from bench import suite  # Registers the benchmarks
+from bench.harness import Results, benchmarks
+from sim.app import Simulator
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(prog='python3 -m bench', description='Run the host benchmarks on the simulator.')
+    parser.add_argument('names', nargs='*', help='benchmarks to run (default: all)')
+    parser.add_argument('--out', default='bench_results.json', help='JSON result file')
+    parser.add_argument('-v', '--verbose', action='store_true', help='show the output of the clock code')
+    args = parser.parse_args(argv)
+
+    results = Results()
+    for func in benchmarks():
+        if args.names and func.__name__ not in args.names:
+            continue
+        out = io.StringIO()
+        with contextlib.redirect_stdout(sys.stdout if args.verbose else out):
+            s = Simulator(keep_frames=False).boot()  # Fresh hardware and clock for each benchmark
+            func(s, results)
+        print('{:<14s} done'.format(func.__name__))
+
+    for name, entry in sorted(results.data.items()):
+        print('  {:<44s} {:>12} {}'.format(name, entry['value'], entry['unit']))
+    results.write(args.out)
+    print('Results written to', args.out)
+
+
+main(sys.argv[1:])
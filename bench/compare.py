@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+# compare.py Compare two benchmark result files
+# Usage: python3 bench/compare.py base.json new.json [--threshold 10]
+# Exits with status 1 if any cost got worse by more than threshold percent.
+# Informational results (kind 'info', e.g. text_layout.lines) are only printed.
+
+import argparse
+import json
+import sys
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description='Compare benchmark results.')
+    parser.add_argument('base')
+    parser.add_argument('new')
+    parser.add_argument('--threshold', type=float, default=10.0, help='regression threshold in percent')
+    args = parser.parse_args(argv)
+
+    with open(args.base) as f:
+        base = json.load(f)
+    with open(args.new) as f:
+        new = json.load(f)
+
+    print('base: {}  new: {}'.format(base['meta'].get('commit', '?'), new['meta'].get('commit', '?')))
+    regressions = 0
+    names = sorted(set(base['results']) | set(new['results']))
+    for name in names:
+        b = base['results'].get(name)
+        n = new['results'].get(name)
+        if b is None or n is None:
+            print('  {:<44s} {:>12} {:>12}'.format(name, b['value'] if b else '-', n['value'] if n else '-'))
+            continue
+        bv, nv = b['value'], n['value']
+        delta = (nv - bv) * 100.0 / bv if bv else 0.0
+        flag = ''
+        if delta > args.threshold and n.get('kind', 'cost') == 'cost':  # Costs: bigger is worse
+            flag = '  REGRESSION'
+            regressions += 1
+        print('  {:<44s} {:>12} {:>12} {:>+8.1f}% {}{}'.format(name, bv, nv, delta, n['unit'], flag))
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,39 @@
+# draw_primitives.py Device benchmark: nanogui shapes vs. gui.core.draw
+
+# Dial sized shapes drawn with the per pixel nanogui functions and with the
+# viper primitives on the raw MONO_HLSB buffer.
+# Run on the device with the lib folder installed:
+#   mpremote run bench/draw_primitives.py
+
+import framebuf
+from array import array
+from micropython import const
+from utime import ticks_us, ticks_diff
+
+from gui.core import draw, nanogui
+
+ROUNDS = 10
+W = const(200)
+H = const(200)
+
+buf = bytearray(W * H // 8)
+fb = framebuf.FrameBuffer(buf, W, H, framebuf.MONO_HLSB)
+hand = array('i', (96, 100, 100, 30, 104, 100, 100, 110))
+
+
+def _measure(label, func):
+    t = ticks_us()
+    for _ in range(ROUNDS):
+        func()
+    print('{:<24s} {:8.1f}us'.format(label, ticks_diff(ticks_us(), t) / ROUNDS))
+
+
+_measure('circle nanogui', lambda: nanogui.circle(fb, 100, 100, 90, 1, 2))
+_measure('circle viper', lambda: draw.circle(buf, W, H, 100, 100, 90, 1, 2))
+_measure('fillcircle nanogui', lambda: nanogui.fillcircle(fb, 100, 100, 40, 1))
+_measure('fillcircle viper', lambda: draw.fillcircle(buf, W, H, 100, 100, 40, 1))
+_measure('arc viper', lambda: draw.arc(buf, W, H, 100, 100, 90, 300, 60, 1, 2))
+_measure('line w1 framebuf', lambda: fb.line(100, 100, 150, 40, 1))
+_measure('line w1 viper', lambda: draw.line(buf, W, H, 100, 100, 150, 40, 1))
+_measure('line w4 viper', lambda: draw.line(buf, W, H, 100, 100, 150, 40, 1, 4))
+_measure('fill_poly viper', lambda: draw.fill_poly(buf, W, H, hand, 1))
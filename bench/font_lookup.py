@@ -0,0 +1,57 @@
+# font_lookup.py Device benchmark: font_to_py modules vs. binary font containers
+
+# Measures the time of get_ch() over the charset and the heap allocated by the
+# lookups, once for the font_to_py module and once for a BinFont of the same
+# font. Create the container modules first and copy them to the device (or
+# freeze them):
+#   python3 tools/font_to_bin.py lib/gui/fonts/arial_50.py lib/gui/fonts/arial_50_bin.py
+#   python3 tools/font_to_bin.py lib/gui/fonts/freesans20.py lib/gui/fonts/freesans20_bin.py
+# Run on the device with the lib folder installed:
+#   mpremote run bench/font_lookup.py
+
+import gc
+from utime import ticks_us, ticks_diff
+
+import gui.fonts.arial_50 as huge_font
+import gui.fonts.freesans20 as small_font
+from gui.core.binfont import BinFont
+
+ROUNDS = 10
+
+
+def _chars(font):
+    return [chr(c) for c in range(font.min_ch(), font.max_ch() + 1)]
+
+
+def _measure(label, font, chars):
+    get_ch = font.get_ch
+    for ch in chars:  # Warm up (BinFont caches the glyph tuples)
+        get_ch(ch)
+    gc.collect()
+    gc.disable()
+    free = gc.mem_free()
+    t = ticks_us()
+    for _ in range(ROUNDS):
+        for ch in chars:
+            get_ch(ch)
+    dt = ticks_diff(ticks_us(), t)
+    used = free - gc.mem_free()
+    gc.enable()
+    n = ROUNDS * len(chars)
+    print('{:<22s} {:6.1f}us/lookup {:6d} bytes allocated'.format(label, dt / n, used))
+
+
+def _load(label, module_name):
+    gc.collect()
+    free = gc.mem_free()
+    font = BinFont(__import__(module_name, None, None, ['DATA']).DATA)
+    print('{:<22s} {:6d} bytes heap to load'.format(label, free - gc.mem_free()))
+    return font
+
+
+for label, font, bin_name in (('arial_50', huge_font, 'gui.fonts.arial_50_bin'),
+                              ('freesans20', small_font, 'gui.fonts.freesans20_bin')):
+    chars = _chars(font)
+    binfont = _load(label + ' binfont', bin_name)
+    _measure(label + ' module', font, chars)
+    _measure(label + ' binfont', binfont, chars)
@@ -0,0 +1,44 @@
+# graph_scroll.py Device benchmark: TSequence vs. ScrollSequence per sample
+
+# Appends samples to a full 60 point chart of the Trend view size. TSequence
+# redraws the grid and every point, ScrollSequence scrolls its offscreen
+# buffer and draws the newest segment. The host simulator implements scroll()
+# and blit() in Python, so only the device shows the real cost.
+# Run on the device with the lib folder installed:
+#   mpremote run bench/graph_scroll.py
+
+import gc
+import framebuf
+from utime import ticks_us, ticks_diff
+
+import gui.fonts.freesans20 as small_font
+from gui.core.writer import Writer
+from gui.core.fplot import CartesianGraph, TSequence, ScrollSequence
+
+SIZE = 60
+ROUNDS = 20
+
+
+class _Device(framebuf.FrameBuffer):
+    def __init__(self):
+        self.width = 200
+        self.height = 200
+        super().__init__(bytearray(200 * 200 // 8), 200, 200, framebuf.MONO_HLSB)
+
+
+dev = _Device()
+wri = Writer(dev, small_font, False)
+for label, cls in (('TSequence', TSequence), ('ScrollSequence', ScrollSequence)):
+    graph = CartesianGraph(wri, 56, 10, height=52, width=180, fgcolor=1, bgcolor=0, bdcolor=False,
+                           gridcolor=1, xdivs=1, ydivs=1, xorigin=1, yorigin=0)
+    seq = cls(graph, 1, SIZE, yorigin=0, yexc=100)
+    for i in range(SIZE):
+        seq.add((i * 37) % 100)
+    gc.collect()
+    t = ticks_us()
+    for i in range(ROUNDS):
+        if cls is TSequence:
+            graph.show()  # TSequence draws over the previous curve
+        seq.add((i * 37) % 100)
+    dt = ticks_diff(ticks_us(), t)
+    print('{:<16s} {:8.1f}us/sample'.format(label, dt / ROUNDS))
@@ -0,0 +1,72 @@
+# harness.py Timing helpers and result collection for the host benchmarks
+
+import json
+import platform
+import subprocess
+import sys
+import time
+
+_benchmarks = []
+
+# Result kinds: compare.py flags an increase of a cost, an informational value
+# (a count describing the workload) is only printed
+COST = 'cost'
+INFO = 'info'
+
+
+def benchmark(func):
+    # Decorator registering a benchmark function taking (sim, results)
+    _benchmarks.append(func)
+    return func
+
+
+def benchmarks():
+    return list(_benchmarks)
+
+
+def time_us(func, repeat=20, warmup=2):
+    # Host time of func() in microseconds: (mean, min)
+    for _ in range(warmup):
+        func()
+    samples = []
+    for _ in range(repeat):
+        t = time.perf_counter_ns()
+        func()
+        samples.append(time.perf_counter_ns() - t)
+    return sum(samples) / len(samples) / 1000, min(samples) / 1000
+
+
+class Results:
+    def __init__(self):
+        self.data = {}
+
+    def add(self, name, value, unit, kind=COST, **extra):
+        entry = {'value': round(value, 3) if isinstance(value, float) else value, 'unit': unit, 'kind': kind}
+        entry.update(extra)
+        self.data[name] = entry
+
+    def add_timing(self, name, func, repeat=20, per=1):
+        # per: number of operations done by one call of func
+        mean, best = time_us(func, repeat)
+        self.add(name, mean / per, 'us', min=round(best / per, 3), repeat=repeat)
+
+    def to_json(self):
+        return {'meta': _meta(), 'results': self.data}
+
+    def write(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.to_json(), f, indent=2, sort_keys=True)
+            f.write('\n')
+
+
+def _meta():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = ''
+    return {
+        'commit': commit,
+        'python': '{} {}'.format(sys.implementation.name, platform.python_version()),
+        'machine': platform.machine(),
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
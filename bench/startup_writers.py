@@ -0,0 +1,52 @@
+# startup_writers.py Startup benchmark: per state Writers vs. shared Writers
+
+# Measures construction time and heap use of the Writers needed by the clock
+# states (two per state, 19 states) once with a Writer per state as before and
+# once through gui.core.fontreg.
+# Run on the device with the lib folder installed:
+#   mpremote run bench/startup_writers.py
+
+import gc
+from utime import ticks_us, ticks_diff
+
+from color_setup import ssd
+import gui.fonts.arial_50 as huge_font
+import gui.fonts.freesans20 as small_font
+from gui.core.writer import Writer
+from gui.core import fontreg
+
+N_STATES = 19
+
+
+def _measure(label, build):
+    gc.collect()
+    free = gc.mem_free()
+    t = ticks_us()
+    keep = build()
+    dt = ticks_diff(ticks_us(), t)
+    gc.collect()
+    used = free - gc.mem_free()
+    print('{:<16s} {:6d}us {:6d} bytes ({} writers)'.format(label, dt, used, len(keep)))
+    return keep
+
+
+def _per_state():
+    writers = []
+    for _ in range(N_STATES):
+        writers.append(Writer(ssd, small_font, False))
+        writers.append(Writer(ssd, huge_font, False))
+    return writers
+
+
+def _shared():
+    writers = []
+    for _ in range(N_STATES):
+        writers.append(fontreg.get_writer(ssd, small_font))
+        writers.append(fontreg.get_writer(ssd, huge_font))
+    return writers
+
+
+print('Writers for {} states:'.format(N_STATES))
+_measure('per state', _per_state)
+_measure('shared (cold)', _shared)
+_measure('shared (warm)', _shared)
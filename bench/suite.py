@@ -0,0 +1,351 @@
+# suite.py Render and refresh benchmarks run against the simulated hardware
+
+# Host timings (us) show relative costs of the Python code paths and are meant
+# to be compared between commits on the same machine. Virtual times (ms) are
+# the blocking waits on the simulated panel, as the device would see them.
+
+import time
+
+from bench.harness import INFO, benchmark
+from sim import vtime
+
+STATE_SETUP_TIMER_S = 90  # Timer value used for the countdown states
+
+
+def _prepare_clock_data(cd):
+    cd.active_timer = 1
+    cd.t1_duration = STATE_SETUP_TIMER_S
+    cd.t2_duration = STATE_SETUP_TIMER_S
+    cd.t3_duration = STATE_SETUP_TIMER_S
+
+
+@benchmark
+def boot(s, results):
+    # The simulator is booted by the runner, measure a second boot
+    from sim.app import Simulator
+    t = time.perf_counter_ns()
+    s2 = Simulator(keep_frames=False).boot()
+    results.add('boot.host', (time.perf_counter_ns() - t) / 1000, 'us')
+    results.add('boot.virtual', s2.now_ms, 'ms')
+
+
+@benchmark
+def prepare_view(s, results):
+    clock = s.clock
+    cd = clock._clock_data
+    names = list(clock._registered_states) + [n for n in clock._state_factories if n not in clock._registered_states]
+    for name in names:
+        _prepare_clock_data(cd)
+        state = clock._get_state(name)
+        state.initState(lambda: None)
+        results.add_timing('prepare_view.' + name, state.prepareView)
+        s.namespace['timers'].cancel(cd.active_timer)  # Started by TimerStart
+        s.namespace['alarm_timer'].deinit()  # Armed by TimerAlarm
+
+
+def _charset(font):
+    return ''.join(chr(c) for c in range(font.min_ch(), font.max_ch() + 1)
+                   if font.get_ch(chr(c))[2] and font.get_ch(chr(c)) != font.get_ch(chr(font.max_ch() + 1)))
+
+
+@benchmark
+def glyph_render(s, results):
+    import gui.fonts.arial_50 as huge_font
+    import gui.fonts.freesans20 as small_font
+    from gui.core.fontreg import get_writer
+    from gui.core.writer import Writer
+    ssd = s.namespace['ssd']
+    for label, font in (('arial_50', huge_font), ('freesans20', small_font)):
+        wri = get_writer(ssd, font)
+        chars = _charset(font)
+
+        def render():
+            for ch in chars:
+                Writer.set_textpos(ssd, 0, 0)
+                wri._printchar(ch)
+
+        results.add_timing('glyph_render.' + label, render, repeat=5, per=len(chars))
+
+
+@benchmark
+def stringlen(s, results):
+    import gui.fonts.arial_50 as huge_font
+    import gui.fonts.freesans20 as small_font
+    from gui.core.fontreg import get_writer
+    from gui.core.writer import Writer
+    ssd = s.namespace['ssd']
+    samples = (('arial_50', huge_font, '12:34'),
+               ('freesans20', small_font, 'Sa, 01. Mai 2021'),
+               ('freesans20_long', small_font, 'Countdown finished ' * 4))
+    for label, font, text in samples:
+        Writer.set_textpos(ssd, 0, 0)
+        results.add_timing('stringlen.{}'.format(label), lambda: get_writer(ssd, font).stringlen(text), repeat=200)
+        plain = Writer(ssd, font, False)  # Glyph lookups through the font module
+        results.add_timing('stringlen.{}.font_module'.format(label), lambda: plain.stringlen(text), repeat=200)
+
+
+@benchmark
+def epd_show(s, results):
+    ssd = s.namespace['ssd']
+    panel = s.panel
+    buf = ssd._buffer
+    ssd.wait_until_ready()
+
+    buf[0] ^= 0x01  # show() skips a frame that is on the panel already
+    before = panel.spi_bytes
+    ssd.show()
+    results.add('epd_show.spi_bytes', panel.spi_bytes - before, 'bytes')
+    ssd.wait_until_ready()
+
+    buf[0] ^= 0x01
+    before = panel.spi_bytes
+    t = vtime.now_ms()
+    ssd.init()
+    ssd.show()
+    ssd.sleep()
+    results.add('epd_refresh.spi_bytes', panel.spi_bytes - before, 'bytes')  # init + show + sleep
+    results.add('epd_refresh.virtual', vtime.now_ms() - t, 'ms')
+
+    before = panel.spi_bytes
+    t = vtime.now_ms()
+    ssd.show()  # Unchanged frame
+    results.add('epd_show.identical.spi_bytes', panel.spi_bytes - before, 'bytes')
+    results.add('epd_show.identical.virtual', vtime.now_ms() - t, 'ms')
+
+
+@benchmark
+def transition(s, results):
+    from rotary import Event
+    clock = s.clock
+    _prepare_clock_data(clock._clock_data)
+    clock._handle_state_change('Timer1Select')
+    s.advance(5000)
+    event = Event(s.encoder.rotary, Event.EVENT_ROT_INC, 0, False)
+    n = 8  # Two rounds through Timer1Select .. TimerBackSelect
+    t_virtual = vtime.now_us()
+    t = time.perf_counter_ns()
+    for _ in range(n):
+        clock.processEvent(event)
+    results.add('transition.host', (time.perf_counter_ns() - t) / 1000 / n, 'us')
+    results.add('transition.virtual', (vtime.now_us() - t_virtual) / 1000 / n, 'ms')
+
+    # An event that does not change the state (no redraw needed)
+    idle = Event(s.encoder.rotary, Event.EVENT_BTN_UP, 0, False)
+    results.add_timing('transition.same_state', lambda: clock.processEvent(idle), repeat=20)
+
+
+@benchmark
+def font_lookup(s, results):
+    import gui.fonts.arial_50 as huge_font
+    import gui.fonts.freesans20 as small_font
+    from gui.core.binfont import BinFont
+    from tools.font_to_bin import pack
+    for label, font in (('arial_50', huge_font), ('freesans20', small_font)):
+        binfont = BinFont(pack(font))
+        chars = _charset(font)
+
+        def lookup(f):
+            def run():
+                for ch in chars:
+                    f.get_ch(ch)
+            return run
+
+        results.add_timing('font_lookup.{}.module'.format(label), lookup(font), repeat=20, per=len(chars))
+        results.add_timing('font_lookup.{}.binfont'.format(label), lookup(binfont), repeat=20, per=len(chars))
+        index = getattr(font, '_index', None) or font._mvi
+        results.add('font_size.{}.module'.format(label), len(font._font) + len(index), 'bytes')
+        results.add('font_size.{}.binfont'.format(label), len(binfont.data), 'bytes')
+
+
+@benchmark
+def font_compressed(s, results):
+    # Footprint vs. render time of the glyph encodings, text of the time view
+    import gui.fonts.arial_50 as huge_font
+    from gui.core.binfont import BinFont
+    from gui.core.writer import Writer
+    from tools.font_to_bin import pack
+    ssd = s.namespace['ssd']
+    text = '12:34'
+    fonts = (('module', huge_font),
+             ('binfont', BinFont(pack(huge_font))),
+             ('packbits', BinFont(pack(huge_font, True))),
+             ('packbits_nocache', BinFont(pack(huge_font, True), cache_size=1)))
+    for label, font in fonts:
+        wri = Writer(ssd, font, False)
+
+        def render():
+            Writer.set_textpos(ssd, 0, 0)
+            for ch in text:
+                wri._printchar(ch)
+
+        results.add_timing('font_render.arial_50.{}'.format(label), render, per=len(text))
+        if label != 'packbits_nocache':
+            data = font.data if isinstance(font, BinFont) else memoryview(font._font)
+            results.add('font_size.arial_50.{}'.format(label), len(data) + (0 if isinstance(font, BinFont) else len(font._index)), 'bytes')
+
+    streamed = fonts[2][1]
+
+    def blit():
+        x = 0
+        for ch in text:
+            x += streamed.blit(ch, ssd, x, 0)
+
+    results.add_timing('font_render.arial_50.packbits_stream', blit, per=len(text))
+
+
+@benchmark
+def text_layout(s, results):
+    # Word wrap of a paragraph: Textbox and Writer against the layout engine,
+    # cold (one pass over the width table) and cached
+    import gui.fonts.freesans20 as small_font
+    from gui.core import layout
+    from gui.core.fontreg import get_writer, metrics
+    from gui.core.writer import Writer
+    from gui.widgets.textbox import Textbox
+    ssd = s.namespace['ssd']
+    text = ('Der Luftdruck faellt seit sechs Stunden um mehr als zwei Hektopascal, '
+            'es ist mit Regen und auffrischendem Wind zu rechnen.\n') * 4
+    wri = get_writer(ssd, small_font)
+    clip = wri.set_clip()
+    box = Textbox(wri, 0, 0, ssd.width - 4, 4, clip=False)
+    wri.set_clip(*clip)
+    m = metrics(small_font)
+
+    def cold():
+        layout.clear()
+        layout.layout(text, box.width, m)
+
+    def cached():
+        layout.layout(text, box.width, m)
+
+    def textbox():
+        layout.clear()
+        box.lines = []
+        box._add_lines(text)
+
+    def printstring():
+        Writer.set_textpos(ssd, 0, 0)
+        wri.printstring(text)
+
+    results.add_timing('text_layout.cold', cold, per=len(text))
+    results.add_timing('text_layout.cached', cached, per=len(text))
+    results.add_timing('text_layout.textbox', textbox, per=len(text))
+    results.add('text_layout.lines', len(box.lines), 'lines', kind=INFO)
+    clip = wri.set_clip()
+    wri.set_clip(True, True, True)
+    results.add_timing('text_layout.printstring', printstring, per=len(text))
+    wri.set_clip(*clip)
+
+
+@benchmark
+def scene_refresh(s, results):
+    # Normal view: full redraw vs. the minute tick of the retained widgets
+    clock = s.clock
+    cd = clock._clock_data
+    ssd = s.namespace['ssd']
+    panel = s.panel
+    normal = clock._get_state('Normal')
+    normal.initState(lambda: None)
+
+    def full():
+        normal._scene.invalidate()
+        normal.prepareView()
+
+    def tick():
+        cd.minute = (cd.minute + 1) % 60
+        normal.prepareView()
+
+    results.add_timing('scene_refresh.full', full)
+    results.add_timing('scene_refresh.minute', tick)
+    results.add_timing('scene_refresh.unchanged', normal.prepareView)
+
+    ssd.wait_until_ready()
+    ssd.show()
+    tick()
+    ssd.wait_until_ready()
+    before = panel.spi_bytes
+    ssd.show_window(*normal.updateWindow())
+    results.add('scene_refresh.window.spi_bytes', panel.spi_bytes - before, 'bytes')
+    ssd.wait_until_ready()
+
+
+@benchmark
+def draw_primitives(s, results):
+    # Dial sized shapes: nanogui per pixel vs. gui.core.draw on the raw
+    # buffer (both interpreted on the host, bench/draw_primitives.py on the device)
+    from array import array
+    from gui.core import draw, nanogui
+    ssd = s.namespace['ssd']
+    buf, w, h = ssd._buffer, ssd.width, ssd.height
+    results.add_timing('draw.circle.nanogui', lambda: nanogui.circle(ssd, 100, 100, 90, 1, 2))
+    results.add_timing('draw.circle.viper', lambda: draw.circle(buf, w, h, 100, 100, 90, 1, 2))
+    results.add_timing('draw.fillcircle.nanogui', lambda: nanogui.fillcircle(ssd, 100, 100, 40, 1))
+    results.add_timing('draw.fillcircle.viper', lambda: draw.fillcircle(buf, w, h, 100, 100, 40, 1))
+    results.add_timing('draw.arc.viper', lambda: draw.arc(buf, w, h, 100, 100, 90, 300, 60, 1, 2))
+    results.add_timing('draw.line_w4.viper', lambda: draw.line(buf, w, h, 100, 100, 150, 40, 1, 4))
+    hand = array('i', (96, 100, 100, 30, 104, 100, 100, 110))
+    results.add_timing('draw.fill_poly.viper', lambda: draw.fill_poly(buf, w, h, hand, 1))
+
+
+@benchmark
+def analog_face(s, results):
+    # Analog view: full redraw (cached dial) vs. the minute tick of the hands
+    clock = s.clock
+    cd = clock._clock_data
+    ssd = s.namespace['ssd']
+    panel = s.panel
+    analog = clock._get_state('Analog')
+    analog.initState(lambda: None)
+
+    def full():
+        analog._scene.invalidate()
+        analog.prepareView()
+
+    def tick():
+        cd.minute = (cd.minute + 1) % 60
+        analog.prepareView()
+
+    results.add_timing('analog_face.full', full)
+    results.add_timing('analog_face.minute', tick)
+
+    ssd.wait_until_ready()
+    ssd.show()
+    tick()
+    ssd.wait_until_ready()
+    before = panel.spi_bytes
+    ssd.show_window(*analog.updateWindow())
+    results.add('analog_face.window.spi_bytes', panel.spi_bytes - before, 'bytes')
+    ssd.wait_until_ready()
+
+
+@benchmark
+def frame_diff(s, results):
+    # Changed area against the last frame sent: identical frame, Normal minute tick, every word
+    from drivers import fbdiff
+    clock = s.clock
+    cd = clock._clock_data
+    ssd = s.namespace['ssd']
+    panel = s.panel
+    normal = clock._get_state('Normal')
+    normal.initState(lambda: None)
+    normal._scene.invalidate()
+    normal.prepareView()
+    ssd.wait_until_ready()
+    ssd.show()
+    ssd.wait_until_ready()
+    results.add_timing('frame_diff.identical', ssd.changed)
+
+    cd.minute = (cd.minute + 1) % 60
+    normal.prepareView()
+    results.add_timing('frame_diff.minute', ssd.changed)
+    before = panel.spi_bytes
+    ssd.show_window(*ssd.changed())
+    results.add('frame_diff.window.spi_bytes', panel.spi_bytes - before, 'bytes')
+    ssd.wait_until_ready()
+
+    buf = ssd._buffer
+    for i in range(len(buf)):
+        buf[i] ^= 0xFF
+    results.add_timing('frame_diff.all', ssd.changed)
+    results.add_timing('frame_diff.crc', lambda: fbdiff.crc(buf))
+    normal._scene.invalidate()
@@ -6,6 +6,7 @@
 
     http://www.micropython.org.cn
 '''
+import metrics
 from machine import Pin
 
 DS1302_REG_SECOND = (0x80)
@@ -19,6 +20,8 @@ DS1302_REG_WP     = (0x8E)
 DS1302_REG_CTRL   = (0x90)
 DS1302_REG_RAM    = (0xC0)
 
+_M_DATETIME = metrics.histogram("ds1302.datetime")
+
 class DS1302:
     def __init__(self, clk, dio, cs):
         self.clk = clk
@@ -119,7 +122,10 @@ class DS1302:
 
     def DateTime(self, dat = None):
         if dat == None:
-            return (self.Year(), self.Month(), self.Day(), self.Weekday(), self.Hour(), self.Minute(), self.Second())
+            t = metrics.start()
+            dt = (self.Year(), self.Month(), self.Day(), self.Weekday(), self.Hour(), self.Minute(), self.Second())
+            metrics.stop(_M_DATETIME, t)
+            return dt
         else:
             self.Year(dat[0])
             self.Month(dat[1])
@@ -0,0 +1,71 @@
+# barometer.py Reduction of the station pressure to sea level
+# MODEL_STANDARD uses the barometric formula of the standard atmosphere, a
+# single factor for the elevation. MODEL_TEMPERATURE also takes the station
+# temperature into account (p0 = p * (1 - 0.0065h / (T + 0.0065h + 273.15))^-5.257),
+# the factors for -40..+60 C are tabulated and interpolated.
+# All factors are Q16.16 and only computed by configure(), reduce() is integer
+# only.
+
+from array import array
+from micropython import const
+
+MODEL_STANDARD = const(0)
+MODEL_TEMPERATURE = const(1)
+
+MIN_ELEVATION = const(0)
+MAX_ELEVATION = const(4000)
+DEFAULT_ELEVATION = const(360)
+
+_T_MIN = const(-40) # Table range (C), readings outside are clamped
+_T_STEPS = const(100)
+
+
+def sea_level_factor(elevation: int) -> int:
+    # Standard atmosphere as Q16.16
+    return round(65536 / pow(1 - elevation / 44330, 5.255))
+
+
+def _compensated_factor(elevation: int, temperature: int) -> int:
+    gh = 0.0065 * elevation
+    return round(65536 / pow(1 - gh / (temperature + gh + 273.15), 5.257))
+
+
+class SeaLevel():
+    def __init__(self, elevation: int = DEFAULT_ELEVATION, model: int = MODEL_STANDARD) -> None:
+        self._table = array('I', [0] * (_T_STEPS + 1))
+        self.elevation = -1
+        self.model = -1
+        self.configure(elevation, model)
+
+
+    def configure(self, elevation: int, model: int) -> None:
+        # Recomputes the factors, does nothing if the config did not change
+        if elevation == self.elevation and model == self.model:
+            return
+        if not MIN_ELEVATION <= elevation <= MAX_ELEVATION:
+            raise ValueError("Elevation must be between {:d} and {:d} m (is: {:d})".format(MIN_ELEVATION, MAX_ELEVATION, elevation))
+        if model == MODEL_STANDARD:
+            self._factor = sea_level_factor(elevation)
+        elif model == MODEL_TEMPERATURE:
+            for i in range(_T_STEPS + 1):
+                self._table[i] = _compensated_factor(elevation, _T_MIN + i)
+        else:
+            raise ValueError("Unknown pressure model {:d}".format(model))
+        self.elevation = elevation
+        self.model = model
+
+
+    def reduce(self, pressure_deci: int, temperature_deci: int) -> int:
+        # Station pressure and temperature in 0.1 hPa / 0.1 C to sea-level 0.1 hPa
+        if self.model == MODEL_STANDARD:
+            factor = self._factor
+        else:
+            t = temperature_deci - _T_MIN * 10
+            if t < 0:
+                t = 0
+            elif t >= _T_STEPS * 10:
+                t = _T_STEPS * 10 - 1
+            i = t // 10
+            f0 = self._table[i]
+            factor = f0 + (self._table[i + 1] - f0) * (t % 10) // 10
+        return (pressure_deci * factor + 0x8000) >> 16
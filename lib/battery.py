@@ -0,0 +1,74 @@
+# battery.py Battery level from the VSYS voltage
+# The Pico measures VSYS / 3 on ADC3 (GP29). A batch of reads goes into a
+# preallocated array, its median is smoothed with an EMA over the batches and
+# mapped to percent with a LiPo discharge curve. ClockData.battery is only
+# written when the level changed by at least 1%, so noise does not cause
+# display refreshes.
+
+from array import array
+from machine import ADC, Pin
+from micropython import const
+from clockdata import ClockData
+
+_SAMPLES = const(64)
+_VSYS_DIV = const(3)
+_VREF_MV = const(3300)
+_EMA_WEIGHT = const(4) # New batch: 1/4
+_MIN_CHANGE_PCT = const(1)
+
+# Discharge curve (mV, %), descending
+_CURVE_MV = (4200, 4100, 4000, 3900, 3800, 3750, 3700, 3650, 3600, 3500, 3300)
+_CURVE_PCT = (100, 90, 80, 66, 52, 40, 30, 20, 12, 5, 0)
+
+
+def percent(mv: int) -> int:
+    if mv >= _CURVE_MV[0]:
+        return _CURVE_PCT[0]
+    for i in range(1, len(_CURVE_MV)):
+        if mv >= _CURVE_MV[i]:
+            hi_mv, lo_mv = _CURVE_MV[i - 1], _CURVE_MV[i]
+            hi, lo = _CURVE_PCT[i - 1], _CURVE_PCT[i]
+            return lo + (hi - lo) * (mv - lo_mv) // (hi_mv - lo_mv)
+    return _CURVE_PCT[-1]
+
+
+class BatteryMonitor():
+    def __init__(self, clock_data: ClockData, pin: int = 29) -> None:
+        self._clock_data = clock_data
+        self._adc = ADC(Pin(pin))
+        self._samples = array('H', [0] * _SAMPLES)
+        self.mv = 0 # Filtered VSYS voltage, 0 before the first update
+
+
+    def _median(self) -> int:
+        # Insertion sort in place, no allocation
+        buf = self._samples
+        for i in range(1, _SAMPLES):
+            v = buf[i]
+            j = i - 1
+            while j >= 0 and buf[j] > v:
+                buf[j + 1] = buf[j]
+                j -= 1
+            buf[j + 1] = v
+        return (buf[_SAMPLES // 2 - 1] + buf[_SAMPLES // 2]) // 2
+
+
+    def sample(self) -> int:
+        # Reads a batch and returns the filtered VSYS voltage (mV)
+        read = self._adc.read_u16
+        buf = self._samples
+        for i in range(_SAMPLES):
+            buf[i] = read()
+        mv = self._median() * _VSYS_DIV * _VREF_MV // 65535
+        self.mv = mv if self.mv == 0 else (self.mv * (_EMA_WEIGHT - 1) + mv) // _EMA_WEIGHT
+        return self.mv
+
+
+    def update(self) -> bool:
+        # Samples and publishes the level to ClockData, True if it changed
+        level = percent(self.sample())
+        cd = self._clock_data
+        if cd.battery >= 0 and abs(level - cd.battery) < _MIN_CHANGE_PCT:
+            return False
+        cd.battery = level
+        return True
@@ -1,4 +1,5 @@
 from ustruct import unpack as unp
+import metrics
 import utime
  
 # Author David Wahlund david@dafnet.se
@@ -43,6 +44,8 @@ BMP280_REGISTER_CONFIG = 0xF5  # IIR filter config
  
 BMP280_REGISTER_DATA = 0xF7
  
+_M_GAUGE = metrics.histogram("bmp280.gauge")
+ 
  
 class BMP280:
     def __init__(self, i2c_bus, addr=0x76):
@@ -100,6 +103,7 @@ class BMP280:
         now = utime.ticks_ms()
         if utime.ticks_diff(now, self._last_read_ts) > self._new_read_ms:
             self._last_read_ts = now
+            t = metrics.start()
             r = self._t_os + (self._p_os << 3) + (1 << 6)
             self._write(BMP280_REGISTER_CONTROL, r)
             utime.sleep_ms(100)  # TODO calc sleep
@@ -111,6 +115,7 @@ class BMP280:
             self._t_fine = 0
             self._t = 0
             self._p = 0
+            metrics.stop(_M_GAUGE, t)
  
     def load_test_calibration(self):
         self._T1 = 27504
@@ -154,14 +159,28 @@ class BMP280:
  
     @property
     def temperature(self):
+        return self.temperature_centi / 100.
+
+    @property
+    def temperature_centi(self):
+        # 0.01 C
         self._calc_t_fine()
         if self._t == 0:
-            self._t = ((self._t_fine * 5 + 128) >> 8) / 100.
+            self._t = (self._t_fine * 5 + 128) >> 8
         return self._t
- 
+
+    @property
+    def temperature_deci(self):
+        # 0.1 C, rounded
+        return (self.temperature_centi + 5) // 10
+
     @property
     def pressure(self):
-        # From datasheet page 22
+        return self.pressure_q8 / 256.0
+
+    @property
+    def pressure_q8(self):
+        # Pa as unsigned Q24.8 (datasheet page 22)
         self._calc_t_fine()
         if self._p == 0:
             var1 = self._t_fine - 128000
@@ -175,10 +194,14 @@ class BMP280:
                 return 0
  
             p = 1048576 - self._p_raw
-            p = int((((p << 31) - var2) * 3125) / var1)
+            p = (((p << 31) - var2) * 3125) // var1
             var1 = (self._P9 * (p >> 13) * (p >> 13)) >> 25
             var2 = (self._P8 * p) >> 19
  
-            p = ((p + var1 + var2) >> 8) + (self._P7 << 4)
-            self._p = p / 256.0
-        return self._p
\ No newline at end of file
+            self._p = ((p + var1 + var2) >> 8) + (self._P7 << 4)
+        return self._p
+
+    @property
+    def pressure_deci(self):
+        # 0.1 hPa, rounded
+        return (self.pressure_q8 + 1280) // 2560
@@ -0,0 +1,57 @@
+# bootprof.py Boot profiler
+# Records ticks_us and free heap at named boot steps (imports, state
+# registration, ...) into preallocated buffers and prints the time spent per
+# step at the end of the boot.
+
+# Usage (see main.py):
+# import bootprof
+# bootprof.mark("start")
+# import states
+# bootprof.mark("import states")
+# bootprof.mark("register ", name)  # Parts are joined by report(), nothing is built when disabled
+# ...
+# bootprof.report()
+
+import gc
+from array import array
+from micropython import const
+from utime import ticks_us, ticks_diff
+
+_MAX_MARKS = const(48)
+
+enabled = True
+
+_labels = [None] * _MAX_MARKS
+_names = [None] * _MAX_MARKS
+_ticks = array('L', [0] * _MAX_MARKS)
+_free = array('L', [0] * _MAX_MARKS)
+_count = 0
+
+
+def mark(label: str, name: str = None) -> None:
+    global _count
+    if not enabled or _count >= _MAX_MARKS:
+        return
+    _ticks[_count] = ticks_us()
+    _free[_count] = gc.mem_free() if hasattr(gc, 'mem_free') else 0
+    _labels[_count] = label
+    _names[_count] = name
+    _count += 1
+
+
+def reset() -> None:
+    global _count
+    _count = 0
+
+
+def report() -> None:
+    if _count == 0:
+        return
+    print("Boot profile ({} marks):".format(_count))
+    print("  {:>9s} {:>9s} {:>8s}  {}".format("step us", "total us", "free", "label"))
+    t0 = _ticks[0]
+    prev = t0
+    for i in range(_count):
+        t = _ticks[i]
+        print("  {:9d} {:9d} {:8d}  {}".format(ticks_diff(t, prev), ticks_diff(t, t0), _free[i], _labels[i] + (_names[i] or "")))
+        prev = t
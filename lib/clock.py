@@ -1,5 +1,9 @@
 
-from utime import ticks_diff, ticks_ms
+import bootprof
+import gc
+import metrics
+import tracebuf
+from utime import ticks_add, ticks_diff, ticks_ms
 from micropython import const
 from DS1302 import DS1302
 import states, states_edit
@@ -8,52 +12,112 @@ from machine import Timer
 from rotary import Event
 from drivers.display import Display
 from clockdata import ClockData
+from battery import BatteryMonitor
+from barometer import SeaLevel
 from bmp280 import BMP280
+from history import History, NO_DATA
 
+_M_STATE_CHANGE = metrics.histogram("clock.state_change")
+_M_PREPARE_VIEW = metrics.histogram("clock.prepare_view")
+_M_INPUT_LATENCY = metrics.histogram("input.latency")
+_M_REFRESHES = metrics.counter("clock.display_updates")
 
-class Clock():
-    _ELEVATION = const(360)
 
-    def __init__(self, display:Display, clock_data: ClockData, temp_sensor: BMP280, rtc: DS1302) -> None:
+class Clock():
+    def __init__(self, display:Display, clock_data: ClockData, temp_sensor: BMP280, rtc: DS1302, evict_below: int = 0, battery: BatteryMonitor = None, history: History = None) -> None:
         self._clock_data = clock_data
         self._display = display
         self._temp_sensor = temp_sensor
         self._rtc = rtc
+        self._battery = battery
+        self._history = history
+        self._sea_level = SeaLevel(clock_data.elevation, clock_data.pressure_model)
         self._cur_state = None
         self._timeout_timer = Timer()
         self._time_refresh_timer = Timer()
         self._registered_states = {}
+        self._state_factories = {}
+        self._evictable_states = []
+        self._evict_below = evict_below # Free heap (bytes) below which evictable states are dropped, 0 disables
         self._last_temp_ts = 0
         self._last_update_time = 900
+        self._next_refresh_ts = 0 # ticks_ms of the pending timer callbacks, 0 if not armed
+        self._timeout_ts = 0
+        self.last_event_ts = ticks_ms()
 
 
     def register_state(self, state: states._State) -> None:
         self._registered_states[state.__class__.__name__] = state
+        tracebuf.state_id(state.__class__.__name__)
+        bootprof.mark("register ", state.__class__.__name__)
         if self._cur_state is None and isinstance(state, states.Init):
             self._cur_state = state
 
 
+    def register_state_factory(self, state_name: str, factory: FunctionType, evictable: bool = False) -> None:
+        # The state is only instantiated on the first transition to it
+        self._state_factories[state_name] = factory
+        tracebuf.state_id(state_name)
+        bootprof.mark("register ", state_name)
+        if evictable and state_name not in self._evictable_states:
+            self._evictable_states.append(state_name)
+
+
+    def _get_state(self, state_name: str) -> states._State:
+        state = self._registered_states.get(state_name)
+        if state is None:
+            factory = self._state_factories.get(state_name)
+            if factory is not None:
+                state = factory()
+                self._registered_states[state_name] = state
+                bootprof.mark("create ", state_name)
+        return state
+
+
+    def _evict_states(self) -> None:
+        if self._evict_below <= 0 or gc.mem_free() >= self._evict_below:
+            return
+
+        for state_name in self._evictable_states:
+            state = self._registered_states.get(state_name)
+            if state is not None and state is not self._cur_state:
+                del self._registered_states[state_name]
+        gc.collect()
+
+
     def init(self) -> None:
         if not isinstance(self._cur_state, states.Init):
             return
 
+        self.processEvent(None) # Show the init screen before talking to the sensors
+        new_state_name = self._cur_state.init() # Loads the config before the first reading
         self._update_temperature()
-        self.processEvent(None)
-        new_state_name = self._cur_state.init()
+        self._update_battery()
         if new_state_name == states.Normal.__name__:
             self._start_time_refresh_timer()
         self._handle_state_change(new_state_name)
 
 
+    def _update_battery(self) -> None:
+        if self._battery is not None:
+            self._battery.update()
+
+
     def _update_temperature(self) -> None:
+        cd = self._clock_data
+        self._sea_level.configure(cd.elevation, cd.pressure_model) # Recomputed only after a change
         try:
-            pressure = self._temp_sensor.pressure
-            pressure_sl = (pressure/pow(1-360./44330, 5.255))/100.0
-            self._clock_data.temperature = "{:7.1f}".format(self._temp_sensor.temperature).replace(".", ",")
-            self._clock_data.pressure = "{:7.1f}".format(pressure_sl).replace(".", ",")
+            temperature = self._temp_sensor.temperature_deci
+            pressure = self._sea_level.reduce(self._temp_sensor.pressure_deci, temperature)
         except:
-            self._clock_data.temperature = None
-            self._clock_data.pressure = None
+            cd.set_sensor(None, None)
+            if self._history is not None:
+                self._history.add(NO_DATA, NO_DATA)
+            return
+
+        cd.set_sensor(temperature, pressure)
+        if self._history is not None:
+            self._history.add(temperature, pressure)
 
 
 
@@ -62,17 +126,20 @@ class Clock():
         if next_update < 0:
             next_update = 100
 
+        self._next_refresh_ts = ticks_add(ticks_ms(), next_update) or 1
         self._time_refresh_timer.init(mode=Timer.ONE_SHOT, period=next_update, callback=self._handle_time_refresh)
         print(next_update, self._clock_data.second, self._last_update_time)
 
 
 
     def _handle_time_refresh(self, timer: Timer) -> None:
+        self._next_refresh_ts = 0
         if isinstance(self._cur_state, states_edit._EditTimeState):
             return # no update during setup
 
         ts = ticks_ms()
         self._update_temperature()
+        self._update_battery()
         self._clock_data.from_rtc(self._rtc.DateTime())
 
         self._handle_state_change(self._cur_state.__class__.__name__)
@@ -82,43 +149,91 @@ class Clock():
 
     def _handle_timeout(self, timer: Timer) -> None:
         timer.deinit()
+        self._timeout_ts = 0
+        tracebuf.record(tracebuf.TIMEOUT, self._cur_state.__class__.__name__, self._cur_state._timeout_state_name, 0, not self._display.ready())
         self._cur_state.handleTimeout()
         if self._cur_state._timeout_state_name is not None:
             self._handle_state_change(self._cur_state._timeout_state_name)
 
 
+    def next_wakeup_ms(self) -> int:
+        # Milliseconds until the next timer callback of the clock or the
+        # current state, -1 if nothing is pending
+        now = ticks_ms()
+        wakeup = self._cur_state.nextWakeupMs() if self._cur_state is not None else -1
+        for ts in (self._next_refresh_ts, self._timeout_ts):
+            if ts:
+                ms = max(0, ticks_diff(ts, now))
+                if wakeup < 0 or ms < wakeup:
+                    wakeup = ms
+        return wakeup
+
+
+    def start_alarm(self, timer_no: int) -> None:
+        # Called by the timer service when a countdown timer has finished
+        tracebuf.record(tracebuf.COUNTDOWN, self._cur_state.__class__.__name__, "TimerAlarm", timer_no, not self._display.ready())
+        self._clock_data.active_timer = timer_no
+        alarm = self._get_state("TimerAlarm")
+        if alarm is self._cur_state: # Another timer finished during the alarm
+            alarm.initState(self._reset_timout_timer)
+        self._handle_state_change("TimerAlarm")
+
+
     def _reset_timout_timer(self) -> None:
         self._timeout_timer.deinit()
+        self._timeout_ts = 0
         if self._cur_state._timeout_ms > 0 \
             and (not isinstance(self._cur_state, states_edit._EditTimeState) \
                 or self._clock_data.is_init): # No timeout during initial setup
+            self._timeout_ts = ticks_add(ticks_ms(), self._cur_state._timeout_ms) or 1
             self._timeout_timer.init(mode=Timer.ONE_SHOT, period=self._cur_state._timeout_ms, callback=self._handle_timeout)
             # print("start timer:", self._cur_state._timeout_ms)
 
 
     def _handle_state_change(self, new_state_name: str) -> None:
         # print("handle state change:", new_state_name)
-        new_state = self._registered_states.get(new_state_name)
+        t = metrics.start()
+        if new_state_name == states.Normal.__name__:
+            new_state_name = self._clock_data.home_state # Digital or analog face
+        new_state = self._get_state(new_state_name)
         if new_state is None:
             raise NotImplementedError("State '{:s}' is not implemented".format(new_state_name))
 
+        prev_state = self._cur_state
         if new_state is not self._cur_state:
             self._cur_state = new_state
+            self._evict_states()
             self._cur_state.initState(self._reset_timout_timer)
             self._reset_timout_timer()
 
+        tv = metrics.start()
         update_display = self._cur_state.prepareView()
+        metrics.stop(_M_PREPARE_VIEW, tv)
+        if update_display:
+            window = self._display.changed()
+            if window is None: # prepareView() drew the frame on the screen again
+                update_display = False
+                self._display.note_identical()
+        tracebuf.record(tracebuf.STATE, prev_state.__class__.__name__, new_state_name, 1 if update_display else 0, not self._display.ready())
         if update_display:
+            metrics.inc(_M_REFRESHES)
             self._display.wait_until_ready()
             self._display.init()
-            self._display.show()
+            self._display.show_window(*window) # All changed pixels, whatever updateWindow() says
+            tracebuf.record(tracebuf.SHOW, new_state_name, new_state_name, 0, not self._display.ready())
             self._display.sleep()
+        metrics.stop(_M_STATE_CHANGE, t)
 
 
     def processEvent(self, event: Event) -> None:
         if self._cur_state is None:
             return
 
+        if event is not None:
+            self.last_event_ts = ticks_ms()
         new_state_name = self._cur_state.processEvent(event)
+        tracebuf.record(tracebuf.EVENT, self._cur_state.__class__.__name__, new_state_name, 0 if event is None else event.event_type, not self._display.ready())
 
         self._handle_state_change(new_state_name)
+        if event is not None:
+            metrics.stop(_M_INPUT_LATENCY, event.ts) # From the IRQ to the end of the display update
@@ -14,16 +14,23 @@ class ClockData:
         self.hour = 0
         self.minute = 0
         self.second = 0
-        self.temperature = None
+        self.temperature = None # Formatted, None without a reading
         self.pressure = None
+        self.temperature_deci = None # 0.1 C
+        self.pressure_deci = None # 0.1 hPa (sea level)
+        self.elevation = 360 # m, barometer.DEFAULT_ELEVATION
+        self.pressure_model = 0 # barometer.MODEL_STANDARD
         self.battery = -1
         self.t1_duration = 0
         self.t2_duration = 0
         self.t3_duration = 0
         self.active_timer = 0
+        self.countdown_rate = 0 # countdown.RATE_AUTO
+        self.timers_running = 0 # Bit n set while timer n counts down
         self.timer_min_backup = 0
         self.timer_sec_backup = 0
         self.is_init = False
+        self.home_state = "Normal" # State shown for "Normal": "Normal" (digital) or "Analog"
 
     def from_rtc(self, rtc_tuple:Tuple[int, int, int, int, int, int, int]) -> bool:
         self.year = rtc_tuple[0]
@@ -38,6 +45,23 @@ class ClockData:
 
 
 
+    @staticmethod
+    def format_deci(value: int) -> str:
+        # "{:7.1f}" with a decimal comma, without going through a float
+        a = -value if value < 0 else value
+        return "{:>7s}".format("{:s}{:d},{:d}".format("-" if value < 0 else "", a // 10, a % 10))
+
+
+    def set_sensor(self, temperature_deci: int, pressure_deci: int) -> None:
+        # The strings are only formatted again when a value changed
+        if temperature_deci != self.temperature_deci:
+            self.temperature_deci = temperature_deci
+            self.temperature = None if temperature_deci is None else self.format_deci(temperature_deci)
+        if pressure_deci != self.pressure_deci:
+            self.pressure_deci = pressure_deci
+            self.pressure = None if pressure_deci is None else self.format_deci(pressure_deci)
+
+
     def calc_weekday(self) -> None:
         m = self.month
         y = self.year
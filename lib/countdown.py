@@ -0,0 +1,248 @@
+# countdown.py Countdown timers based on absolute deadlines
+# The remaining time is always derived from the deadline (ticks_ms) and never
+# from the number of timer callbacks, so slow display refreshes do not add up.
+# TimerService runs the three countdown timers on one machine.Timer: it is
+# armed for the earliest deadline (kept in a min-heap) or the next change of
+# the displayed value of the watched timer, whichever comes first. The expired
+# callback is called once a deadline is reached no matter what the tick
+# callbacks do. A tick callback that cannot show its value (busy panel) asks
+# for it again with retry().
+
+from machine import Timer
+from micropython import const
+from utime import ticks_add, ticks_diff, ticks_ms
+from clockdata import ClockData
+
+# Display rate modes
+RATE_AUTO = const(0)     # Step chosen from the measured refresh time
+RATE_SECONDS = const(1)  # Every second
+RATE_MINUTES = const(2)  # Minutes only
+
+DEFAULT_REFRESH_MS = const(680) # Partial refresh time assumed until measured
+_MAX_BUSY_MS = const(800) # Panel busy time allowed per second of a step
+_STEPS = (1, 2, 5, 10)
+_LONG_TIMER_S = const(600) # Auto mode: minutes only before the final minute
+_FINAL_MINUTE_MS = const(60_000)
+_NUM_TIMERS = const(3)
+
+
+class DisplayRate():
+    # Picks how many seconds lie between two displayed countdown values
+    def __init__(self, mode: int = RATE_AUTO) -> None:
+        self.mode = mode
+        self.refresh_ms = DEFAULT_REFRESH_MS
+
+
+    def set_refresh_ms(self, refresh_ms: int) -> None:
+        self.refresh_ms = refresh_ms if refresh_ms > 0 else DEFAULT_REFRESH_MS
+
+
+    def step(self, remaining_ms: int, duration_s: int) -> int:
+        if self.mode == RATE_SECONDS:
+            return 1
+        if self.mode == RATE_MINUTES:
+            return 60
+
+        for step in _STEPS:
+            if self.refresh_ms <= step * _MAX_BUSY_MS:
+                break
+        if remaining_ms > _FINAL_MINUTE_MS and (step == _STEPS[-1] or duration_s >= _LONG_TIMER_S):
+            return 60 # Seconds only in the final minute
+        return step
+
+
+
+class TimerService():
+    def __init__(self, timer: Timer, clock_data: ClockData, expired_callback: FunctionType) -> None:
+        self._timer = timer
+        self._clock_data = clock_data # timers_running: bit n set while timer n runs
+        self._expired_callback = expired_callback # Called with the timer number
+        # Indexed by timer number (1..3)
+        self._deadline = [0] * (_NUM_TIMERS + 1)
+        self._duration_s = [0] * (_NUM_TIMERS + 1)
+        self._heap = [0] * _NUM_TIMERS # Timer numbers, earliest deadline first
+        self._heap_size = 0
+
+        self._watch_no = 0 # Timer shown on the display, 0 for none
+        self._tick_callback = None # Called with the value to display (seconds)
+        self._rate = None
+        self._watch_due = 0 # Next change of the displayed value
+        self._shown = 0
+        self._retry_due = 0 # Repeat of the last tick callback, 0 for none
+        self.step_s = 1
+
+
+    def start(self, no: int, seconds: int) -> None:
+        self._remove(no)
+        self._deadline[no] = ticks_add(ticks_ms(), seconds * 1000)
+        self._duration_s[no] = seconds
+        self._push(no)
+        self._clock_data.timers_running |= 1 << no
+        if no == self._watch_no:
+            self._shown = seconds
+            self._update_watch(seconds * 1000, ticks_ms())
+        self._arm()
+
+
+    def cancel(self, no: int) -> None:
+        self._remove(no)
+        self._clock_data.timers_running &= ~(1 << no)
+        self._arm()
+
+
+    def running(self, no: int) -> bool:
+        return bool(self._clock_data.timers_running & (1 << no))
+
+
+    def duration(self, no: int) -> int:
+        return self._duration_s[no]
+
+
+    def remaining_ms(self, no: int) -> int:
+        if not self.running(no):
+            return 0
+        return max(0, ticks_diff(self._deadline[no], ticks_ms()))
+
+
+    def remaining(self, no: int) -> int:
+        # Seconds rounded up (0 only once expired)
+        return (self.remaining_ms(no) + 999) // 1000
+
+
+    def next_deadline_ms(self) -> int:
+        # Milliseconds until the earliest deadline, -1 if no timer runs
+        if self._heap_size == 0:
+            return -1
+        return max(0, ticks_diff(self._deadline[self._heap[0]], ticks_ms()))
+
+
+    def next_wakeup_ms(self) -> int:
+        # Milliseconds until the timer callback (deadline or display tick), -1 for none
+        if self._heap_size == 0:
+            return -1
+        now = ticks_ms()
+        ms = ticks_diff(self._deadline[self._heap[0]], now)
+        if self._watch_no and self.running(self._watch_no):
+            ms = min(ms, ticks_diff(self._watch_due, now))
+            if self._retry_due:
+                ms = min(ms, ticks_diff(self._retry_due, now))
+        return max(0, ms)
+
+
+    def watch(self, no: int, tick_callback: FunctionType, rate: DisplayRate = None) -> int:
+        # Calls tick_callback whenever the displayed value of timer no changes.
+        # Returns the first value to display.
+        self._watch_no = no
+        self._tick_callback = tick_callback
+        self._rate = rate
+        self._retry_due = 0
+        remaining_ms = self.remaining_ms(no)
+        value = self._update_watch(remaining_ms, ticks_ms())
+        self._shown = value if self.step_s >= 60 else (remaining_ms + 999) // 1000 # Exact unless minutes only
+        self._arm()
+        return self._shown
+
+
+    def unwatch(self) -> None:
+        self._watch_no = 0
+        self._tick_callback = None
+        self._retry_due = 0
+        self._arm()
+
+
+    def retry(self, ms: int) -> None:
+        # Calls the tick callback again with the shown value after ms, unless
+        # the value changes before
+        if self._watch_no:
+            self._retry_due = ticks_add(ticks_ms(), ms) or 1
+            self._arm()
+
+
+    def _before(self, a: int, b: int) -> bool:
+        return ticks_diff(self._deadline[a], self._deadline[b]) < 0
+
+
+    def _push(self, no: int) -> None:
+        heap = self._heap
+        i = self._heap_size
+        self._heap_size += 1
+        while i > 0:
+            parent = (i - 1) >> 1
+            if not self._before(no, heap[parent]):
+                break
+            heap[i] = heap[parent]
+            i = parent
+        heap[i] = no
+
+
+    def _remove(self, no: int) -> None:
+        heap = self._heap
+        for i in range(self._heap_size):
+            if heap[i] == no:
+                break
+        else:
+            return # Not running
+
+        self._heap_size -= 1
+        last = heap[self._heap_size]
+        if i == self._heap_size:
+            return
+        while i > 0 and self._before(last, heap[(i - 1) >> 1]): # Sift up
+            heap[i] = heap[(i - 1) >> 1]
+            i = (i - 1) >> 1
+        while True: # Sift down
+            child = 2 * i + 1
+            if child >= self._heap_size:
+                break
+            if child + 1 < self._heap_size and self._before(heap[child + 1], heap[child]):
+                child += 1
+            if not self._before(heap[child], last):
+                break
+            heap[i] = heap[child]
+            i = child
+        heap[i] = last
+
+
+    def _update_watch(self, remaining_ms: int, now: int) -> int:
+        # Returns the value to display, rounded up to the current step
+        step = 1 if self._rate is None else self._rate.step(remaining_ms, self._duration_s[self._watch_no])
+        self.step_s = step
+        step_ms = step * 1000
+        self._watch_due = ticks_add(now, remaining_ms % step_ms or step_ms) # Until the displayed value changes
+        return (remaining_ms + step_ms - 1) // step_ms * step
+
+
+    def _arm(self) -> None:
+        period = self.next_wakeup_ms()
+        if period < 0:
+            self._timer.deinit()
+        else:
+            self._timer.init(mode=Timer.ONE_SHOT, period=max(1, period), callback=self._handle_timer)
+
+
+    def _handle_timer(self, timer: Timer) -> None:
+        now = ticks_ms()
+        expired = 0
+        while self._heap_size and ticks_diff(self._deadline[self._heap[0]], now) <= 0:
+            no = self._heap[0]
+            self._remove(no)
+            self._clock_data.timers_running &= ~(1 << no)
+            expired |= 1 << no
+        if expired:
+            self._watch_no = 0 # The alarm takes over the display
+
+        watch_no = self._watch_no
+        if watch_no and self.running(watch_no) and ticks_diff(self._watch_due, now) <= 0:
+            value = self._update_watch(ticks_diff(self._deadline[watch_no], now), now)
+            if value < self._shown: # Never count up when the step grows
+                self._shown = value
+                self._retry_due = 0
+                self._tick_callback(value)
+        if self._retry_due and self._watch_no and ticks_diff(self._retry_due, now) <= 0:
+            self._retry_due = 0
+            self._tick_callback(self._shown)
+
+        self._arm()
+        for no in range(1, _NUM_TIMERS + 1):
+            if expired & (1 << no):
+                self._expired_callback(no)
@@ -12,5 +12,18 @@ class Display(FrameBuffer):
     def show(self, buf1=bytearray(1)) -> None:
         raise NotImplementedError("function not implemented.")
 
+    def show_window(self, x: int, y: int, w: int, h: int) -> None:
+        # Update of a part of the screen, drivers without support send all
+        self.show()
+
+    def changed(self) -> Tuple[int, int, int, int]:
+        # Area that differs from the frame on the screen, None if nothing
+        # changed. Drivers without a copy of the last frame report all of it
+        return 0, 0, self.width, self.height
+
+    def note_identical(self) -> None:
+        # Called instead of show() when changed() found nothing to send
+        pass
+
     def clear(self) -> None:
         self.fill(0)
@@ -13,12 +13,14 @@
 
 import utime
 import framebuf
+import metrics
 import uasyncio as asyncio
 
 from micropython import const
 from machine import SPI, Pin
 from utime import sleep_ms, ticks_ms, ticks_diff
 from drivers.display import Display
+from drivers.fbdiff import FrameDiff, crc
 
 # Display resolution
 EPD_WIDTH = const(200)
@@ -31,6 +33,10 @@ BLACK_FRAME = bytearray(BUFFER_SIZE)
 
 DEFAULT_FULL_REFRESH_CYCLE = const(60 * 60 * 1000) # Full display update every hour
 
+_M_SHOW = metrics.histogram("epd.show")
+_M_WAIT = metrics.histogram("epd.wait_until_ready")
+_M_IDENTICAL = metrics.counter("epd.identical_frames") # Refreshes avoided
+
 class EPD(framebuf.FrameBuffer):
     # A monochrome approach should be used for coding this. The rgb method ensures
     # nothing breaks if users specify colors.
@@ -52,6 +58,10 @@ class EPD(framebuf.FrameBuffer):
         self._as_busy = False  # Set immediately on start of task. Cleared when busy pin is logically false (physically 1).
         self._updated = asyncio.Event()
         self._last_full_update_ts = 0
+        self._refresh_ts = 0 # Start of the running refresh, 0 if not measured
+        self._refresh_full = False
+        self.partial_refresh_ms = 0 # Last measured refresh times, 0 if unknown
+        self.full_refresh_ms = 0
 
         self._cs.init(Pin.OUT, value=1)
         self._dc.init(Pin.OUT, value=0)
@@ -64,7 +74,11 @@ class EPD(framebuf.FrameBuffer):
         self.demo_mode = False  # Special mode enables demos to run
         self._buffer = bytearray(BUFFER_SIZE)
         self._mvb = memoryview(self._buffer)
+        self._ram_valid = False # Controller RAM holds the frame buffer, show_window() may send a part
+        self._diff = None if landscape else FrameDiff(EPD_WIDTH, EPD_HEIGHT) # Last frame sent
+        self._crc = None # CRC of the last frame sent in landscape mode, no copy is kept
         mode = framebuf.MONO_VLSB if landscape else framebuf.MONO_HLSB
+        self.mode = mode # Buffer format, MONO_HLSB enables the direct glyph rendering of Writer
         super().__init__(self._buffer, self.width, self.height, mode)
         self.init()
 
@@ -82,6 +96,7 @@ class EPD(framebuf.FrameBuffer):
 
     # Hardware reset
     def reset(self) -> None:
+        self._refresh_ts = 0
         self._rst.value(1)
         sleep_ms(10)
         self._rst.value(0)
@@ -129,12 +144,21 @@ class EPD(framebuf.FrameBuffer):
 
     def wait_until_ready(self):
         sleep_ms(25)
-        t = ticks_ms()
+        t = metrics.start()
+        waited = False
         while not self.ready():
+            waited = True
             sleep_ms(10)
+        if self._refresh_ts:
+            if waited: # Otherwise the refresh ended unnoticed
+                dt = ticks_diff(ticks_ms(), self._refresh_ts)
+                if self._refresh_full:
+                    self.full_refresh_ms = dt
+                else:
+                    self.partial_refresh_ms = dt
+            self._refresh_ts = 0
         sleep_ms(10)
-        dt = ticks_diff(ticks_ms(), t)
-        # print('wait_until_ready {}ms {:4.1f}sec'.format(dt, dt/1_000))
+        metrics.stop(_M_WAIT, t)
 
     async def wait(self):
         await asyncio.sleep_ms(0)  # Ensure tasks run that might make it unready
@@ -169,6 +193,12 @@ class EPD(framebuf.FrameBuffer):
 
 
     def show(self, buf1=bytearray(1)) -> None:
+        if self._identical(): # Saves the refresh, about a second of panel power
+            self.note_identical()
+            if self._asyn:
+                self._updated.set() # Nothing to copy
+                self._updated.clear()
+            return
         if self._as_busy:
             raise RuntimeError('Cannot refresh: display is busy.')
 
@@ -176,6 +206,7 @@ class EPD(framebuf.FrameBuffer):
         send = self._spi.write
         cmd = self._command
         t = ticks_ms()
+        tm = metrics.start()
         if self._lsc:  # Landscape mode
             wid = self.width
             tbc = self.height // 8  # Vertical bytes per column
@@ -197,12 +228,100 @@ class EPD(framebuf.FrameBuffer):
                 #     await asyncio.sleep_ms(0)
                 #     t = ticks_ms()
             self._cs.value(1)
+            self._crc = crc(mvb)
             print("Copy Landscape FB:", ticks_diff(ticks_ms(), t))
         else:
             cmd(b'\x24', mvb)
             cmd(b'\x26', mvb)
+            self._ram_valid = True
+            self._diff.commit(mvb)
+
+        self._update(tm)
+
 
+    def show_window(self, x: int, y: int, w: int, h: int) -> None:
+        # Sends only the rows y .. y + h - 1, columns x .. x + w - 1 (rounded
+        # to bytes) of the frame buffer, the rest of the controller RAM keeps
+        # the previous frame (deep sleep mode 1 retains the RAM)
+        if not self._ram_valid or self._lsc:
+            self.show()
+            return
+        if self._as_busy:
+            raise RuntimeError('Cannot refresh: display is busy.')
 
+        tm = metrics.start()
+        x0 = max(0, x) >> 3
+        x1 = (min(self.width, x + w) + 7) >> 3 # Exclusive
+        y0 = max(0, y)
+        y1 = min(self.height, y + h)
+        if x0 >= x1 or y0 >= y1:
+            return
+        if x1 - x0 == EPD_WIDTH // 8 and y1 - y0 == EPD_HEIGHT:
+            self.show() # No need for the window commands
+            return
+        cmd = self._command
+        # Y decrement entry mode: frame buffer row r is RAM row EPD_HEIGHT - 1 - r
+        ys = EPD_HEIGHT - 1 - y0
+        ye = EPD_HEIGHT - y1
+        cmd(b'\x44', bytes((x0, x1 - 1)))  # set Ram-X address start/end position
+        cmd(b'\x45', bytes((ys & 0xFF, ys >> 8, ye & 0xFF, ye >> 8)))  # set Ram-Y address start/end position
+        for ram in (b'\x24', b'\x26'):
+            cmd(b'\x4E', bytes((x0,)))
+            cmd(b'\x4F', bytes((ys & 0xFF, ys >> 8)))
+            self._write_rows(ram, x0, x1, y0, y1)
+        self._diff.commit_window(self._mvb, x0, x1, y0, y1)
+
+        # Full window for show()
+        cmd(b'\x44', b'\x00\x18')
+        cmd(b'\x45', b'\xC7\x00\x00\x00')
+        cmd(b'\x4E', b'\x00')
+        cmd(b'\x4F', b'\xC7\x00')
+        self._update(tm)
+
+
+    def changed(self) -> Tuple[int, int, int, int]:
+        # Area (x, y, w, h) of the frame buffer that differs from the frame last
+        # sent to the controller, None if they are identical. The dirty byte
+        # spans per row are in self._diff.spans. Not counted, a caller that
+        # skips the refresh on None reports it with note_identical()
+        if self._identical():
+            return None
+        if self._diff is None or not self._ram_valid:
+            return 0, 0, self.width, self.height
+        self._diff.diff(self._buffer)
+        return self._diff.bbox
+
+
+    def note_identical(self) -> None:
+        # A refresh of the frame on the panel has been avoided
+        metrics.inc(_M_IDENTICAL)
+
+
+    def _identical(self) -> bool:
+        # The panel shows the frame buffer already and force_full_refresh() is
+        # not pending. A due periodic full refresh waits for the next changed
+        # frame
+        if self._last_full_update_ts == 0:
+            return False
+        if self._lsc:
+            return self._crc == crc(self._buffer)
+        return self._diff.same(self._buffer)
+
+
+    def _write_rows(self, ram: bytes, x0: int, x1: int, y0: int, y1: int) -> None:
+        mvb = self._mvb
+        send = self._spi.write
+        row_bytes = EPD_WIDTH // 8
+        self._cs.value(0)
+        self._dc.value(0)
+        send(ram)
+        self._dc.value(1)
+        for r in range(y0, y1):
+            send(mvb[r * row_bytes + x0:r * row_bytes + x1])
+        self._cs.value(1)
+
+
+    def _update(self, tm: int) -> None:
         if self._asyn:
             self._updated.set()  # framebuf has now been copied to the device
             self._updated.clear()
@@ -210,9 +329,7 @@ class EPD(framebuf.FrameBuffer):
             asyncio.create_task(self._as_show())
         else:
             self._activate_display()
-
-            te = ticks_ms()
-            # print('show time', ticks_diff(te, t), 'ms')
+            metrics.stop(_M_SHOW, tm)
             if not self.demo_mode:
                 # Immediate return to avoid blocking the whole application.
                 # User should wait for ready before calling refresh()
@@ -224,13 +341,15 @@ class EPD(framebuf.FrameBuffer):
 
     def _activate_display(self) -> None:
         now = utime.ticks_ms()
-        if self._last_full_update_ts == 0 \
-            or utime.ticks_diff(now, self._last_full_update_ts) > self._fullRefreshCycle:
+        self._refresh_full = self._last_full_update_ts == 0 \
+            or utime.ticks_diff(now, self._last_full_update_ts) > self._fullRefreshCycle
+        if self._refresh_full:
             self._command(b'\x22', b'\xF7') # DISPLAY_UPDATE_CONTROL_1
         else:
             self._command(b'\x22', b'\xFF') # DISPLAY_UPDATE_CONTROL_2
 
         self._command(b'\x20') # MASTER_ACTIVATION
+        self._refresh_ts = utime.ticks_ms() or 1
         self._last_full_update_ts = now
 
 
@@ -0,0 +1,205 @@
+# fbdiff.py Changed area of a 1-bit frame buffer against the last frame sent
+
+# Released under the MIT License (MIT). See LICENSE.
+# Copyright (c) Christof Rath 2021
+
+# FrameDiff keeps a copy of the frame last sent to the display (commit()).
+# diff() compares the frame buffer with it: an identical frame is detected by
+# a single bytes compare (memcmp) and returns False at once, otherwise a viper
+# loop compares 32 bit words and only looks at the bytes of the words that
+# differ. The result is a dirty byte span per row (spans[2 * r] ..
+# spans[2 * r + 1], exclusive, both 0 for an unchanged row) and the bounding
+# box in pixels (bbox, rounded to bytes), ready for EPD.show_window().
+#
+# crc() hashes a frame for drivers that keep no copy (landscape EPD): CRC-32
+# of binascii, a table driven viper loop on builds without binascii.crc32.
+#
+# Works on MONO_HLSB buffers whose size is a multiple of 4 bytes (the 200 x 200
+# EPD: 5000 bytes, 1250 words). As in gui.core.glyphblit the viper function
+# gets the geometry in a preallocated array (4 arguments max).
+
+# Usage:
+# fd = FrameDiff(200, 200)
+# fd.commit(ssd._buffer)  # After show()
+# if fd.diff(ssd._buffer):
+#     ssd.show_window(*fd.bbox)
+
+import micropython
+from array import array
+from micropython import const
+
+try:
+    from binascii import crc32
+except ImportError:
+    crc32 = None
+
+# Indices into _params
+_STRIDE = const(0)  # Bytes per buffer row
+_WORDS = const(1)
+_TOP = const(2)  # Rows and byte columns of the last diff, end exclusive
+_BOTTOM = const(3)
+_LEFT = const(4)
+_RIGHT = const(5)
+
+if hasattr(memoryview, 'cast'):
+    # CPython (sim/): the ptr32 shim indexes the object as it is
+    def _words(buf):
+        return memoryview(buf).cast('I')
+else:
+    def _words(buf):
+        return buf
+
+
+@micropython.viper
+def _diff(cur: ptr32, prev: ptr32, spans: ptr16, p: ptr32) -> int:
+    # Number of differing words, fills spans and the box in p
+    stride = p[_STRIDE]
+    r = p[_TOP]
+    end = p[_BOTTOM]
+    while r < end:  # Clear the spans of the last diff
+        spans[2 * r] = 0
+        spans[2 * r + 1] = 0
+        r += 1
+    top = -1
+    bottom = 0
+    left = stride
+    right = 0
+    count = 0
+    row = 0
+    row_start = 0
+    row_end = stride
+    n = p[_WORDS]
+    i = 0
+    while i < n:
+        x = cur[i] ^ prev[i]
+        if x:
+            count += 1
+            o = i << 2
+            k = 0
+            while k < 32:
+                if (x >> k) & 0xFF:
+                    while o >= row_end:
+                        row += 1
+                        row_start = row_end
+                        row_end += stride
+                    c = o - row_start
+                    if spans[2 * row + 1] == 0:  # First dirty byte of the row
+                        spans[2 * row] = c
+                        if top < 0:
+                            top = row
+                    spans[2 * row + 1] = c + 1
+                    bottom = row + 1
+                    if c < left:
+                        left = c
+                    if c >= right:
+                        right = c + 1
+                o += 1
+                k += 8
+        i += 1
+    p[_TOP] = top
+    p[_BOTTOM] = bottom
+    p[_LEFT] = left
+    p[_RIGHT] = right
+    return count
+
+
+@micropython.viper
+def _crc32(buf: ptr8, n: int, table: ptr32, crc: int) -> int:
+    # Masks instead of unsigned shifts, the same code runs on CPython
+    c = crc ^ -1
+    i = 0
+    while i < n:
+        c = table[(c ^ buf[i]) & 0xFF] ^ ((c >> 8) & 0xFFFFFF)
+        i += 1
+    return c ^ -1
+
+
+_table = None
+
+
+def crc(buf):
+    # CRC-32 of a frame buffer
+    global _table
+    if crc32 is not None:
+        return crc32(buf)
+    if _table is None:
+        _table = array('I', [0] * 256)
+        for i in range(256):
+            c = i
+            for _ in range(8):
+                c = (c >> 1) ^ 0xEDB88320 if c & 1 else c >> 1
+            _table[i] = c
+    return _crc32(buf, len(buf), _table, 0) & 0xFFFFFFFF
+
+
+class FrameDiff():
+    def __init__(self, width, height):
+        stride = (width + 7) >> 3
+        size = stride * height
+        if size & 3:
+            raise ValueError('Frame size must be a multiple of 4 bytes.')
+        self.stride = stride
+        self.height = height
+        self.spans = array('H', [0] * (2 * height))
+        self.bbox = None  # (x, y, width, height) of the last diff(), None if identical
+        self._prev = bytearray(size)
+        self._prev_words = _words(self._prev)
+        self._params = array('i', [stride, size >> 2, 0, 0, 0, 0])
+        self._valid = False  # _prev holds the frame on the display
+
+    def invalidate(self):
+        self._valid = False
+
+    def same(self, buf):
+        # True if buf is the committed frame
+        return self._valid and buf == self._prev
+
+    def diff(self, buf):
+        # True if buf differs from the committed frame
+        if not self._valid:
+            self._all()
+            return True
+        if buf == self._prev:
+            if self.bbox is not None:
+                self._clear()
+            return False
+        p = self._params
+        _diff(_words(buf), self._prev_words, self.spans, p)
+        left = p[_LEFT]
+        self.bbox = (left << 3, p[_TOP], (p[_RIGHT] - left) << 3, p[_BOTTOM] - p[_TOP])
+        return True
+
+    def _clear(self):
+        spans = self.spans
+        p = self._params
+        for r in range(p[_TOP], p[_BOTTOM]):
+            spans[2 * r] = 0
+            spans[2 * r + 1] = 0
+        p[_TOP] = p[_BOTTOM] = 0
+        self.bbox = None
+
+    def _all(self):
+        # Everything dirty, nothing is known about the display
+        spans = self.spans
+        stride = self.stride
+        for r in range(self.height):
+            spans[2 * r] = 0
+            spans[2 * r + 1] = stride
+        p = self._params
+        p[_TOP] = p[_LEFT] = 0
+        p[_BOTTOM] = self.height
+        p[_RIGHT] = stride
+        self.bbox = (0, 0, stride << 3, self.height)
+
+    def commit(self, buf):
+        # buf has been sent to the display
+        self._prev[:] = buf
+        self._valid = True
+
+    def commit_window(self, buf, xa, xb, y0, y1):
+        # Byte columns xa .. xb - 1 of the rows y0 .. y1 - 1 have been sent
+        prev = self._prev
+        stride = self.stride
+        for r in range(y0, y1):
+            o = r * stride
+            prev[o + xa:o + xb] = buf[o + xa:o + xb]
@@ -0,0 +1,322 @@
+# binfont.py Fonts in a binary container with constant time glyph lookup
+
+# Released under the MIT License (MIT). See LICENSE.
+# Copyright (c) Christof Rath 2021
+
+# The container is created from a font_to_py module by tools/font_to_bin.py.
+# Freeze the generated bytes module into the firmware and the glyphs are read
+# from flash through a memoryview, no copy in RAM. A container file on the
+# filesystem stays open: only the index (header, widths, offsets) is loaded,
+# a glyph record is read into a reused buffer when it is needed, so a glyph
+# returned by get_ch() is valid until the next lookup. A BinFont offers the
+# functions of a font_to_py module, so it can be passed to a Writer or
+# gui.core.fontreg.get_writer() instead of the module.
+#
+# Layout (little endian):
+#   header   16 bytes: magic b'FNT1', flags (bit 0 hmap, 1 reverse,
+#            2 monospaced, 3 packbits), height, max_width, baseline,
+#            min_ch (H), max_ch (H), glyph count n (H), 2 bytes reserved
+#   widths   n bytes, glyph i is chr(min_ch + i), the last one is the
+#            default glyph for chars outside the range; padded to 4 bytes
+#   offsets  n * 4 bytes, start of each glyph relative to the container
+#   glyphs   rows of ((width - 1) // 8 + 1) bytes, height rows per glyph
+#
+# Uncompressed: get_ch() returns the same tuple for a char on every call: it
+# is created on the first lookup of the glyph, after that the lookup
+# allocates nothing. glyph_index(), width() and offset() give allocation free
+# access to the raw data for renderers that blit straight from the container.
+#
+# Compressed (packbits flag, tools/font_to_bin.py --compress): each row is
+# stored as XOR with the row above and the resulting byte stream of the glyph
+# is PackBits encoded, so vertical strokes turn into runs of zeros. blit()
+# decodes a glyph row by row straight into the buffer of a MONO_HLSB device
+# (EPD._buffer): a viper loop expands the runs into one reused row and merges
+# it under a mask like gui.core.glyphblit, nothing is allocated per glyph or
+# row. get_ch() decodes into a small cache of cache_size glyphs (round robin),
+# which trades RAM for render time: a hit costs the same as an uncompressed
+# lookup.
+
+import framebuf
+import micropython
+from array import array
+from micropython import const
+
+MAGIC = b'FNT1'
+HEADER_SIZE = const(16)
+FLAG_HMAP = const(1)
+FLAG_REVERSE = const(2)
+FLAG_MONOSPACED = const(4)
+FLAG_PACKBITS = const(8)
+_NO_SLOT = const(0xFF)
+
+# Indices into _params
+_SRC = const(0)  # Offset of the PackBits stream
+_BPR = const(1)  # Bytes per glyph row
+_HEIGHT = const(2)
+_WIDTH = const(3)  # Columns to render
+_STRIDE = const(4)  # Bytes per destination row
+_BUF_W = const(5)
+_BUF_H = const(6)
+_X = const(7)
+_Y = const(8)
+_INVERT = const(9)
+
+_params = array('i', [0] * 10)
+
+
+@micropython.viper
+def _unpack(dst: ptr8, src: ptr8, row: ptr8, p: ptr32):
+    # Decodes a glyph into row, one row at a time, and merges each row at
+    # x, y + r into dst. The whole stream is read, clipped rows included
+    s = p[_SRC]
+    bpr = p[_BPR]
+    stride = p[_STRIDE]
+    x = p[_X]
+    y = p[_Y]
+    bh = p[_BUF_H]
+    flip = 0xFF if p[_INVERT] else 0
+    c0 = 0 - x if x < 0 else 0  # Visible columns [c0, c1)
+    c1 = p[_WIDTH]
+    if x + c1 > p[_BUF_W]:
+        c1 = p[_BUF_W] - x
+    i = 0
+    while i < bpr:
+        row[i] = 0
+        i += 1
+    run = 0
+    literal = 0
+    value = 0
+    r = 0
+    height = p[_HEIGHT]
+    while r < height:
+        i = 0
+        while i < bpr:
+            while run == 0:  # Next PackBits header, 128 is a no-op
+                n = src[s]
+                s += 1
+                if n < 128:
+                    run = n + 1
+                    literal = 1
+                elif n > 128:
+                    run = 257 - n
+                    literal = 0
+                    value = src[s]
+                    s += 1
+            if literal:
+                value = src[s]
+                s += 1
+            run -= 1
+            row[i] = (row[i] ^ value) & 0xFF
+            i += 1
+        dy = y + r
+        if dy >= 0 and dy < bh and c0 < c1:
+            drow = dy * stride
+            k = c0 >> 3
+            k1 = (c1 + 7) >> 3
+            while k < k1:
+                col = k << 3
+                m = 0xFF
+                if c0 > col:
+                    m = m >> (c0 - col)
+                if c1 < col + 8:
+                    m = m & (0xFF << (col + 8 - c1))
+                v = ((row[k] ^ flip) & m) << 8
+                m = m << 8
+                dx = x + col
+                sh = dx & 7
+                v = v >> sh
+                m = m >> sh
+                db = drow + (dx >> 3)
+                mh = (m >> 8) & 0xFF
+                if mh:
+                    dst[db] = ((dst[db] & (mh ^ 0xFF)) | (v >> 8)) & 0xFF
+                ml = m & 0xFF
+                if ml:
+                    dst[db + 1] = ((dst[db + 1] & (ml ^ 0xFF)) | v) & 0xFF
+                k += 1
+        r += 1
+
+
+class BinFont():
+    def __init__(self, source, cache_size=6):
+        # source: bytes/bytearray/memoryview of a container or a file name
+        # cache_size: decoded glyphs kept by get_ch() of a compressed font
+        self._file = None
+        if isinstance(source, str):
+            f = open(source, 'rb')
+            index = bytearray(HEADER_SIZE)
+            f.readinto(index)
+            if index[0:4] != MAGIC:
+                f.close()
+                raise ValueError('Not a binary font (magic {})'.format(bytes(index[0:4])))
+            count = index[12] | index[13] << 8
+            index = bytearray(HEADER_SIZE + (count + 3) // 4 * 4 + 4 * count)
+            f.seek(0)
+            f.readinto(index)
+            self._file = f
+            source = index
+        data = memoryview(source)
+        if bytes(data[0:4]) != MAGIC:
+            raise ValueError('Not a binary font (magic {})'.format(bytes(data[0:4])))
+        self.data = data
+        self._flags = data[4]
+        self._height = data[5]
+        self._max_width = data[6]
+        self._baseline = data[7]
+        self._min_ch = data[8] | data[9] << 8
+        self._max_ch = data[10] | data[11] << 8
+        self.count = data[12] | data[13] << 8
+        self._widths = HEADER_SIZE
+        self._offsets = HEADER_SIZE + (self.count + 3) // 4 * 4
+        if self._file is not None:
+            # Largest record: distance to the next record (glyphs may share one)
+            starts = sorted(set(self.offset(i) for i in range(self.count)))
+            starts.append(self._file.seek(0, 2))
+            size = max(starts[i + 1] - starts[i] for i in range(len(starts) - 1))
+            del starts
+            self._record = bytearray(size)  # Glyph record read from the file
+            self._record_mv = memoryview(self._record)
+        if not self._flags & FLAG_PACKBITS:
+            self._cache = [None] * self.count if self._file is None else None  # Glyph tuples
+        else:
+            bpr = (self._max_width - 1) // 8 + 1
+            self._row = bytearray(bpr)  # Current row, also the base of the next delta
+            if not 0 < cache_size < _NO_SLOT:
+                raise ValueError('cache_size must be between 1 and {}'.format(_NO_SLOT - 1))
+            self._slots = [bytearray(bpr * self._height) for _ in range(cache_size)]
+            self._slot_glyph = [None] * cache_size  # Glyph tuples
+            self._slot_idx = array('H', [0] * cache_size)  # Glyph index held by a slot
+            self._slot_of = bytearray(_NO_SLOT for _ in range(self.count))
+            self._next_slot = 0
+
+    def height(self):
+        return self._height
+
+    def baseline(self):
+        return self._baseline
+
+    def max_width(self):
+        return self._max_width
+
+    def hmap(self):
+        return bool(self._flags & FLAG_HMAP)
+
+    def reverse(self):
+        return bool(self._flags & FLAG_REVERSE)
+
+    def monospaced(self):
+        return bool(self._flags & FLAG_MONOSPACED)
+
+    def min_ch(self):
+        return self._min_ch
+
+    def max_ch(self):
+        return self._max_ch
+
+    def glyph_index(self, ch):
+        idx = ord(ch) - self._min_ch
+        if 0 <= idx < self.count - 1:
+            return idx
+        return self.count - 1  # Default glyph
+
+    def width(self, idx):
+        return self.data[self._widths + idx]
+
+    def offset(self, idx):
+        d = self.data
+        o = self._offsets + 4 * idx
+        return d[o] | d[o + 1] << 8 | d[o + 2] << 16 | d[o + 3] << 24
+
+    def width_table(self):
+        # Widths of min_ch .. max_ch followed by the default glyph
+        return self.data[self._widths:self._widths + self.count]
+
+    def compressed(self):
+        return bool(self._flags & FLAG_PACKBITS)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _read(self, idx):
+        # Buffer and start of the record of glyph idx
+        if self._file is None:
+            return self.data, self.offset(idx)
+        f = self._file
+        f.seek(self.offset(idx))
+        f.readinto(self._record)  # May run past the record or end short at the end of the file
+        return self._record, 0
+
+    def _decode(self, idx, buf, buf_width, buf_height, x=0, y=0, invert=False, width=0):
+        # Decodes glyph idx into the MONO_HLSB buffer buf with its top left
+        # corner at x, y; width: columns to render, 0 for the glyph width
+        gw = self.width(idx)
+        if gw == 0:
+            return
+        bpr = (gw - 1) // 8 + 1
+        src, start = self._read(idx)
+        p = _params
+        p[_SRC] = start
+        p[_BPR] = bpr
+        p[_HEIGHT] = self._height
+        p[_WIDTH] = width or gw
+        p[_STRIDE] = (buf_width + 7) >> 3
+        p[_BUF_W] = buf_width
+        p[_BUF_H] = buf_height
+        p[_X] = x
+        p[_Y] = y
+        p[_INVERT] = 1 if invert else 0
+        _unpack(buf, src, self._row, p)
+
+    def blit(self, ch, dev, x, y, invert=False):
+        # Renders ch at x, y (top left) into the frame buffer of dev, returns
+        # the width. A compressed font needs a MONO_HLSB device with _buffer
+        idx = self.glyph_index(ch)
+        if self._flags & FLAG_PACKBITS:
+            if getattr(dev, 'mode', None) != framebuf.MONO_HLSB or not hasattr(dev, '_buffer'):
+                raise ValueError('blit() of a compressed font needs a MONO_HLSB device with a _buffer.')
+            self._decode(idx, dev._buffer, dev.width, dev.height, x, y, invert)
+            return self.width(idx)
+        glyph, height, width = self.get_ch(ch)
+        if width:
+            buf = bytearray(glyph)
+            if invert:
+                for i, v in enumerate(buf):
+                    buf[i] = 0xFF & ~v
+            dev.blit(framebuf.FrameBuffer(buf, width, height, framebuf.MONO_HLSB), x, y)
+        return width
+
+    def get_ch(self, ch):
+        idx = self.glyph_index(ch)
+        if self._flags & FLAG_PACKBITS:
+            return self._cached(idx)
+        if self._file is not None:  # Valid until the next lookup
+            width = self.width(idx)
+            self._read(idx)
+            return self._record_mv[:((width - 1) // 8 + 1) * self._height], self._height, width
+        glyph = self._cache[idx]
+        if glyph is None:
+            width = self.width(idx)
+            offset = self.offset(idx)
+            glyph = (self.data[offset:offset + ((width - 1) // 8 + 1) * self._height], self._height, width)
+            self._cache[idx] = glyph
+        return glyph
+
+    def _cached(self, idx):
+        slot = self._slot_of[idx]
+        if slot != _NO_SLOT:
+            return self._slot_glyph[slot]
+        slot = self._next_slot
+        self._next_slot = (slot + 1) % len(self._slots)
+        if self._slot_glyph[slot] is not None:
+            self._slot_of[self._slot_idx[slot]] = _NO_SLOT
+        buf = self._slots[slot]
+        width = self.width(idx)
+        bpr = (width - 1) // 8 + 1
+        self._decode(idx, buf, bpr * 8, self._height, width=bpr * 8)  # Whole bytes, as stored
+        glyph = (memoryview(buf)[:((width - 1) // 8 + 1) * self._height], self._height, width)
+        self._slot_glyph[slot] = glyph
+        self._slot_idx[slot] = idx
+        self._slot_of[idx] = slot
+        return glyph
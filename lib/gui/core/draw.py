@@ -0,0 +1,414 @@
+# draw.py Drawing primitives in viper on a MONO_HLSB frame buffer
+
+# Released under the MIT License (MIT). See LICENSE.
+# Copyright (c) Christof Rath 2021
+
+# Circles, filled circles, arcs, thick lines and filled polygons for dials and
+# the analog clock. nanogui.circle() and fillcircle() call dev.pixel() or
+# dev.line() per point from interpreted Python, here the whole primitive runs
+# as native code with integer math on the raw buffer (EPD._buffer, 1 = black):
+# circle() and fillcircle() set the same pixels as the nanogui versions,
+# line() with width 1 the same as FrameBuffer.line().
+#
+# Angles are integer degrees clockwise from 12 o'clock, isin() and icos() look
+# them up in a table scaled by 2 ** 14 (Q14). Polygons and thick lines are
+# filled half open like fill_rect(): a rectangle (0, 0)-(10, 4) fills 10 x 4
+# pixels.
+#
+# As in glyphblit the viper functions get their geometry in a preallocated
+# array (4 arguments max) and mask the stored bytes, so the same code runs on
+# CPython (sim/).
+
+import micropython
+from array import array
+from micropython import const
+
+# Indices into _params
+_STRIDE = const(0)  # Bytes per buffer row
+_W = const(1)
+_H = const(2)
+_COLOR = const(3)
+_X0 = const(4)
+_Y0 = const(5)
+_X1 = const(6)  # Line end, circle radius
+_Y1 = const(7)
+_SECTOR = const(8)  # Arc: 0 full circle, 1 up to 180 degrees, 2 more
+_SX = const(9)  # Arc start and end direction (Q14)
+_SY = const(10)
+_EX = const(11)
+_EY = const(12)
+_N = const(13)  # Polygon vertices
+
+_params = array('i', [0] * 14)
+_xs = array('i', [0] * 8)  # Polygon edge crossings of a row
+
+Q14 = const(16384)
+_SIN = array('h', (
+    0, 286, 572, 857, 1143, 1428, 1713, 1997, 2280, 2563,
+    2845, 3126, 3406, 3686, 3964, 4240, 4516, 4790, 5063, 5334,
+    5604, 5872, 6138, 6402, 6664, 6924, 7182, 7438, 7692, 7943,
+    8192, 8438, 8682, 8923, 9162, 9397, 9630, 9860, 10087, 10311,
+    10531, 10749, 10963, 11174, 11381, 11585, 11786, 11982, 12176, 12365,
+    12551, 12733, 12911, 13085, 13255, 13421, 13583, 13741, 13894, 14044,
+    14189, 14330, 14466, 14598, 14726, 14849, 14968, 15082, 15191, 15296,
+    15396, 15491, 15582, 15668, 15749, 15826, 15897, 15964, 16026, 16083,
+    16135, 16182, 16225, 16262, 16294, 16322, 16344, 16362, 16374, 16382,
+    16384))  # sin(0 .. 90 degrees) in Q14
+
+
+def isin(deg):
+    deg %= 360
+    if deg <= 90:
+        return _SIN[deg]
+    if deg <= 180:
+        return _SIN[180 - deg]
+    if deg <= 270:
+        return -_SIN[deg - 180]
+    return -_SIN[360 - deg]
+
+
+def icos(deg):
+    return isin(deg + 90)
+
+
+@micropython.viper
+def _hspan(dst: ptr8, p: ptr32, y: int, xx: int):
+    # Sets row y from x = xx & 0xFFFF to x = xx >> 16 (inclusive, clipped)
+    row = y * p[_STRIDE]
+    xa = xx & 0xFFFF
+    xb = xx >> 16
+    ba = row + (xa >> 3)
+    bb = row + (xb >> 3)
+    ma = 0xFF >> (xa & 7)
+    mb = (0xFF << (7 - (xb & 7))) & 0xFF
+    if ba == bb:
+        ma = ma & mb
+    if p[_COLOR]:
+        dst[ba] = dst[ba] | ma
+        if bb != ba:
+            i = ba + 1
+            while i < bb:
+                dst[i] = 0xFF
+                i += 1
+            dst[bb] = dst[bb] | mb
+    else:
+        dst[ba] = dst[ba] & (ma ^ 0xFF)
+        if bb != ba:
+            i = ba + 1
+            while i < bb:
+                dst[i] = 0
+                i += 1
+            dst[bb] = dst[bb] & (mb ^ 0xFF)
+
+
+@micropython.viper
+def _circle(dst: ptr8, p: ptr32):
+    # Outline of radius p[_X1] around p[_X0], p[_Y0], optionally only the
+    # points within the sector of the arc
+    stride = p[_STRIDE]
+    w = p[_W]
+    h = p[_H]
+    color = p[_COLOR]
+    x0 = p[_X0]
+    y0 = p[_Y0]
+    sector = p[_SECTOR]
+    sx = p[_SX]
+    sy = p[_SY]
+    ex = p[_EX]
+    ey = p[_EY]
+    x = 0 - p[_X1]
+    y = 0
+    err = 2 - 2 * p[_X1]
+    while x <= 0:
+        q = 0
+        while q < 4:  # Mirrored points as in nanogui._circle()
+            dx = x
+            if q == 0 or q == 3:
+                dx = 0 - x
+            dy = y
+            if q >= 2:
+                dy = 0 - y
+            px = x0 + dx
+            py = y0 + dy
+            q += 1
+            if px < 0 or px >= w or py < 0 or py >= h:
+                continue
+            if sector:
+                c1 = sx * dy - sy * dx  # >= 0: clockwise from the start
+                c2 = dx * ey - dy * ex  # >= 0: counterclockwise from the end
+                if sector == 1:
+                    if c1 < 0 or c2 < 0:
+                        continue
+                elif c1 < 0 and c2 < 0:
+                    continue
+            i = py * stride + (px >> 3)
+            bit = 0x80 >> (px & 7)
+            if color:
+                dst[i] = dst[i] | bit
+            else:
+                dst[i] = dst[i] & (bit ^ 0xFF)
+        e2 = err
+        if e2 <= y:
+            y += 1
+            err += y * 2 + 1
+            if 0 - x == y and e2 <= x:
+                e2 = 0
+        if e2 > x:
+            x += 1
+            err += x * 2 + 1
+
+
+@micropython.viper
+def _fillcircle(dst: ptr8, p: ptr32):
+    # The rows of the vertical lines drawn by nanogui.fillcircle(): the first
+    # (widest) column reaching a row gives its half width
+    w = p[_W]
+    h = p[_H]
+    x0 = p[_X0]
+    y0 = p[_Y0]
+    x = 0 - p[_X1]
+    y = 0
+    err = 2 - 2 * p[_X1]
+    last = -1
+    while x <= 0:
+        if y != last:
+            last = y
+            xa = x0 + x
+            xb = x0 - x
+            if xa < 0:
+                xa = 0
+            if xb >= w:
+                xb = w - 1
+            if xa <= xb:
+                if y0 - y >= 0 and y0 - y < h:
+                    _hspan(dst, p, y0 - y, xa | (xb << 16))
+                if y and y0 + y >= 0 and y0 + y < h:
+                    _hspan(dst, p, y0 + y, xa | (xb << 16))
+        e2 = err
+        if e2 <= y:
+            y += 1
+            err += y * 2 + 1
+            if 0 - x == y and e2 <= x:
+                e2 = 0
+        if e2 > x:
+            x += 1
+            err += x * 2 + 1
+
+
+@micropython.viper
+def _line(dst: ptr8, p: ptr32):
+    # Bresenham as FrameBuffer.line() (extmod/modframebuf.c)
+    stride = p[_STRIDE]
+    w = p[_W]
+    h = p[_H]
+    color = p[_COLOR]
+    x1 = p[_X0]
+    y1 = p[_Y0]
+    x2 = p[_X1]
+    y2 = p[_Y1]
+    dx = x2 - x1
+    sx = 1
+    if dx < 0:
+        sx = -1
+        dx = 0 - dx
+    dy = y2 - y1
+    sy = 1
+    if dy < 0:
+        sy = -1
+        dy = 0 - dy
+    steep = 0
+    if dy > dx:
+        steep = 1
+        t = x1
+        x1 = y1
+        y1 = t
+        t = dx
+        dx = dy
+        dy = t
+        t = sx
+        sx = sy
+        sy = t
+    e = 2 * dy - dx
+    n = 0
+    while n <= dx:
+        if n == dx:  # End point
+            px = x2
+            py = y2
+        elif steep:
+            px = y1
+            py = x1
+        else:
+            px = x1
+            py = y1
+        if px >= 0 and px < w and py >= 0 and py < h:
+            i = py * stride + (px >> 3)
+            bit = 0x80 >> (px & 7)
+            if color:
+                dst[i] = dst[i] | bit
+            else:
+                dst[i] = dst[i] & (bit ^ 0xFF)
+        while e >= 0:
+            y1 += sy
+            e -= 2 * dx
+        x1 += sx
+        e += 2 * dy
+        n += 1
+
+
+@micropython.viper
+def _poly(dst: ptr8, p: ptr32, v: ptr32, xs: ptr32):
+    # Even-odd scanline fill of the rows p[_Y0] .. p[_Y1] - 1, vertices v
+    n = p[_N]
+    w = p[_W]
+    y = p[_Y0]
+    y_end = p[_Y1]
+    while y < y_end:
+        k = 0
+        i = 0
+        while i < n:
+            ax = v[2 * i]
+            ay = v[2 * i + 1]
+            j = i + 1
+            if j == n:
+                j = 0
+            bx = v[2 * j]
+            by = v[2 * j + 1]
+            if (ay <= y and y < by) or (by <= y and y < ay):
+                xs[k] = ax + (y - ay) * (bx - ax) // (by - ay)
+                k += 1
+            i += 1
+        i = 1
+        while i < k:  # Insertion sort of the crossings
+            t = xs[i]
+            j = i - 1
+            while j >= 0 and xs[j] > t:
+                xs[j + 1] = xs[j]
+                j -= 1
+            xs[j + 1] = t
+            i += 1
+        i = 0
+        while i + 1 < k:
+            xa = xs[i]
+            xb = xs[i + 1] - 1
+            if xa < 0:
+                xa = 0
+            if xb >= w:
+                xb = w - 1
+            if xa <= xb:
+                _hspan(dst, p, y, xa | (xb << 16))
+            i += 2
+        y += 1
+
+
+def _setup(buf_width, buf_height, color):
+    p = _params
+    p[_STRIDE] = (buf_width + 7) >> 3
+    p[_W] = buf_width
+    p[_H] = buf_height
+    p[_COLOR] = 1 if color else 0
+    p[_SECTOR] = 0
+    return p
+
+
+def circle(buf, buf_width, buf_height, x0, y0, r, color, width=1):
+    p = _setup(buf_width, buf_height, color)
+    p[_X0] = x0
+    p[_Y0] = y0
+    for r in range(r, r - width, -1):
+        p[_X1] = r
+        _circle(buf, p)
+
+
+def fillcircle(buf, buf_width, buf_height, x0, y0, r, color):
+    p = _setup(buf_width, buf_height, color)
+    p[_X0] = x0
+    p[_Y0] = y0
+    p[_X1] = r
+    _fillcircle(buf, p)
+
+
+def arc(buf, buf_width, buf_height, x0, y0, r, start, end, color, width=1):
+    # Clockwise from start to end (degrees from 12 o'clock)
+    p = _setup(buf_width, buf_height, color)
+    span = (end - start) % 360
+    if span:  # 0: full circle
+        p[_SECTOR] = 1 if span <= 180 else 2
+        p[_SX] = isin(start)
+        p[_SY] = -icos(start)
+        p[_EX] = isin(end)
+        p[_EY] = -icos(end)
+    p[_X0] = x0
+    p[_Y0] = y0
+    for r in range(r, r - width, -1):
+        p[_X1] = r
+        _circle(buf, p)
+
+
+def fill_poly(buf, buf_width, buf_height, points, color):
+    # points: array('i') of x, y pairs
+    global _xs
+    n = len(points) // 2
+    if n < 3:
+        return
+    p = _setup(buf_width, buf_height, color)
+    y0 = y1 = points[1]
+    for i in range(3, 2 * n, 2):
+        y0 = min(y0, points[i])
+        y1 = max(y1, points[i])
+    p[_Y0] = max(0, y0)
+    p[_Y1] = min(buf_height, y1)
+    p[_N] = n
+    if len(_xs) < n:
+        _xs = array('i', [0] * n)
+    _poly(buf, p, points, _xs)
+
+
+def _isqrt(n):
+    x = n
+    y = (x + 1) >> 1
+    while y < x:
+        x = y
+        y = (x + n // x) >> 1
+    return x
+
+
+def _div_round(a, b):
+    # a / b rounded half away from zero, b > 0
+    if a >= 0:
+        return (a + (b >> 1)) // b
+    return -((-a + (b >> 1)) // b)
+
+
+_quad = array('i', [0] * 8)
+
+
+def line(buf, buf_width, buf_height, x0, y0, x1, y1, color, width=1):
+    # width > 1: a rectangle centred on the line, square ends at the points
+    if width <= 1:
+        p = _setup(buf_width, buf_height, color)
+        p[_X0] = x0
+        p[_Y0] = y0
+        p[_X1] = x1
+        p[_Y1] = y1
+        _line(buf, p)
+        return
+    dx = x1 - x0
+    dy = y1 - y0
+    n = _isqrt(dx * dx + dy * dy)
+    if n == 0:
+        return
+    # Edges at +-width / 2 from the centre line, rounded to whole pixels
+    fx = _div_round(-dy * width, n)
+    fy = _div_round(dx * width, n)
+    ox = fx - (fx >> 1)  # The far edge is excluded: centred as [c - width // 2, c + width - width // 2)
+    oy = fy - (fy >> 1)
+    q = _quad
+    q[0] = x0 + ox
+    q[1] = y0 + oy
+    q[2] = x1 + ox
+    q[3] = y1 + oy
+    q[4] = x1 + ox - fx
+    q[5] = y1 + oy - fy
+    q[6] = x0 + ox - fx
+    q[7] = y0 + oy - fy
+    fill_poly(buf, buf_width, buf_height, q, color)
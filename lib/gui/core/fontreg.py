@@ -0,0 +1,76 @@
+# fontreg.py Registry of shared Writer instances and precomputed font metrics
+
+# Released under the MIT License (MIT). See LICENSE.
+# Copyright (c) Christof Rath 2021
+
+# A font_to_py module is queried through function calls (height(), max_width(),
+# get_ch(), ...) and every Writer validates the font again on construction.
+# The registry does this work once per font and hands out a single Writer per
+# (device, font) pair. It is the only place Writers for the clock states are
+# made: states, widgets and benchmarks all call get_writer(). A shared Writer
+# must be left as it was found, e.g. clip settings are restored after use.
+
+# Usage:
+# from gui.core.fontreg import get_writer
+# wri = get_writer(ssd, freesans20)
+
+from gui.core.writer import Writer
+
+_metrics = {}  # Index font module, value is its FontMetrics
+_writers = {}  # Index (device id, font module), value is the shared Writer
+
+
+class FontMetrics():
+    def __init__(self, font):
+        self.font = font
+        self.height = font.height()
+        # Fonts from font_to_py versions before 0.3 do not report a baseline
+        self.baseline = font.baseline() if hasattr(font, 'baseline') else self.height
+        self.max_width = font.max_width()
+        self.min_ch = font.min_ch()
+        self.max_ch = font.max_ch()
+        n = self.max_ch - self.min_ch + 1
+        if hasattr(font, 'width_table'):  # gui.core.binfont.BinFont: copy its table
+            table = font.width_table()
+            self.widths = bytearray(table[:n])
+            self.default_width = table[n]
+            return
+        self.widths = bytearray(n)  # Advance width per glyph, dense from min_ch
+        for i in range(n):
+            self.widths[i] = font.get_ch(chr(self.min_ch + i))[2]
+        # Chars outside the range are rendered with the font's default glyph
+        self.default_width = font.get_ch(chr(self.max_ch + 1))[2]
+
+    def width(self, char):
+        idx = ord(char) - self.min_ch
+        if 0 <= idx < len(self.widths):
+            return self.widths[idx]
+        return self.default_width
+
+    def stringlen(self, string):
+        widths = self.widths
+        n = len(widths)
+        min_ch = self.min_ch
+        l = 0
+        for char in string:
+            idx = ord(char) - min_ch
+            l += widths[idx] if 0 <= idx < n else self.default_width
+        return l
+
+
+def metrics(font):
+    m = _metrics.get(font)
+    if m is None:
+        m = FontMetrics(font)
+        _metrics[font] = m
+    return m
+
+
+def get_writer(device, font):
+    key = (id(device), font)
+    wri = _writers.get(key)
+    if wri is None:
+        wri = Writer(device, font, False)
+        wri.metrics = metrics(font)
+        _writers[key] = wri
+    return wri
@@ -27,6 +27,7 @@ from gui.core.nanogui import DObject, circle
 from cmath import rect, pi
 from micropython import const
 from array import array
+import framebuf
 
 type_gen = type((lambda: (yield))())
 
@@ -178,6 +179,60 @@ class TSequence(Curve):
         self.point()
 
 
+# Incremental TSequence for live charts on a monochrome device: the curve is
+# kept in an offscreen buffer of the plot area which scrolls left by one step
+# per sample (FrameBuffer.scroll), only the newest segment is drawn. add()
+# copies the grid rendered by the graph and the curve (key blit) to the device
+# and returns the newly exposed strip (x, y, w, h) holding the new segment as
+# the window for a partial refresh; show() returns the whole plot area, for
+# the full refresh that moves the older samples on the panel. The work per
+# sample does not depend on the number of samples shown.
+class ScrollSequence(Curve):
+    def __init__(self, graph, color, size, yorigin=0, yexc=1):
+        super().__init__(graph, color, origin=(0, yorigin), excursion=(1, yexc))
+        self.size = size
+        self.step = round(graph.x_axis_len / size)  # Pixels per sample
+        if self.step < 1:
+            raise ValueError('Graph too narrow for {} samples.'.format(size))
+        w = graph.width + 1  # Grid lines at x1 and y1 included
+        h = graph.height + 1
+        self.window = (graph.x0, graph.y0, w, h)
+        self._grid = framebuf.FrameBuffer(bytearray(((w + 7) >> 3) * h), w, h, framebuf.MONO_HLSB)
+        self._grid.blit(graph.device, -graph.x0, -graph.y0)  # Reuse the rendered grid
+        self._curve = framebuf.FrameBuffer(bytearray(((w + 7) >> 3) * h), w, h, framebuf.MONO_HLSB)
+        self._px = round(graph.xp_origin) - graph.x0  # Column of the newest sample
+        self._py = None  # Row of the last sample, None after a gap
+        # Columns of the newest segment, both ends included
+        x0 = max(0, self._px - self.step)
+        self.strip = (graph.x0 + x0, graph.y0, min(w, self._px + 1) - x0, h)
+
+    def add(self, v=None):
+        # Appends a sample, None leaves a gap
+        curve = self._curve
+        step = self.step
+        px = self._px
+        curve.scroll(-step, 0)
+        curve.fill_rect(px - step + 1, 0, self.window[2], self.window[3], 0)
+        if v is None:
+            self._py = None
+        else:
+            g = self.graph
+            py = round(g.yp_origin - self._scale(0, v)[1] * g.y_axis_len) - g.y0
+            if self._py is not None:
+                curve.line(px - step, self._py, px, py, self.color)
+            self._py = py
+        self.show()
+        return self.strip
+
+    def show(self):
+        # Draws grid and curve, returns the rectangle
+        x, y, _, _ = self.window
+        dev = self.graph.device
+        dev.blit(self._grid, x, y)
+        dev.blit(self._curve, x, y, 0)
+        return self.window
+
+
 class Graph(DObject):
     def __init__(self, writer, row, col, height, width, fgcolor, bgcolor, bdcolor, gridcolor):
         super().__init__(writer, row, col, height, width, fgcolor, bgcolor, bdcolor)
@@ -0,0 +1,99 @@
+# glyphblit.py Render glyphs straight into a MONO_HLSB frame buffer
+
+# Released under the MIT License (MIT). See LICENSE.
+# Copyright (c) Christof Rath 2021
+
+# Replaces the bytearray copy + framebuf.FrameBuffer + blit() of
+# Writer._printchar for MONO_HLSB devices (the EPD in portrait mode): every
+# glyph byte is shifted to the bit offset of the destination column and merged
+# under a mask into the buffer. Pixels of the glyph box are replaced like
+# FrameBuffer.blit() does, inverted text just flips the source bits, no
+# temporary buffer. The glyph is clipped to the buffer and to width columns.
+#
+# The viper function takes at most 4 arguments, the geometry is passed in a
+# preallocated array. The values are masked to 8 bits before they are stored,
+# so the same code runs on CPython (sim/) where the pointers are the buffers.
+
+import micropython
+from array import array
+from micropython import const
+
+# Indices into _params
+_BUF_STRIDE = const(0)  # Bytes per buffer row
+_BUF_W = const(1)
+_BUF_H = const(2)
+_GLYPH_STRIDE = const(3)  # Bytes per glyph row
+_WIDTH = const(4)  # Columns to render (clip width)
+_HEIGHT = const(5)
+_X = const(6)
+_Y = const(7)
+_INVERT = const(8)
+
+_params = array('i', [0] * 9)
+
+
+@micropython.viper
+def _blit(dst: ptr8, src: ptr8, p: ptr32):
+    buf_stride = p[_BUF_STRIDE]
+    gstride = p[_GLYPH_STRIDE]
+    x = p[_X]
+    y = p[_Y]
+    flip = 0xFF if p[_INVERT] else 0
+
+    # Visible glyph columns [c0, c1) and rows [r0, r1)
+    c0 = 0 - x if x < 0 else 0
+    c1 = p[_WIDTH]
+    if x + c1 > p[_BUF_W]:
+        c1 = p[_BUF_W] - x
+    r0 = 0 - y if y < 0 else 0
+    r1 = p[_HEIGHT]
+    if y + r1 > p[_BUF_H]:
+        r1 = p[_BUF_H] - y
+    if c0 >= c1 or r0 >= r1:
+        return
+
+    k0 = c0 >> 3  # Glyph bytes holding visible columns
+    k1 = (c1 + 7) >> 3
+    r = r0
+    while r < r1:
+        srow = r * gstride
+        drow = (y + r) * buf_stride
+        k = k0
+        while k < k1:
+            col = k << 3
+            m = 0xFF
+            if c0 > col:
+                m = m >> (c0 - col)
+            if c1 < col + 8:
+                m = m & (0xFF << (col + 8 - c1))
+            v = ((src[srow + k] ^ flip) & m) << 8
+            m = m << 8
+            dx = x + col
+            sh = dx & 7
+            v = v >> sh
+            m = m >> sh
+            db = drow + (dx >> 3)
+            mh = (m >> 8) & 0xFF
+            if mh:
+                dst[db] = ((dst[db] & (mh ^ 0xFF)) | (v >> 8)) & 0xFF
+            ml = m & 0xFF
+            if ml:
+                dst[db + 1] = ((dst[db + 1] & (ml ^ 0xFF)) | v) & 0xFF
+            k += 1
+        r += 1
+
+
+def blit(buf, buf_width, buf_height, glyph, glyph_width, width, height, x, y, invert=False):
+    # Renders the first width columns of a glyph (glyph_width wide, height
+    # rows of MONO_HLSB bytes) with its top left corner at x, y into buf
+    p = _params
+    p[_BUF_STRIDE] = (buf_width + 7) >> 3
+    p[_BUF_W] = buf_width
+    p[_BUF_H] = buf_height
+    p[_GLYPH_STRIDE] = (glyph_width + 7) >> 3
+    p[_WIDTH] = width
+    p[_HEIGHT] = height
+    p[_X] = x
+    p[_Y] = y
+    p[_INVERT] = 1 if invert else 0
+    _blit(buf, glyph, p)
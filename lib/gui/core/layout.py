@@ -0,0 +1,122 @@
+# layout.py Single pass line breaking with cached results
+
+# Released under the MIT License (MIT). See LICENSE.
+# Copyright (c) Christof Rath 2021
+
+# Measures a string once with the width table of a FontMetrics
+# (gui.core.fontreg) and returns the line breaks as an array of
+# (start, end) index pairs: line k is string[a[2k]:a[2k + 1]]. Lines end at
+# '\n', at the last space that fits (the space is dropped) or, if a word is
+# wider than the line, inside the word (split=True) or not at all (the
+# renderer clips it). With clip=True an overlong line is cut and the text
+# continues after the next '\n'.
+#
+# The result of the last CACHE_SIZE layouts is kept, keyed by (string,
+# width, first line offset, flags, font), so redrawing the same text costs a
+# dict lookup. The returned arrays are shared: do not modify them.
+
+from array import array
+from micropython import const
+
+CACHE_SIZE = const(16)
+_SPLIT = const(1)
+_CLIP = const(2)
+
+_cache = {}
+_keys = [None] * CACHE_SIZE  # Insertion order for the eviction
+_next = 0
+
+
+def _layout(string, width, metrics, first_col, split, clip):
+    breaks = array('H')
+    avail = width - first_col
+    ls = 0  # Start of the current line
+    col = 0  # Width of string[ls:i]
+    space = -1  # Last space in the current line
+    after_space = 0  # Width of string[space + 1:i]
+    n = len(string)
+    i = 0
+    while i < n:
+        c = string[i]
+        if c == '\n':
+            breaks.append(ls)
+            breaks.append(i)
+            ls = i + 1
+            col = after_space = 0
+            space = -1
+            avail = width
+            i += 1
+            continue
+        w = metrics.width(c)
+        if col + w > avail and i > ls:
+            if clip:
+                breaks.append(ls)
+                breaks.append(i)
+                i = string.find('\n', i)
+                if i < 0:
+                    return breaks
+                ls = i + 1
+                col = after_space = 0
+                space = -1
+                avail = width
+                i += 1
+                continue
+            if c == ' ':  # Break at this space
+                breaks.append(ls)
+                breaks.append(i)
+                ls = i + 1
+                col = after_space = 0
+                space = -1
+                avail = width
+                i += 1
+                continue
+            if space >= ls:  # Break at the last space
+                breaks.append(ls)
+                breaks.append(space)
+                ls = space + 1
+                col = after_space
+                space = -1
+                avail = width
+                continue  # The rest of the word may still not fit
+            if split:  # Word wider than the line
+                breaks.append(ls)
+                breaks.append(i)
+                ls = i
+                col = after_space = 0
+                avail = width
+        if c == ' ':
+            space = i
+            after_space = 0
+        else:
+            after_space += w
+        col += w
+        i += 1
+    if n > ls:
+        breaks.append(ls)
+        breaks.append(n)
+    return breaks
+
+
+def layout(string, width, metrics, first_col=0, split=True, clip=False):
+    # Line breaks of string for lines of width pixels, the first line starts
+    # first_col pixels in
+    global _next
+    key = (string, width, first_col, (_SPLIT if split else 0) | (_CLIP if clip else 0), metrics.font)
+    breaks = _cache.get(key)
+    if breaks is None:
+        breaks = _layout(string, width, metrics, first_col, split, clip)
+        old = _keys[_next]
+        if old is not None:
+            del _cache[old]
+        _keys[_next] = key
+        _cache[key] = breaks
+        _next = (_next + 1) % CACHE_SIZE
+    return breaks
+
+
+def clear():
+    global _next
+    _cache.clear()
+    for i in range(CACHE_SIZE):
+        _keys[i] = None
+    _next = 0
@@ -84,7 +84,8 @@ class DObject():
         cls.devices[obj.device].add(obj)
 
     def __init__(self, writer, row, col, height, width, fgcolor, bgcolor, bdcolor):
-        writer.set_clip(True, True, False)  # Disable scrolling text
+        # Writers are shared between states (gui.core.fontreg): their clip
+        # settings are left alone, widgets clip their text while drawing it
         self.writer = writer
         device = writer.device
         self.device = device
@@ -0,0 +1,143 @@
+# scene.py Retained mode widgets on top of nanogui
+
+# Released under the MIT License (MIT). See LICENSE.
+# Copyright (c) Christof Rath 2021
+
+# A Scene holds widgets with fixed rectangles whose values are bound to the
+# fields of a data object (ClockData). refresh() polls the bindings, marks the
+# widgets with a changed value pending (DObject._set_pend) and redraws only
+# those. The bounding box of the redrawn area is kept in window for a windowed
+# update of the display. After invalidate() (e.g. another view used the frame
+# buffer) the next refresh() draws everything: background and all widgets,
+# window is None.
+#
+# A binding is the name of a field or a function of the data object, e.g.
+# Text(wri, 55, 25, 74, 'hour', fmt='{:02d}') or ClockData.get_date_str.
+# A value of None draws only the background of the widget.
+
+# Usage:
+# from gui.core.scene import Scene, Text, Box
+# scene = Scene(ssd, cd, background)
+# scene.add(Text(wri, 175, 115, 80, 'pressure', align=RIGHT))
+# if scene.refresh():
+#     ssd.show() if scene.window is None else ssd.show_window(*scene.window)
+
+from micropython import const
+from gui.core.nanogui import DObject
+from gui.core.writer import Writer
+
+LEFT = const(0)
+RIGHT = const(1)
+
+
+class Widget(DObject):
+    def __init__(self, writer, row, col, height, width, bind, fgcolor=None, bgcolor=None):
+        super().__init__(writer, row, col, height, width, fgcolor, bgcolor, False)
+        self.bind = bind
+
+    # Rectangle changed by the last show()
+    def bounds(self):
+        return self.col, self.row, self.width, self.height
+
+    # Reads the bound value, True if it changed
+    def poll(self, data):
+        bind = self.bind
+        v = getattr(data, bind) if isinstance(bind, str) else bind(data)
+        if v != self._value:
+            self._value = v  # value() can't store None
+            return True
+        return False
+
+
+# Single line of text, left or right aligned in the rectangle. fmt formats the
+# value when it is drawn.
+class Text(Widget):
+    def __init__(self, writer, row, col, width, bind, *, fmt=None, align=LEFT, invert=False,
+                 fgcolor=None, bgcolor=None):
+        super().__init__(writer, row, col, writer.height, width, bind, fgcolor, bgcolor)
+        self.fmt = fmt
+        self.align = align
+        self.invert = invert
+
+    def show(self):
+        super().show()  # Blank the rectangle
+        v = self._value
+        if v is None:
+            return
+        text = v if self.fmt is None else self.fmt.format(v)
+        wri = self.writer
+        col = self.col
+        if self.align == RIGHT:
+            col += self.width - wri.stringlen(text)
+        wri.setcolor(self.fgcolor, self.bgcolor)
+        Writer.set_textpos(self.device, self.row, col)
+        wri.printstring(text, self.invert)
+        wri.setcolor()  # Restore defaults
+
+
+# Rectangle filled with fgcolor while the bound value is true (bars, rules)
+class Box(Widget):
+    def show(self):
+        super().show()
+        if self._value:
+            self.device.fill_rect(self.col, self.row, self.width, self.height, self.fgcolor)
+
+
+class Scene():
+    def __init__(self, device, data, background=None):
+        # background(device): draws the static parts after invalidate(),
+        # the device is cleared if None
+        self.device = device
+        self.data = data
+        self.background = background
+        self.widgets = []
+        self.window = None  # (x, y, width, height) of the last refresh, None: whole screen
+        self._full = True
+        if device not in DObject.devices:
+            DObject.devices[device] = set()
+
+    def add(self, widget):
+        self.widgets.append(widget)
+        return widget
+
+    def invalidate(self):
+        self._full = True
+
+    def update(self):
+        # Marks the widgets with a changed value pending
+        data = self.data
+        for w in self.widgets:
+            if w.poll(data):
+                DObject._set_pend(w)
+
+    def refresh(self):
+        # Redraws the pending widgets, False if there was nothing to draw
+        self.update()
+        pending = DObject.devices[self.device]
+        if self._full:
+            self._full = False
+            if self.background is None:
+                self.device.fill(0)
+            else:
+                self.background(self.device)
+            for w in self.widgets:
+                w.show()
+                pending.discard(w)
+            self.window = None
+            return True
+
+        x0 = y0 = 0x7FFF
+        x1 = y1 = -1
+        for w in self.widgets:
+            if w in pending:
+                pending.discard(w)
+                w.show()
+                x, y, width, height = w.bounds()
+                x0 = min(x0, x)
+                y0 = min(y0, y)
+                x1 = max(x1, x + width)
+                y1 = max(y1, y + height)
+        if x1 < 0:
+            return False
+        self.window = (x0, y0, x1 - x0, y1 - y0)
+        return True
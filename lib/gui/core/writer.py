@@ -24,6 +24,7 @@
 import framebuf
 from uctypes import bytearray_at, addressof
 from sys import platform
+from gui.core import glyphblit, layout
 
 __version__ = (0, 4, 2)
 
@@ -106,6 +107,10 @@ class Writer():
         self.char_height = 0
         self.char_width = 0
         self.clip_width = 0
+        self.metrics = None  # Precomputed FontMetrics, set by gui.core.fontreg
+        # Glyphs go straight into the buffer of MONO_HLSB devices (gui.core.glyphblit)
+        self._direct = self.map == framebuf.MONO_HLSB and getattr(device, 'mode', None) == framebuf.MONO_HLSB \
+            and hasattr(device, '_buffer')
 
     def _getstate(self):
         return Writer.state[self.devid]
@@ -147,24 +152,29 @@ class Writer():
                 self._printchar('\n')
 
     def _printline(self, string, invert):
-        rstr = None
-        if self.wrap and self.stringlen(string, True):  # Length > self.screenwidth
-            pos = 0
-            lstr = string[:]
-            while self.stringlen(lstr, True):  # Length > self.screenwidth
-                pos = lstr.rfind(' ')
-                lstr = lstr[:pos].rstrip()
-            if pos > 0:
-                rstr = string[pos + 1:]
-                string = lstr
-
-        for char in string:
-            self._printchar(char, invert)
-        if rstr is not None:
-            self._printchar('\n')
-            self._printline(rstr, invert)  # Recurse
+        if not self.wrap:
+            for char in string:
+                self._printchar(char, invert)
+            return
+        # Breaks at the last space that fits, words wider than the line are
+        # left to the column clip of _get_char()
+        s = self._getstate()
+        breaks = layout.layout(string, self.screenwidth, self._get_metrics(), s.text_col, False)
+        for k in range(0, len(breaks), 2):
+            if k:
+                self._printchar('\n')
+            for i in range(breaks[k], breaks[k + 1]):
+                self._printchar(string[i], invert)
+
+    def _get_metrics(self):
+        if self.metrics is None:
+            from gui.core.fontreg import metrics  # fontreg imports this module
+            self.metrics = metrics(self.font)
+        return self.metrics
 
     def stringlen(self, string, oh=False):
+        if not oh and self.metrics is not None:
+            return self.metrics.stringlen(string)  # Width table lookup
         sc = self._getstate().text_col  # Start column
         wd = self.screenwidth
         l = 0
@@ -248,6 +258,13 @@ class Writer():
         self._get_char(char, recurse)
         if self.glyph is None:
             return  # All done
+        if self._direct:
+            dev = self.device
+            glyphblit.blit(dev._buffer, dev.width, dev.height, self.glyph, self.char_width,
+                           self.clip_width, self.char_height, s.text_col, s.text_row, invert)
+            s.text_col += self.char_width
+            self.cpos += 1
+            return
         buf = bytearray(self.glyph)
         if invert:
             for i, v in enumerate(buf):
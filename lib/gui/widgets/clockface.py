@@ -0,0 +1,167 @@
+# clockface.py Analog clock face: cached dial and hands for gui.core.scene
+
+# Released under the MIT License (MIT). See LICENSE.
+# Copyright (c) Christof Rath 2021
+
+# The dial (ring, minute and hour ticks, numerals) is rendered once with
+# nanogui.circle() and the Writer, its rows are kept in a cache and copied back
+# on every later full redraw. Hands is a scene widget bound to the minute of
+# the half day (0 .. 719): a change copies the dial back into the bounding
+# boxes of the old hands, draws the new ones and reports the union of the old
+# and new boxes as the changed area. The hand tips come from tables for the 60
+# minute and the 720 hour positions, computed once from the integer sine
+# table of gui.core.draw.
+#
+# Works on the raw buffer of a MONO_HLSB device (the EPD in portrait mode).
+
+# Usage:
+# face = ClockFace(wri, 100, 100, 70)
+# scene.add(Hands(wri, face, lambda cd: cd.hour % 12 * 60 + cd.minute))
+# face.draw()  # In the background callback of the scene
+
+import framebuf
+from array import array
+from gui.core import draw
+from gui.core.nanogui import circle
+from gui.core.scene import Widget
+from gui.core.writer import Writer
+
+_NUMERALS = (('12', 0), ('3', 90), ('6', 180), ('9', 270))
+
+
+def _scaled(q14, length):
+    # Q14 * length rounded to pixels
+    return (q14 * length + 8192) >> 14
+
+
+class ClockFace():
+    def __init__(self, writer, cx, cy, radius):
+        dev = writer.device
+        if getattr(dev, 'mode', None) != framebuf.MONO_HLSB or not hasattr(dev, '_buffer'):
+            raise ValueError('ClockFace needs a MONO_HLSB device with a _buffer.')
+        self.writer = writer
+        self.device = dev
+        self.cx = cx
+        self.cy = cy
+        self.radius = radius
+        self._stride = (dev.width + 7) >> 3
+        self._top = max(0, cy - radius)  # Cached rows
+        self._bottom = min(dev.height, cy + radius + 1)
+        self._cache = None
+
+    def draw(self):
+        # Renders the dial on the first call, later copies it from the cache
+        dev = self.device
+        a = self._top * self._stride
+        b = self._bottom * self._stride
+        if self._cache is not None:
+            dev._mvb[a:b] = self._cache
+            return
+        dev.fill_rect(0, self._top, dev.width, self._bottom - self._top, 0)
+        cx, cy, r = self.cx, self.cy, self.radius
+        circle(dev, cx, cy, r, 1, 2)
+        buf, w, h = dev._buffer, dev.width, dev.height
+        for m in range(60):
+            s = draw.isin(m * 6)
+            c = draw.icos(m * 6)
+            inner = r - 10 if m % 5 == 0 else r - 5
+            draw.line(buf, w, h, cx + _scaled(s, inner), cy - _scaled(c, inner),
+                      cx + _scaled(s, r - 2), cy - _scaled(c, r - 2), 1, 3 if m % 5 == 0 else 1)
+        wri = self.writer
+        clip = wri.set_clip()  # Shared writer: restore its settings
+        wri.set_clip(True, True, False)
+        for text, deg in _NUMERALS:
+            d = r - 22
+            Writer.set_textpos(dev, cy - _scaled(draw.icos(deg), d) - wri.height // 2,
+                               cx + _scaled(draw.isin(deg), d) - wri.stringlen(text) // 2)
+            wri.printstring(text)
+        wri.set_clip(*clip)
+        self._cache = bytes(dev._mvb[a:b])
+
+    def restore(self, x, y, width, height):
+        # Copies the dial back into a rectangle (rounded to bytes)
+        y0 = max(y, self._top)
+        y1 = min(y + height, self._bottom)
+        xa = max(0, x) >> 3
+        xb = min(self._stride, (x + width + 7) >> 3)
+        if y0 >= y1 or xa >= xb:
+            return
+        mvb = self.device._mvb
+        cache = memoryview(self._cache)
+        stride = self._stride
+        for row in range(y0, y1):
+            o = row * stride
+            c = (row - self._top) * stride
+            mvb[o + xa:o + xb] = cache[c + xa:c + xb]
+
+
+class Hands(Widget):
+    def __init__(self, writer, face, bind, hour_length=None, minute_length=None):
+        r = face.radius
+        super().__init__(writer, face.cy - r, face.cx - r, 2 * r + 1, 2 * r + 1, bind)
+        self.face = face
+        hour_length = hour_length or r * 11 // 20
+        minute_length = minute_length or r - 12
+        if not (0 < hour_length <= 127 and 0 < minute_length <= 127):
+            raise ValueError('Hand lengths must be between 1 and 127 pixels.')
+        # Tip offsets (x, y) per position, signed bytes
+        self._minute = array('b', bytearray(120))
+        for m in range(60):
+            self._minute[2 * m] = _scaled(draw.isin(m * 6), minute_length)
+            self._minute[2 * m + 1] = -_scaled(draw.icos(m * 6), minute_length)
+        self._hour = array('b', bytearray(1440))
+        for p in range(720):  # Half degree steps, odd positions between two table entries
+            s = (draw.isin(p // 2) + draw.isin((p + 1) // 2)) // 2
+            c = (draw.icos(p // 2) + draw.icos((p + 1) // 2)) // 2
+            self._hour[2 * p] = _scaled(s, hour_length)
+            self._hour[2 * p + 1] = -_scaled(c, hour_length)
+        self._boxes = array('h', [0] * 8)  # Hour and minute hand of the last show()
+        self._drawn = False
+        self._bounds = (self.col, self.row, self.width, self.height)
+
+    def bounds(self):
+        return self._bounds
+
+    def _box(self, i, dx, dy, width):
+        # Bounding box of a hand from the centre, hub included
+        cx, cy = self.face.cx, self.face.cy
+        m = max(width, 5)
+        x0 = cx + min(0, dx) - m
+        y0 = cy + min(0, dy) - m
+        b = self._boxes
+        b[i] = x0
+        b[i + 1] = y0
+        b[i + 2] = cx + max(0, dx) + m + 1 - x0
+        b[i + 3] = cy + max(0, dy) + m + 1 - y0
+
+    def show(self):
+        face = self.face
+        b = self._boxes
+        old = (min(b[0], b[4]), min(b[1], b[5]), max(b[0] + b[2], b[4] + b[6]), max(b[1] + b[3], b[5] + b[7]))
+        if self._drawn:  # Erase the old hands
+            face.restore(b[0], b[1], b[2], b[3])
+            face.restore(b[4], b[5], b[6], b[7])
+        v = self._value
+        if v is None:
+            self._drawn = False
+            self._bounds = (old[0], old[1], old[2] - old[0], old[3] - old[1])
+            return
+        dev = self.device
+        buf, w, h = dev._buffer, dev.width, dev.height
+        cx, cy = face.cx, face.cy
+        v %= 720
+        hx, hy = self._hour[2 * v], self._hour[2 * v + 1]
+        mx, my = self._minute[2 * (v % 60)], self._minute[2 * (v % 60) + 1]
+        draw.line(buf, w, h, cx, cy, cx + hx, cy + hy, self.fgcolor, 5)
+        draw.line(buf, w, h, cx, cy, cx + mx, cy + my, self.fgcolor, 3)
+        draw.fillcircle(buf, w, h, cx, cy, 4, self.fgcolor)
+        self._box(0, hx, hy, 5)
+        self._box(4, mx, my, 3)
+        x0 = min(b[0], b[4])
+        y0 = min(b[1], b[5])
+        x1 = max(b[0] + b[2], b[4] + b[6])
+        y1 = max(b[1] + b[3], b[5] + b[7])
+        if self._drawn:
+            x0, y0, x1, y1 = min(x0, old[0]), min(y0, old[1]), max(x1, old[2]), max(y1, old[3])
+        self._drawn = True
+        self._bounds = (x0, y0, x1 - x0, y1 - y0)
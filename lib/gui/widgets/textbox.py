@@ -8,6 +8,8 @@
 
 from gui.core.nanogui import DObject
 from gui.core.writer import Writer
+from gui.core.fontreg import metrics
+from gui.core.layout import layout
 
 # Reason for no tab support in private/reason_for_no_tabs
 
@@ -26,46 +28,10 @@ class Textbox(DObject):
         self.start = 0  # Start line for display
 
     def _add_lines(self, s):
-        width = self.width
-        font = self.writer.font
-        n = -1  # Index into string
-        newline = True
-        while True:
-            n += 1
-            if newline:
-                newline = False
-                ls = n  # Start of line being processed
-                col = 0  # Column relative to text area
-            if n >= len(s):  # End of string
-                if n > ls:
-                    self.lines.append(s[ls :])
-                return
-            c = s[n]  # Current char
-            if c == '\n':
-                self.lines.append(s[ls : n])
-                newline = True
-                continue  # Line fits window
-            col += font.get_ch(c)[2]  # width of current char
-            if col > width:
-                if self.clip:
-                    p = s[ls :].find('\n')  # end of 1st line
-                    if p == -1:
-                        self.lines.append(s[ls : n])  # clip, discard all to right
-                        return
-                    self.lines.append(s[ls : n])  # clip, discard to 1st newline
-                    n = p  # n will move to 1st char after newline
-                elif c == ' ':  # Easy word wrap
-                    self.lines.append(s[ls : n])
-                else:  # Edge splits a word
-                    p = s.rfind(' ', ls, n + 1)
-                    if p >= 0:  # spacechar in line: wrap at space
-                        assert (p > 0), 'space char in position 0'
-                        self.lines.append(s[ls : p])
-                        n = p
-                    else:  # No spacechar: wrap at end
-                        self.lines.append(s[ls : n])
-                        n -= 1  # Don't skip current char
-                newline = True
+        # Line breaks in a single pass over the width table, see gui.core.layout
+        breaks = layout(s, self.width, metrics(self.writer.font), clip=self.clip)
+        for k in range(0, len(breaks), 2):
+            self.lines.append(s[breaks[k] : breaks[k + 1]])
 
     def _print_lines(self):
         if len(self.lines) == 0:
@@ -78,6 +44,8 @@ class Textbox(DObject):
         left = col
         ht = wri.height
         wri.setcolor(self.fgcolor, self.bgcolor)
+        clip = wri.set_clip()
+        wri.set_clip(True, True, False)  # Disable scrolling text
         # Print the first (or last?) lines that fit widget's height
         #for line in self.lines[-self.nlines : ]:
         for line in self.lines[self.start : self.start + self.nlines]:
@@ -85,6 +53,7 @@ class Textbox(DObject):
             wri.printstring(line)
             row += ht
             col = left
+        wri.set_clip(*clip)
         wri.setcolor()  # Restore defaults
 
     def show(self):
@@ -0,0 +1,92 @@
+# history.py Sensor history of the last 24 hours
+# One sample per minute in two ring buffers of fixed-point values (array('h')):
+# temperature in 0.1 C and sea-level pressure in 0.1 hPa. Minutes without a
+# sample (edit states, sensor errors) are stored as NO_DATA. Views average the
+# samples into a caller supplied buffer, so neither adding nor viewing
+# allocates.
+
+from array import array
+from micropython import const
+from utime import ticks_diff, ticks_ms
+
+SIZE = const(1440) # 24h at 1 minute resolution
+NO_DATA = const(-32768)
+
+TEMPERATURE = const(0)
+PRESSURE = const(1)
+
+# View spans in minutes
+SPAN_1H = const(60)
+SPAN_6H = const(360)
+SPAN_24H = const(1440)
+
+_MINUTE_MS = const(60_000)
+
+
+class History():
+    def __init__(self) -> None:
+        self._data = (array('h', [NO_DATA] * SIZE), array('h', [NO_DATA] * SIZE))
+        self._head = 0 # Next slot to write
+        self._count = 0
+        self._last_ts = 0 # ticks_ms of the last sample, 0 for none
+        self.added = 0 # Samples added since the start, changes with every add()
+
+
+    def __len__(self) -> int:
+        return self._count
+
+
+    def _put(self, temperature: int, pressure: int) -> None:
+        self._data[TEMPERATURE][self._head] = temperature
+        self._data[PRESSURE][self._head] = pressure
+        self._head = (self._head + 1) % SIZE
+        if self._count < SIZE:
+            self._count += 1
+
+
+    def add(self, temperature: int, pressure: int) -> None:
+        # Values in 0.1 C and 0.1 hPa, NO_DATA for a failed reading. Missed
+        # minutes since the last sample are filled with NO_DATA.
+        now = ticks_ms()
+        if self._last_ts:
+            missed = (ticks_diff(now, self._last_ts) + _MINUTE_MS // 2) // _MINUTE_MS - 1
+            for _ in range(min(missed, SIZE)):
+                self._put(NO_DATA, NO_DATA)
+        self._last_ts = now or 1
+        self._put(temperature, pressure)
+        self.added += 1
+
+
+    def latest(self, kind: int) -> int:
+        if self._count == 0:
+            return NO_DATA
+        return self._data[kind][(self._head - 1) % SIZE]
+
+
+    def view(self, kind: int, span: int, out: array) -> int:
+        # Averages the last span minutes into len(out) points, oldest first.
+        # Points without any sample are NO_DATA. Returns the number of points
+        # that hold data.
+        data = self._data[kind]
+        points = len(out)
+        per_point = span // points
+        if per_point < 1:
+            raise ValueError("Span of {:d} min is too short for {:d} points".format(span, points))
+
+        valid = 0
+        i = (self._head - points * per_point) % SIZE # Slots never written hold NO_DATA
+        for p in range(points):
+            total = 0
+            n = 0
+            for _ in range(per_point):
+                v = data[i]
+                if v != NO_DATA:
+                    total += v
+                    n += 1
+                i = (i + 1) % SIZE
+            if n:
+                out[p] = (total + (n >> 1)) // n if total >= 0 else -((n >> 1) - total) // n
+                valid += 1
+            else:
+                out[p] = NO_DATA
+        return valid
@@ -0,0 +1,155 @@
+# metrics.py Counters and latency histograms for the hot paths
+# All storage is allocated when a metric is registered (at import time of the
+# instrumented module). Recording only writes into preallocated arrays, so it
+# can be used from timer callbacks and soft IRQs.
+
+# Usage:
+# import metrics
+# _M_SHOW = metrics.histogram("epd.show")  # Module level
+# t = metrics.start()
+# ...
+# metrics.stop(_M_SHOW, t)
+#
+# Dump over the REPL:
+# >>> import metrics; metrics.report()
+
+from array import array
+from micropython import const
+from utime import ticks_us, ticks_diff
+
+_MAX_COUNTERS = const(16)
+_MAX_HISTOGRAMS = const(16)
+
+# Bucket upper bounds (1-2-5 series, microseconds for timings), the last
+# bucket takes everything above 5s
+_EDGES = array('L', [1, 2, 5, 10, 20, 50, 100, 200, 500,
+                     1_000, 2_000, 5_000, 10_000, 20_000, 50_000,
+                     100_000, 200_000, 500_000, 1_000_000, 2_000_000, 5_000_000])
+_BUCKETS = const(22)
+
+enabled = True
+
+_counter_names = [None] * _MAX_COUNTERS
+_counters = array('L', [0] * _MAX_COUNTERS)
+_n_counters = 0
+
+_hist_names = [None] * _MAX_HISTOGRAMS
+_hist_units = [None] * _MAX_HISTOGRAMS
+_buckets = array('L', [0] * (_MAX_HISTOGRAMS * _BUCKETS))
+_count = array('L', [0] * _MAX_HISTOGRAMS)
+_max = array('L', [0] * _MAX_HISTOGRAMS)
+_last = array('L', [0] * _MAX_HISTOGRAMS)
+_n_hists = 0
+
+
+def counter(name: str) -> int:
+    global _n_counters
+    for i in range(_n_counters):
+        if _counter_names[i] == name:
+            return i
+    if _n_counters >= _MAX_COUNTERS:
+        raise IndexError("Too many counters")
+    _counter_names[_n_counters] = name
+    _n_counters += 1
+    return _n_counters - 1
+
+
+def histogram(name: str, unit: str = "us") -> int:
+    global _n_hists
+    for i in range(_n_hists):
+        if _hist_names[i] == name:
+            return i
+    if _n_hists >= _MAX_HISTOGRAMS:
+        raise IndexError("Too many histograms")
+    _hist_names[_n_hists] = name
+    _hist_units[_n_hists] = unit
+    _n_hists += 1
+    return _n_hists - 1
+
+
+def inc(counter_id: int, n: int = 1) -> None:
+    if enabled:
+        _counters[counter_id] += n
+
+
+def record(hist_id: int, value: int) -> None:
+    if not enabled:
+        return
+    if value < 0:
+        value = 0
+    lo = 0 # Binary search of the first edge >= value
+    hi = _BUCKETS - 1
+    while lo < hi:
+        mid = (lo + hi) >> 1
+        if value <= _EDGES[mid]:
+            hi = mid
+        else:
+            lo = mid + 1
+    _buckets[hist_id * _BUCKETS + lo] += 1
+    _count[hist_id] += 1
+    _last[hist_id] = value
+    if value > _max[hist_id]:
+        _max[hist_id] = value
+
+
+def start() -> int:
+    return ticks_us()
+
+
+def stop(hist_id: int, t_start: int) -> int:
+    # Records and returns the microseconds since start()
+    dt = ticks_diff(ticks_us(), t_start)
+    record(hist_id, dt)
+    return dt
+
+
+def percentile(hist_id: int, q: float) -> int:
+    # Upper bound of the bucket holding the q-th percentile (0 < q <= 1),
+    # limited to the largest recorded value
+    n = _count[hist_id]
+    if n == 0:
+        return 0
+    threshold = q * n
+    total = 0
+    base = hist_id * _BUCKETS
+    top = _max[hist_id]
+    for i in range(_BUCKETS - 1):
+        total += _buckets[base + i]
+        if total >= threshold:
+            return min(_EDGES[i], top)
+    return top
+
+
+def get_counter(name: str) -> int:
+    for i in range(_n_counters):
+        if _counter_names[i] == name:
+            return _counters[i]
+    return 0
+
+
+def get_histogram(name: str):
+    # (count, p50, p99, max, last) or None
+    for i in range(_n_hists):
+        if _hist_names[i] == name:
+            return _count[i], percentile(i, 0.5), percentile(i, 0.99), _max[i], _last[i]
+    return None
+
+
+def reset() -> None:
+    for i in range(_MAX_COUNTERS):
+        _counters[i] = 0
+    for i in range(_MAX_HISTOGRAMS * _BUCKETS):
+        _buckets[i] = 0
+    for i in range(_MAX_HISTOGRAMS):
+        _count[i] = _max[i] = _last[i] = 0
+
+
+def report() -> None:
+    print("Counters:")
+    for i in range(_n_counters):
+        print("  {:>10d}  {}".format(_counters[i], _counter_names[i]))
+    print("Histograms (p50/p99 are bucket upper bounds):")
+    print("  {:>7s} {:>9s} {:>9s} {:>9s} {:>9s}  {}".format("count", "p50", "p99", "max", "last", "name"))
+    for i in range(_n_hists):
+        print("  {:7d} {:9d} {:9d} {:9d} {:9d}  {} [{}]".format(
+            _count[i], percentile(i, 0.5), percentile(i, 0.99), _max[i], _last[i], _hist_names[i], _hist_units[i]))
@@ -0,0 +1,135 @@
+# power.py Light sleep between the scheduled wakeups of the clock
+# Replaces the idle REPL after boot: the main loop sleeps with
+# machine.lightsleep() until the next timer is due (minute refresh, state
+# timeout, countdown deadline or display tick, end of the alarm). After user
+# input the loop stays awake for a while so that the click timers of the
+# rotary driver can run.
+#
+# Waking up on input: the rp2 port does not offer pins as lightsleep wake
+# sources. Whether an encoder pin IRQ ends a timed lightsleep depends on the
+# clocks the firmware leaves running while asleep, so by default it is not
+# relied upon: a sleep lasts at most _WAKE_SLICE_MS, in between the wake pins
+# are compared with their levels before the sleep and a change keeps the loop
+# awake (the first edge of a turn may be lost). Pass gpio_wake=True only for
+# a firmware where the pin IRQs have been seen to wake the device, then the
+# whole wait is slept at once.
+
+# While USB powered (VBUS high) it does not sleep, so the REPL stays usable.
+# Ctrl-C or stop() ends run(), power.report() prints the duty cycle. main.py
+# does not enter the loop while the encoder button is held at boot.
+
+import machine
+from machine import Pin
+from micropython import const
+from utime import sleep_ms, ticks_add, ticks_diff, ticks_ms
+from clock import Clock
+
+_MIN_SLEEP_MS = const(20) # Shorter waits are spent awake
+_MAX_SLEEP_MS = const(60_000)
+_POLL_MS = const(10)
+_INPUT_HOLD_MS = const(1500) # Awake after user input (> long click period)
+_EARLY_MS = const(5) # Woken more than this before the wakeup: external (encoder)
+_WAKE_SLICE_MS = const(100) # Longest sleep without a pin wake source
+
+
+class PowerManager():
+    def __init__(self, clock: Clock, wakeup_sources: Tuple, vbus_pin: Pin = None, wake_pins: Tuple = (), gpio_wake: bool = False) -> None:
+        self._clock = clock
+        self._sources = wakeup_sources # Callables: ms until their next timer, -1 for none
+        self._vbus_pin = vbus_pin
+        self._wake_pins = wake_pins # Encoder and button pins
+        self._levels = bytearray(len(wake_pins)) # Before the last sleep
+        self._gpio_wake = gpio_wake
+        self.enabled = True
+        self.running = False
+        self._hold_until = ticks_ms()
+        self._start_ts = ticks_ms()
+        self.sleep_ms = 0
+        self.sleeps = 0
+        self.early_wakeups = 0
+
+
+    def next_wakeup_ms(self) -> int:
+        wakeup = _MAX_SLEEP_MS
+        for source in self._sources:
+            ms = source()
+            if 0 <= ms < wakeup:
+                wakeup = ms
+        return wakeup
+
+
+    def _can_sleep(self, now: int) -> bool:
+        if not self.enabled:
+            return False
+        if self._vbus_pin is not None and self._vbus_pin.value():
+            return False
+        if ticks_diff(now, self._clock.last_event_ts) < _INPUT_HOLD_MS:
+            return False
+        return ticks_diff(self._hold_until, now) <= 0
+
+
+    def step(self) -> None:
+        now = ticks_ms()
+        wakeup = self.next_wakeup_ms()
+        if wakeup < _MIN_SLEEP_MS or not self._can_sleep(now):
+            sleep_ms(min(_POLL_MS, max(1, wakeup))) # Runs the scheduled callbacks
+            return
+
+        if not self._gpio_wake:
+            wakeup = min(wakeup, _WAKE_SLICE_MS)
+            pins = self._wake_pins
+            for i in range(len(pins)):
+                self._levels[i] = pins[i].value()
+        machine.lightsleep(wakeup)
+        t = ticks_ms()
+        slept = ticks_diff(t, now)
+        self.sleep_ms += slept
+        self.sleeps += 1
+        if slept < wakeup - _EARLY_MS or self._pins_changed():
+            self.early_wakeups += 1
+            self._hold_until = ticks_add(t, _INPUT_HOLD_MS)
+
+
+    def _pins_changed(self) -> bool:
+        if self._gpio_wake:
+            return False
+        pins = self._wake_pins
+        for i in range(len(pins)):
+            if pins[i].value() != self._levels[i]:
+                return True
+        return False
+
+
+    def run(self) -> None:
+        # Returns after stop() or Ctrl-C
+        self.running = True
+        try:
+            while self.running:
+                self.step()
+        except KeyboardInterrupt:
+            pass
+        self.running = False
+
+
+    def stop(self) -> None:
+        self.running = False
+
+
+    def reset_stats(self) -> None:
+        self._start_ts = ticks_ms()
+        self.sleep_ms = 0
+        self.sleeps = 0
+        self.early_wakeups = 0
+
+
+    def duty_cycle(self) -> Tuple[int, int]:
+        # (active ms, sleeping ms) since the start or reset_stats()
+        total = ticks_diff(ticks_ms(), self._start_ts)
+        return (total - self.sleep_ms, self.sleep_ms)
+
+
+    def report(self) -> None:
+        active, sleeping = self.duty_cycle()
+        total = active + sleeping
+        print("Active {:d}ms, sleeping {:d}ms ({:d} light sleeps, {:d} woken by input): {:.1f}% active".format(
+            active, sleeping, self.sleeps, self.early_wakeups, 100 * active / total if total else 0))
@@ -7,6 +7,7 @@
 # Documentation:
 #   https://github.com/MikeTeachman/micropython-rotary
 
+import metrics
 import micropython
 import utime
 from machine import Timer
@@ -54,6 +55,9 @@ _PERIOD_LONG_CLICK = const(800)
 _PERIOD_CLICK = 300
 _PERIOD_DBL_CLICK = 450
 
+_M_IRQ = metrics.histogram("rotary.irq")
+_M_IRQ_COUNT = metrics.counter("rotary.irq")
+
 def _wrap(value, incr, lower_bound, upper_bound):
     range = upper_bound - lower_bound + 1
     value = value + incr
@@ -88,6 +92,7 @@ class Event(object):
         self.event_type = event_type
         self.value = value
         self.btn_pushed = btn_pushed
+        self.ts = utime.ticks_us() # Input latency is measured from here
 
     def _type_name(self):
         if self.event_type == self.EVENT_ROT_INC: return 'EVENT_ROT_INC'
@@ -164,6 +169,8 @@ class Rotary(object):
         self._listener.remove(l)
 
     def _process_rotary_pins(self, pin):
+        t = metrics.start()
+        metrics.inc(_M_IRQ_COUNT)
         old_value = self._value
         clk_dt_pins = (self._hal_get_clk_value() <<
                        1) | self._hal_get_dt_value()
@@ -204,6 +211,7 @@ class Rotary(object):
                 micropython.schedule(_trigger, Event(self, Event.EVENT_ROT_INC if incr > 0 else Event.EVENT_ROT_DEC, self._value, self._hal_get_sw_value()))
         except:
             pass
+        metrics.stop(_M_IRQ, t)
 
 
 
@@ -1,16 +1,33 @@
-from utime import sleep, ticks_diff, ticks_ms
+from array import array
+from utime import sleep, ticks_add, ticks_diff, ticks_ms
 from machine import Pin, Timer
 from micropython import const, schedule
 
 import gui.fonts.arial_50 as huge_font
 import gui.fonts.freesans20 as small_font
+from barometer import MIN_ELEVATION, MAX_ELEVATION, MODEL_STANDARD, MODEL_TEMPERATURE
 from clockdata import ClockData
+from countdown import DisplayRate, TimerService, RATE_AUTO, RATE_SECONDS, RATE_MINUTES
 from drivers.display import Display
-from gui.core.writer import Writer
+from gui.core.fontreg import get_writer
+from gui.core.fplot import CartesianGraph, Curve
+from gui.core.scene import Scene, Text, Box, RIGHT
+from gui.widgets.clockface import ClockFace, Hands
+from history import History, NO_DATA, PRESSURE, TEMPERATURE, SPAN_1H, SPAN_6H, SPAN_24H
 from rotary import Event
 from DS1302 import DS1302
+import tracebuf
 
 DEFAULT_TIMEOUT = 15000
+# DS1302 RAM layout: 0..8 timer durations (3 bytes each)
+RAM_ELEVATION = const(9) # 2 bytes, little endian
+RAM_PRESSURE_MODEL = const(11) # RAM_CONFIG_MARK | model, the marker tells a saved config from cleared RAM
+RAM_CONFIG_MARK = const(0xA0)
+_ALARM_MS = const(20_000)
+_COUNTDOWN_RETRY_MS = const(100) # Countdown value deferred by a busy panel
+_TREND_POINTS = const(60)
+_TREND_SPANS = (SPAN_1H, SPAN_6H, SPAN_24H)
+_TREND_LABELS = ("1h", "6h", "24h")
 
 
 class _State():
@@ -21,8 +38,8 @@ class _State():
         self._timeout_state_name = timeout_state_name
         self._prev_display_data = ClockData()
         self._display = display
-        self._wri_default = Writer(self._display, small_font, False)
-        self._wri_time = Writer(self._display, huge_font, False)
+        self._wri_default = get_writer(self._display, small_font)
+        self._wri_time = get_writer(self._display, huge_font)
         self._reset_timer_callback = lambda: None
 
         self._header_y = const(5)
@@ -30,6 +47,7 @@ class _State():
         self._hdr_t2_x = const(39)
         self._hdr_t3_x = const(70)
         self._footer_y = const(175)
+        self._pressure_x = 0
 
 
     def initState(self, reset_timer_callback: FunctionType) -> None:
@@ -40,14 +58,23 @@ class _State():
         pass
 
 
+    def nextWakeupMs(self) -> int:
+        # Milliseconds until a timer of the state fires, -1 for none
+        return -1
+
+
     def processEvent(self, event: Event) -> str:
         # Do nothing
         return self.__class__.__name__
 
 
-    def prepareView(self) -> bool:
+    def updateWindow(self) -> Tuple[int, int, int, int]:
+        # Part of the screen changed by the last prepareView(), None for all of it
+        return None
+
+
+    def _drawHeader(self) -> None:
         self._display.clear()
-        cd = self._clock_data
         wr = self._wri_default
         wr.set_textpos(self._display, self._header_y, self._hdr_t1_x)
         wr.printstring("T1")
@@ -60,7 +87,24 @@ class _State():
         self._display.vline(66, 9, 13, 1)
         self._display.vline(96, 9, 13, 1)
 
+
+    def prepareView(self) -> bool:
+        self._drawHeader()
+        cd = self._clock_data
+        wr = self._wri_default
+
         has_changes = False
+        running = cd.timers_running # Running timers are underlined
+        if running & 0x02:
+            self._display.fill_rect(self._hdr_t1_x, 23, 18, 2, 1)
+        if running & 0x04:
+            self._display.fill_rect(self._hdr_t2_x, 23, 18, 2, 1)
+        if running & 0x08:
+            self._display.fill_rect(self._hdr_t3_x, 23, 18, 2, 1)
+        if self._prev_display_data.timers_running != running:
+            has_changes = True
+            self._prev_display_data.timers_running = running
+
         if cd.battery >= 0:
             wr.set_textpos(self._display, 5, 195 -
                            wr.stringlen(str(cd.battery)))
@@ -72,16 +116,16 @@ class _State():
         if cd.temperature is not None:
             wr.set_textpos(self._display, self._footer_y, 5)
             wr.printstring(cd.temperature)
-            if self._prev_display_data.temperature != cd.temperature:
+            if self._prev_display_data.temperature_deci != cd.temperature_deci:
                 has_changes = True
-                self._prev_display_data.temperature = cd.temperature
+                self._prev_display_data.temperature_deci = cd.temperature_deci
             if cd.pressure is not None:
-                wr.set_textpos(self._display, self._footer_y, 195 -
-                               wr.stringlen(cd.pressure))
-                wr.printstring(cd.pressure)
-                if self._prev_display_data.pressure != cd.pressure:
+                if self._prev_display_data.pressure_deci != cd.pressure_deci:
                     has_changes = True
-                    self._prev_display_data.pressure = cd.pressure
+                    self._prev_display_data.pressure_deci = cd.pressure_deci
+                    self._pressure_x = 195 - wr.stringlen(cd.pressure) # Measured once per value
+                wr.set_textpos(self._display, self._footer_y, self._pressure_x)
+                wr.printstring(cd.pressure)
             self._display.hline(5, 173, 190, 1)
 
         return has_changes
@@ -132,6 +176,7 @@ class _CountdownState(_TimeState):
         self._timer_sec = 0
         self._prev_timer_min = -1
         self._prev_timer_sec = -1
+        self._hide_seconds = False # Minutes only countdown
         self._is_timer_init = False
 
 
@@ -163,7 +208,7 @@ class _CountdownState(_TimeState):
         t_writer.set_textpos(self._display, self._time_y, self._hour_start_x)
         t_writer.printstring("{:02d}".format(self._timer_min))
         t_writer.set_textpos(self._display, self._time_y, self._minutes_start_x)
-        t_writer.printstring("{:02d}".format(self._timer_sec))
+        t_writer.printstring("--" if self._hide_seconds else "{:02d}".format(self._timer_sec))
 
         time = "{:02d}:{:02d}".format(cd.hour, cd.minute)
         wr = self._wri_default
@@ -235,6 +280,13 @@ class Init(_State):
                 for b in range(3):
                     self._rtc.ram(offset + b, 0)
 
+        elevation = self._rtc.ram(RAM_ELEVATION) | self._rtc.ram(RAM_ELEVATION + 1) << 8
+        model = self._rtc.ram(RAM_PRESSURE_MODEL)
+        if model & 0xF0 == RAM_CONFIG_MARK and MIN_ELEVATION <= elevation <= MAX_ELEVATION:
+            model &= 0x0F
+            cd.elevation = elevation
+            cd.pressure_model = model if model in (MODEL_STANDARD, MODEL_TEMPERATURE) else MODEL_STANDARD
+
         if cd.is_init:
             return "Normal"
         return "SetHour10"
@@ -246,37 +298,58 @@ class Init(_State):
 
 
 class Normal(_TimeState):
+    # Retained mode view: the widgets are declared once, a minute tick redraws
+    # and sends only the widgets whose value changed
+    _OTHER_FACE = "Analog" # Double click switches the Normal view, see ClockData.home_state
+
     def __init__(self, display: Display, clock_data: ClockData, rtc:DS1302) -> None:
         super().__init__(display, clock_data)
 
         self._rtc = rtc
+        self._scene = Scene(display, clock_data, self._drawBackground)
+        self._addWidgets(self._scene)
+
+
+    def _addStatusWidgets(self, scene: Scene) -> None:
+        # Header and footer of the _State layout
+        wr = self._wri_default
+        scene.add(Box(wr, 23, self._hdr_t1_x, 2, 18, lambda cd: cd.timers_running & 0x02)) # Running timers are underlined
+        scene.add(Box(wr, 23, self._hdr_t2_x, 2, 18, lambda cd: cd.timers_running & 0x04))
+        scene.add(Box(wr, 23, self._hdr_t3_x, 2, 18, lambda cd: cd.timers_running & 0x08))
+        scene.add(Text(wr, 5, 160, 35, lambda cd: cd.battery if cd.battery >= 0 else None, fmt="{:d}", align=RIGHT))
+        scene.add(Box(wr, 173, 5, 1, 190, lambda cd: cd.temperature is not None))
+        scene.add(Text(wr, self._footer_y, 5, 80, "temperature"))
+        scene.add(Text(wr, self._footer_y, 115, 80, lambda cd: cd.pressure if cd.temperature is not None else None, align=RIGHT))
+
+
+    def _addWidgets(self, scene: Scene) -> None:
+        self._addStatusWidgets(scene)
+        wr = self._wri_default
+        t_writer = self._wri_time
+        scene.add(Text(t_writer, self._time_y, self._hour_start_x, 74, "hour", fmt="{:02d}"))
+        scene.add(Text(t_writer, self._time_y, self._minutes_start_x, 74, "minute", fmt="{:02d}"))
+        scene.add(Text(wr, self._date_y, 20, self._date_x_end - 20, ClockData.get_date_str, align=RIGHT))
+
+
+    def _drawBackground(self, display: Display) -> None:
+        self._drawHeader()
+        t_writer = self._wri_time
+        t_writer.set_textpos(display, 50, 91)
+        t_writer.printstring(":")
 
 
     def initState(self, reset_timer_callback: FunctionType) -> None:
         super().initState(reset_timer_callback)
-        self._prev_display_data.day = -1 # Force display update at least once
+        self._scene.invalidate() # Another state used the frame buffer
         self._clock_data.from_rtc(self._rtc.DateTime())
 
 
     def prepareView(self) -> bool:
-        has_changes = super().prepareView()
+        return self._scene.refresh()
 
-        cd = self._clock_data
-        date = cd.get_date_str()
-        wr = self._wri_default
-        wr.set_textpos(self._display, self._date_y, self._date_x_end - wr.stringlen(date))
-        wr.printstring(date)
-        if self._prev_display_data.year != cd.year:
-            self._prev_display_data.year = cd.year
-            has_changes = True
-        if self._prev_display_data.month != cd.month:
-            self._prev_display_data.month = cd.month
-            has_changes = True
-        if self._prev_display_data.day != cd.day:
-            self._prev_display_data.day = cd.day
-            has_changes = True
 
-        return has_changes
+    def updateWindow(self) -> Tuple[int, int, int, int]:
+        return self._scene.window
 
 
     def processEvent(self, event: Event) -> str:
@@ -284,6 +357,135 @@ class Normal(_TimeState):
             return "SetHour10"
         if event.event_type == Event.EVENT_BTN_CLICK:
             return "Timer1Select"
+        if event.event_type == Event.EVENT_ROT_INC \
+            or event.event_type == Event.EVENT_ROT_DEC:
+            return "Trend"
+        if event.event_type == Event.EVENT_BTN_DBL_CLICK:
+            self._clock_data.home_state = self._OTHER_FACE
+            return self._OTHER_FACE
+
+        return self.__class__.__name__
+
+
+
+
+
+
+
+
+
+class Analog(Normal):
+    # Analog face as the alternative Normal view, header and footer as in Normal
+    _OTHER_FACE = "Normal"
+
+    def _addWidgets(self, scene: Scene) -> None:
+        self._addStatusWidgets(scene)
+        self._face = ClockFace(self._wri_default, 100, 100, 70)
+        scene.add(Hands(self._wri_default, self._face, lambda cd: cd.hour % 12 * 60 + cd.minute))
+
+
+    def _drawBackground(self, display: Display) -> None:
+        self._drawHeader()
+        self._face.draw()
+
+
+
+
+
+
+
+
+
+class Trend(_State):
+    # Pressure (top) and temperature (bottom) of the last 1h, 6h or 24h
+    def __init__(self, display: Display, clock_data: ClockData, history: History) -> None:
+        super().__init__(display, clock_data, DEFAULT_TIMEOUT, "Normal")
+
+        self._history = history
+        self._span_idx = 0
+        self._points = array('h', [NO_DATA] * _TREND_POINTS)
+        self._drawn_span = -1
+        self._drawn_samples = -1
+        # Built once (no allocation per redraw), prepareView() clears and redraws them
+        self._pressure = self._curve(56)
+        self._temperature = self._curve(116)
+
+
+    def _curve(self, row: int) -> Curve:
+        graph = CartesianGraph(self._wri_default, row, 10, height=52, width=180, fgcolor=1, bgcolor=0,
+                               bdcolor=False, gridcolor=1, xdivs=1, ydivs=1, xorigin=1, yorigin=0)
+        return Curve(graph, 1)
+
+
+    def initState(self, reset_timer_callback: FunctionType) -> None:
+        super().initState(reset_timer_callback)
+        self._drawn_span = -1 # Force display update at least once
+
+
+    def _plot(self, kind: int, curve: Curve, min_range: int) -> int:
+        # Draws one graph, returns the change over the span (first to last point)
+        n = self._history.view(kind, _TREND_SPANS[self._span_idx], self._points)
+        curve.graph.show() # Grid on a cleared plot area
+        if n == 0:
+            return 0
+
+        lo = 32767
+        hi = -32767
+        first = NO_DATA
+        for v in self._points:
+            if v != NO_DATA:
+                lo = min(lo, v)
+                hi = max(hi, v)
+                if first == NO_DATA:
+                    first = v
+                last = v
+        if hi - lo < min_range: # Keep sensor noise flat
+            lo = (lo + hi - min_range) // 2
+            hi = lo + min_range
+        margin = (hi - lo) // 10 + 1
+        curve.origin = (0, lo - margin)
+        curve.excursion = (_TREND_POINTS - 1, hi - lo + 2 * margin)
+        curve.point() # No line from the last point of the previous redraw
+        for x in range(_TREND_POINTS):
+            v = self._points[x]
+            if v == NO_DATA:
+                curve.point() # Gap
+            else:
+                curve.point(x - _TREND_POINTS + 1, v)
+        return last - first
+
+
+    def prepareView(self) -> bool:
+        has_changes = super().prepareView()
+
+        wr = self._wri_default
+        delta = self._plot(PRESSURE, self._pressure, 20)
+        self._plot(TEMPERATURE, self._temperature, 10)
+
+        sign = "-" if delta < 0 else "+"
+        delta = abs(delta)
+        label = "{:s}  {:s}{:d},{:d} hPa".format(_TREND_LABELS[self._span_idx], sign, delta // 10, delta % 10)
+        wr.set_textpos(self._display, 30, 100 - wr.stringlen(label) // 2)
+        wr.printstring(label)
+
+        if self._drawn_span != self._span_idx or self._drawn_samples != self._history.added:
+            has_changes = True
+            self._drawn_span = self._span_idx
+            self._drawn_samples = self._history.added
+        return has_changes
+
+
+    def processEvent(self, event: Event) -> str:
+        if event.event_type == Event.EVENT_BTN_CLICK:
+            return "Normal"
+        if event.event_type == Event.EVENT_BTN_LONG_CLICK:
+            return "SetElevation"
+        if event.event_type == Event.EVENT_ROT_INC:
+            self._span_idx = (self._span_idx + 1) % len(_TREND_SPANS)
+            self._reset_timer_callback()
+        elif event.event_type == Event.EVENT_ROT_DEC:
+            self._span_idx = (self._span_idx - 1) % len(_TREND_SPANS)
+            self._reset_timer_callback()
 
         return self.__class__.__name__
 
@@ -477,13 +679,12 @@ class TimerBackSelect(_CountdownState):
 
 
 class TimerStart(_CountdownState):
-    def __init__(self, display: Display, clock_data: ClockData, countdown_timer: Timer, process_event_callback: FunctionType) -> None:
+    def __init__(self, display: Display, clock_data: ClockData, timer_service: TimerService) -> None:
         super().__init__(display, clock_data)
 
-        self._process_event_callback = process_event_callback
-        self._countdown_timer = countdown_timer
+        self._timers = timer_service
+        self._rate = DisplayRate(clock_data.countdown_rate)
         self._countdown_value = 0
-        self._display_update_ms = 680
 
 
     def initState(self, reset_timer_callback: FunctionType) -> None:
@@ -499,35 +700,44 @@ class TimerStart(_CountdownState):
         else:
             raise IndexError("Unexpected active timer value: {}".format(self._clock_data.active_timer))
 
-        self._countdown_value = self._timer_min * 60 + self._timer_sec
+        duration = self._timer_min * 60 + self._timer_sec
 
-        if self._countdown_value <= 0 or self._countdown_value >= 3600:
-            raise ValueError("Countdown value must be between 1 and 3599 (is: {})".format(self._countdown_value))
+        if duration <= 0 or duration >= 3600:
+            raise ValueError("Countdown value must be between 1 and 3599 (is: {})".format(duration))
+
+        no = self._clock_data.active_timer
+        if not self._timers.running(no) or self._timers.duration(no) != duration:
+            self._timers.start(no, duration) # A changed duration restarts a running timer
 
         self._display.init()
-        self._countdown_timer.init(mode=Timer.ONE_SHOT, period=1000, callback=self._handle_countdown_timer)
+        self._rate.mode = self._clock_data.countdown_rate
+        self._rate.set_refresh_ms(self._display.partial_refresh_ms)
+        self._countdown_value = self._timers.remaining(no)
+        self._set_timer_view(self._timers.watch(no, self._handle_countdown_timer, self._rate))
+        self._update_display()
 
 
-    def _handle_countdown_timer(self, timer: Timer) -> None:
-        self._countdown_value -= 1
-        self._timer_min = self._countdown_value // 60
-        self._timer_sec = self._countdown_value % 60
-        if self._countdown_value <= 0:
-            self.prepareView()
-            self._display.show()
-            self._process_event_callback(None)
-        schedule(self._update_display, None)
-        pass
+    def _set_timer_view(self, value: int) -> None:
+        self._timer_min = value // 60
+        self._timer_sec = value % 60
+        self._hide_seconds = self._timers.step_s >= 60
 
 
-    def _update_display(self, any) -> None:
-        ts = ticks_ms()
+    def _handle_countdown_timer(self, value: int) -> None:
+        self._countdown_value = self._timers.remaining(self._clock_data.active_timer)
+        self._rate.set_refresh_ms(self._display.partial_refresh_ms)
+        self._set_timer_view(value)
+        tracebuf.record(tracebuf.COUNTDOWN, "TimerStart", "TimerStart", value, not self._display.ready())
+        self._update_display()
+
+
+    def _update_display(self) -> None:
+        # A busy panel defers the value, the timer service repeats the tick
+        if not self._display.ready():
+            self._timers.retry(_COUNTDOWN_RETRY_MS)
+            return
         self.prepareView()
         self._display.show()
-        self._display.wait_until_ready()
-        self._display_update_ms = ticks_diff(ticks_ms(), ts)
-        if self._countdown_value > 0:
-            self._countdown_timer.init(mode=Timer.ONE_SHOT, period=(1000-self._display_update_ms), callback=self._handle_countdown_timer)
 
 
     def prepareView(self) -> bool:
@@ -542,11 +752,19 @@ class TimerStart(_CountdownState):
 
     def processEvent(self, event: Event) -> str:
         if event is None:
-            if self._countdown_value <= 0:
-                return "TimerAlarm"
-        elif event.event_type == Event.EVENT_BTN_LONG_CLICK:
-            self._countdown_timer.deinit()
+            pass
+        elif event.event_type == Event.EVENT_BTN_LONG_CLICK: # Back, the timer keeps running
+            self._timers.unwatch()
+            return "Normal"
+        elif event.event_type == Event.EVENT_BTN_DBL_CLICK: # Cancel the timer
+            self._timers.cancel(self._clock_data.active_timer)
+            self._timers.unwatch()
             return "Normal"
+        elif event.event_type == Event.EVENT_BTN_CLICK: # Auto -> every second -> minutes only
+            cd = self._clock_data
+            cd.countdown_rate = RATE_SECONDS if cd.countdown_rate == RATE_AUTO \
+                else RATE_MINUTES if cd.countdown_rate == RATE_SECONDS else RATE_AUTO
+            self._rate.mode = cd.countdown_rate
 
         return self.__class__.__name__
 
@@ -562,6 +780,7 @@ class TimerAlarm(_CountdownState):
         self._countdown_timer = countdown_timer
         self._buzzer_pin = buzzer_pin
         self._motor_pin = motor_pin
+        self._alarm_end_ts = 0
 
         self._is_drawn = False
 
@@ -585,16 +804,24 @@ class TimerAlarm(_CountdownState):
         self._do_alarm(None)
 
 
+    def nextWakeupMs(self) -> int:
+        if not self._alarm_end_ts:
+            return -1
+        return max(0, ticks_diff(self._alarm_end_ts, ticks_ms()))
+
+
     def _do_alarm(self, any:Any) -> None:
         if self._buzzer_pin:
             self._buzzer_pin.on()
         if self._motor_pin:
             self._motor_pin.on()
-        self._countdown_timer.init(mode=Timer.ONE_SHOT, period=20_000, callback=self._finish_alarm)
+        self._alarm_end_ts = ticks_add(ticks_ms(), _ALARM_MS) or 1
+        self._countdown_timer.init(mode=Timer.ONE_SHOT, period=_ALARM_MS, callback=self._finish_alarm)
 
 
     def _finish_alarm(self, timer: Timer, call_home: bool = True) -> None:
         timer.deinit()
+        self._alarm_end_ts = 0
         if self._buzzer_pin:
             self._buzzer_pin.off()
         if self._motor_pin:
@@ -3,6 +3,7 @@ from machine import Pin
 from micropython import const
 import micropython
 
+from barometer import MIN_ELEVATION, MAX_ELEVATION, MODEL_STANDARD, MODEL_TEMPERATURE
 from clockdata import ClockData
 from drivers.display import Display
 from gui.widgets.textbox import Textbox
@@ -683,3 +684,89 @@ class TimerSetSecond1(_EditCountdownState):
         return self.__class__.__name__
 
 
+
+
+
+
+
+
+class SetElevation(states._State):
+    # Turn: +-10 m, double click: pressure model, click: save, long click: cancel
+    def __init__(self, display: Display, clock_data: ClockData, rtc: DS1302) -> None:
+        super().__init__(display, clock_data, states.DEFAULT_TIMEOUT, "Trend")
+
+        self._rtc = rtc
+        self._elevation = clock_data.elevation
+        self._model = clock_data.pressure_model
+        self._prev_elevation = -1
+        self._prev_model = -1
+
+
+    def initState(self, reset_timer_callback: FunctionType) -> None:
+        super().initState(reset_timer_callback)
+        self._elevation = self._clock_data.elevation
+        self._model = self._clock_data.pressure_model
+        self._prev_elevation = -1 # Force view update at least once
+
+
+    def prepareView(self) -> bool:
+        has_changes = super().prepareView()
+
+        wr = self._wri_default
+        title = "Elevation"
+        wr.set_textpos(self._display, 30, 100 - wr.stringlen(title) // 2)
+        wr.printstring(title)
+
+        value = str(self._elevation)
+        unit = " m"
+        t_width = self._wri_time.stringlen(value)
+        x = 100 - (t_width + wr.stringlen(unit)) // 2
+        tb = Textbox(self._wri_time, 62, x, t_width, 1)
+        tb.append(value)
+        wr.set_textpos(self._display, 62 + self._wri_time.height - wr.height, x + t_width)
+        wr.printstring(unit)
+
+        model = "Standard" if self._model == MODEL_STANDARD else "Temp. compensated"
+        wr.set_textpos(self._display, 130, 100 - wr.stringlen(model) // 2)
+        wr.printstring(model)
+
+        if self._prev_elevation != self._elevation or self._prev_model != self._model:
+            self._prev_elevation = self._elevation
+            self._prev_model = self._model
+            has_changes = True
+        return has_changes
+
+
+    def processEvent(self, event: Event) -> str:
+        if event.event_type == Event.EVENT_ROT_DEC:
+            self._elevation -= 10
+            if self._elevation < MIN_ELEVATION:
+                self._elevation = MIN_ELEVATION
+            else:
+                buzz()
+            self._reset_timer_callback()
+        elif event.event_type == Event.EVENT_ROT_INC:
+            self._elevation += 10
+            if self._elevation > MAX_ELEVATION:
+                self._elevation = MAX_ELEVATION
+            else:
+                buzz()
+            self._reset_timer_callback()
+        elif event.event_type == Event.EVENT_BTN_DBL_CLICK:
+            self._model = MODEL_TEMPERATURE if self._model == MODEL_STANDARD else MODEL_STANDARD
+            buzz()
+            self._reset_timer_callback()
+        elif event.event_type == Event.EVENT_BTN_LONG_CLICK:
+            buzz()
+            return "Trend"
+        elif event.event_type == Event.EVENT_BTN_CLICK:
+            cd = self._clock_data
+            cd.elevation = self._elevation # The clock recomputes the factors on the next reading
+            cd.pressure_model = self._model
+            self._rtc.ram(states.RAM_ELEVATION, self._elevation & 0xFF)
+            self._rtc.ram(states.RAM_ELEVATION + 1, self._elevation >> 8)
+            self._rtc.ram(states.RAM_PRESSURE_MODEL, states.RAM_CONFIG_MARK | self._model)
+            buzz()
+            return "Trend"
+
+        return self.__class__.__name__
@@ -0,0 +1,103 @@
+# tracebuf.py Ring buffer tracing state transitions and display refreshes
+# Always on: a record is a few array stores (no allocation), the oldest
+# records are overwritten. Decode a dump on the host with
+# tools/trace_decode.py.
+
+# Record fields: ticks_us, kind, display busy, from state, to state, arg
+# (event type, display update flag or countdown seconds depending on kind).
+
+# Dump over the REPL:
+# >>> import tracebuf; tracebuf.dump("trace.bin")  # then: mpremote cp :trace.bin .
+# >>> import tracebuf; tracebuf.print_hex()        # or copy the printed lines
+
+from array import array
+from micropython import const
+from utime import ticks_us
+
+CAPACITY = const(256)
+
+# Record kinds
+EVENT = const(1)      # Clock.processEvent (arg: rotary event type, 0 for None)
+STATE = const(2)      # Clock._handle_state_change (arg: 1 if the display is updated)
+TIMEOUT = const(3)    # Clock._handle_timeout
+COUNTDOWN = const(4)  # Countdown tick (arg: displayed seconds) or finished (to TimerAlarm, arg: timer)
+SHOW = const(5)       # Display refresh started
+
+_BUSY = const(0x80)
+_UNKNOWN_STATE = const(0xFF)
+
+_MAGIC = b'TRC1'
+
+enabled = True
+
+_ticks = array('I', [0] * CAPACITY) # 'I': 4 bytes on the device and the host
+_arg = array('H', [0] * CAPACITY)
+_kind = bytearray(CAPACITY)
+_from = bytearray(CAPACITY)
+_to = bytearray(CAPACITY)
+_head = 0 # Next slot
+_count = 0 # Valid records, saturates at CAPACITY (stays a small int)
+
+_state_names = []
+_state_ids = {}
+
+
+def state_id(name: str) -> int:
+    # Registers the state name (allocates), call at setup time
+    sid = _state_ids.get(name)
+    if sid is None:
+        if len(_state_names) >= _UNKNOWN_STATE:
+            return _UNKNOWN_STATE
+        sid = len(_state_names)
+        _state_names.append(name)
+        _state_ids[name] = sid
+    return sid
+
+
+def record(kind: int, from_state: str, to_state: str, arg: int = 0, busy: bool = False) -> None:
+    global _head, _count
+    if not enabled:
+        return
+    i = _head
+    _ticks[i] = ticks_us()
+    _kind[i] = kind | _BUSY if busy else kind
+    _from[i] = _state_ids.get(from_state, _UNKNOWN_STATE)
+    _to[i] = _state_ids.get(to_state, _UNKNOWN_STATE)
+    _arg[i] = arg & 0xFFFF
+    _head = (i + 1) % CAPACITY
+    if _count < CAPACITY:
+        _count += 1
+
+
+def clear() -> None:
+    global _head, _count
+    _head = 0
+    _count = 0
+
+
+def _write(write) -> None:
+    n = _count
+    hdr = bytearray(_MAGIC)
+    hdr.extend(bytes((CAPACITY & 0xFF, CAPACITY >> 8, _head & 0xFF, _head >> 8, n & 0xFF, n >> 8, len(_state_names))))
+    for name in _state_names:
+        hdr.append(len(name))
+        hdr.extend(name.encode())
+    write(hdr)
+    write(_ticks)  # Little endian on the RP2040 and the host
+    write(_arg)
+    write(_kind)
+    write(_from)
+    write(_to)
+
+
+def dump(path: str = "trace.bin") -> None:
+    with open(path, "wb") as f:
+        _write(f.write)
+
+
+def print_hex(line_bytes: int = 64) -> None:
+    from binascii import hexlify
+    buf = bytearray()
+    _write(buf.extend)
+    for i in range(0, len(buf), line_bytes):
+        print(hexlify(buf[i:i + line_bytes]).decode())
@@ -1,18 +1,41 @@
+import bootprof
+bootprof.mark("start")
+
 import machine
+bootprof.mark("import machine")
 import micropython
+bootprof.mark("import micropython")
 import states
+bootprof.mark("import states")
 import states_edit
+bootprof.mark("import states_edit")
 import utime
+bootprof.mark("import utime")
 from clockdata import ClockData
+bootprof.mark("import clockdata")
 from color_setup import ssd
+bootprof.mark("import color_setup")
 from DS1302 import DS1302
+bootprof.mark("import DS1302")
 from machine import Pin, I2C, Timer
 from rotary import Event
+bootprof.mark("import rotary")
 from rotary_irq_rp2 import RotaryIRQ
+bootprof.mark("import rotary_irq_rp2")
 from utime import sleep_ms
 from bmp280 import BMP280
+bootprof.mark("import bmp280")
+from battery import BatteryMonitor
+bootprof.mark("import battery")
+from history import History
+bootprof.mark("import history")
 
 from clock import Clock
+bootprof.mark("import clock")
+from countdown import TimerService
+bootprof.mark("import countdown")
+from power import PowerManager
+bootprof.mark("import power")
 
 r = RotaryIRQ(pin_num_clk=22,
               pin_num_dt=26,
@@ -30,32 +53,51 @@ except:
 
 cd = ClockData()
 rtc = DS1302(Pin(10), Pin(11), Pin(13))
-clock = Clock(ssd, cd, bme, rtc)
-countdown_timer = Timer()
+battery = BatteryMonitor(cd) # VSYS on ADC3 (GP29)
+history = History()
+clock = Clock(ssd, cd, bme, rtc, evict_below=16_000, battery=battery, history=history)
+bootprof.mark("clock")
+timers = TimerService(Timer(), cd, clock.start_alarm)
+alarm_timer = Timer()
 
+# Only the init state is built eagerly, all others are created on their first use
 clock.register_state(states.Init(ssd, cd, rtc))
-clock.register_state(states.Normal(ssd, cd, rtc))
-clock.register_state(states.Timer1Select(ssd, cd))
-clock.register_state(states.Timer2Select(ssd, cd))
-clock.register_state(states.Timer3Select(ssd, cd))
-clock.register_state(states.TimerBackSelect(ssd, cd))
-clock.register_state(states.TimerStart(ssd, cd, countdown_timer, clock.processEvent))
-clock.register_state(states.TimerAlarm(ssd, cd, countdown_timer, clock.processEvent, buzzer_pin, motor_pin))
-
-clock.register_state(states_edit.SetHour10(ssd, cd))
-clock.register_state(states_edit.SetHour1(ssd, cd))
-clock.register_state(states_edit.SetMinute10(ssd, cd))
-clock.register_state(states_edit.SetMinute1(ssd, cd))
-clock.register_state(states_edit.SetYear(ssd, cd))
-clock.register_state(states_edit.SetMonth(ssd, cd))
-clock.register_state(states_edit.SetDay(ssd, cd, rtc))
-clock.register_state(states_edit.TimerSetMinute10(ssd, cd))
-clock.register_state(states_edit.TimerSetMinute1(ssd, cd))
-clock.register_state(states_edit.TimerSetSecond10(ssd, cd))
-clock.register_state(states_edit.TimerSetSecond1(ssd, cd, rtc))
+clock.register_state_factory("Normal", lambda: states.Normal(ssd, cd, rtc))
+clock.register_state_factory("Analog", lambda: states.Analog(ssd, cd, rtc), True)
+clock.register_state_factory("Trend", lambda: states.Trend(ssd, cd, history), True)
+clock.register_state_factory("Timer1Select", lambda: states.Timer1Select(ssd, cd))
+clock.register_state_factory("Timer2Select", lambda: states.Timer2Select(ssd, cd))
+clock.register_state_factory("Timer3Select", lambda: states.Timer3Select(ssd, cd))
+clock.register_state_factory("TimerBackSelect", lambda: states.TimerBackSelect(ssd, cd))
+clock.register_state_factory("TimerStart", lambda: states.TimerStart(ssd, cd, timers))
+clock.register_state_factory("TimerAlarm", lambda: states.TimerAlarm(ssd, cd, alarm_timer, clock.processEvent, buzzer_pin, motor_pin))
+
+# Edit states are rarely used and may be dropped again if the heap runs low
+clock.register_state_factory("SetHour10", lambda: states_edit.SetHour10(ssd, cd), True)
+clock.register_state_factory("SetHour1", lambda: states_edit.SetHour1(ssd, cd), True)
+clock.register_state_factory("SetMinute10", lambda: states_edit.SetMinute10(ssd, cd), True)
+clock.register_state_factory("SetMinute1", lambda: states_edit.SetMinute1(ssd, cd), True)
+clock.register_state_factory("SetYear", lambda: states_edit.SetYear(ssd, cd), True)
+clock.register_state_factory("SetMonth", lambda: states_edit.SetMonth(ssd, cd), True)
+clock.register_state_factory("SetDay", lambda: states_edit.SetDay(ssd, cd, rtc), True)
+clock.register_state_factory("SetElevation", lambda: states_edit.SetElevation(ssd, cd, rtc), True)
+clock.register_state_factory("TimerSetMinute10", lambda: states_edit.TimerSetMinute10(ssd, cd), True)
+clock.register_state_factory("TimerSetMinute1", lambda: states_edit.TimerSetMinute1(ssd, cd), True)
+clock.register_state_factory("TimerSetSecond10", lambda: states_edit.TimerSetSecond10(ssd, cd), True)
+clock.register_state_factory("TimerSetSecond1", lambda: states_edit.TimerSetSecond1(ssd, cd, rtc), True)
 
 
 r.add_listener(clock.processEvent)
+bootprof.mark("listener")
+
+power = PowerManager(clock, (clock.next_wakeup_ms, timers.next_wakeup_ms), Pin(24, Pin.IN), # GP24: VBUS sense
+                     (Pin(22), Pin(26), Pin(27))) # Encoder clk, dt and button, see power.py for gpio_wake
 
 #
 clock.init()
+bootprof.mark("clock init")
+bootprof.report()
+bootprof.enabled = False
+
+if __name__ == "__main__" and not Pin(27).value(): # Button held at boot: stay in the REPL
+    power.run() # Ctrl-C returns to the REPL (power.report() shows the duty cycle)
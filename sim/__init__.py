@@ -0,0 +1,96 @@
+# sim Host side simulator for the pico clock
+
+# Runs the unchanged clock code (main.py and lib/) on CPython or the
+# MicroPython unix port. The device modules (machine, micropython, utime,
+# uasyncio, framebuf, ...) are replaced by fakes running on a virtual clock,
+# the e-paper panel, DS1302, BMP280 and the rotary encoder are simulated.
+#
+# Usage:
+#   python3 -m sim --script events.txt --until 120000 --frames /tmp/frames
+#
+# or from Python:
+#   from sim.app import Simulator
+#   s = Simulator()
+#   s.boot()
+#   s.run([(1000, 'click'), (3000, 'inc')], until_ms=20_000)
+#   print(s.clock._cur_state, s.panel.refreshes)
+
+import sys
+
+from sim import vtime
+
+IS_MICROPYTHON = sys.implementation.name == 'micropython'
+
+_parts = __file__.rsplit('/', 2)  # No os.path on the unix port
+ROOT = _parts[0] if len(_parts) == 3 else '.'
+LIB = ROOT + '/lib'
+
+# Sizes reported by the fake gc.mem_free()/mem_alloc() on CPython
+HEAP_SIZE = 192 * 1024
+heap_used = 48 * 1024
+
+_installed = False
+
+
+def _install_shims():
+    # Names only used in annotations of the device code. MicroPython never
+    # evaluates annotations, CPython does when a function is defined.
+    import builtins
+    import gc
+    import types
+    import typing
+
+    shims = {
+        'Any': typing.Any,
+        'Tuple': typing.Tuple,
+        'FunctionType': types.FunctionType,
+        'EDP': object,
+        # Viper pointer casts and types
+        'ptr': lambda buf: buf,
+        'ptr8': lambda buf: buf,
+        'ptr16': lambda buf: buf,
+        'ptr32': lambda buf: buf,
+        'uint': int,
+    }
+    for name, value in shims.items():
+        if not hasattr(builtins, name):
+            setattr(builtins, name, value)
+
+    if not hasattr(gc, 'mem_free'):
+        gc.mem_free = lambda: HEAP_SIZE - heap_used
+        gc.mem_alloc = lambda: heap_used
+
+
+def install():
+    # Put the fake device modules into sys.modules and lib/ on the path
+    global _installed
+    if LIB not in sys.path:
+        sys.path.insert(0, LIB)
+    if _installed:
+        return
+    _installed = True
+
+    from sim.modules import machine, micropython, utime
+    sys.modules['machine'] = machine
+    sys.modules['micropython'] = micropython
+    sys.modules['utime'] = utime
+
+    if not IS_MICROPYTHON:
+        from sim.modules import framebuf, uasyncio, uctypes, ustruct
+        sys.modules['framebuf'] = framebuf
+        sys.modules['uasyncio'] = uasyncio
+        sys.modules['uctypes'] = uctypes
+        sys.modules['ustruct'] = ustruct
+        _install_shims()
+
+
+def reset():
+    # Forget all simulated hardware and the imported clock modules
+    from sim.modules import machine
+    vtime.reset()
+    machine.reset()
+    for name in list(sys.modules):
+        mod = sys.modules[name]
+        path = getattr(mod, '__file__', None) or ''
+        if name in ('DS1302', 'rotary_irq_rp2', 'color_setup') or path.startswith(LIB + '/'):
+            del sys.modules[name]
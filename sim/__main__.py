@@ -0,0 +1,38 @@
+# Command line entry of the simulator: python3 -m sim --help
+
+import sys
+
+from sim.app import Simulator, load_script
+
+
+def _parse_rtc(text):
+    # "2021-05-01 12:34:50"
+    date, time = text.split()
+    y, m, d = (int(v) for v in date.split('-'))
+    hh, mm, ss = (int(v) for v in time.split(':'))
+    return (y, m, d, 0, hh, mm, ss)
+
+
+def main(argv):
+    import argparse
+    parser = argparse.ArgumentParser(prog='python3 -m sim', description='Run main.py on simulated hardware.')
+    parser.add_argument('--script', help='encoder event script ("<ms> <inc|dec|click|dbl|long>" per line)')
+    parser.add_argument('--until', type=int, default=70_000, help='virtual run time in ms (default: 70000)')
+    parser.add_argument('--frames', help='directory to store every refreshed frame')
+    parser.add_argument('--format', choices=('png', 'pbm'), default='png', help='frame image format')
+    parser.add_argument('--rtc', help='RTC start time "YYYY-MM-DD hh:mm:ss"')
+    parser.add_argument('--power', action='store_true', help='run the main loop with light sleep (power manager)')
+    args = parser.parse_args(argv)
+
+    script = load_script(args.script) if args.script else []
+    s = Simulator(frames_dir=args.frames, frame_format=args.format, keep_frames=False,
+                  rtc_time=_parse_rtc(args.rtc) if args.rtc else None)
+    s.boot()
+    s.run(script, until_ms=max(args.until, script[-1][0] if script else 0), power=args.power)
+    for key, value in s.summary().items():
+        print('{:<18s} {}'.format(key, value))
+    if args.power:
+        s.namespace['power'].report()
+
+
+main(sys.argv[1:])
@@ -0,0 +1,120 @@
+# app.py Boot main.py on simulated hardware and drive it with encoder scripts
+
+import sys
+
+import sim
+from sim import vtime
+from sim.devices import FakeBattery, FakeBMP280, FakeDS1302, ScriptedEncoder, make_ds1302_module, make_rotary_module
+from sim.modules import machine
+from sim.panel import Panel
+
+ACTIONS = ('inc', 'dec', 'click', 'dbl', 'long')
+
+
+def parse_script(text):
+    # One event per line: "<ms> <action>" at an absolute virtual time or
+    # "+<ms> <action>" relative to the previous event. '#' starts a comment.
+    script = []
+    t = 0
+    for n, line in enumerate(text.split('\n'), 1):
+        line = line.split('#', 1)[0].strip()
+        if not line:
+            continue
+        parts = line.split()
+        if len(parts) != 2 or parts[1] not in ACTIONS:
+            raise ValueError('line {}: expected "<ms> <{}>"'.format(n, '|'.join(ACTIONS)))
+        at, action = parts
+        t = t + int(at[1:]) if at.startswith('+') else int(at)
+        script.append((t, action))
+    return script
+
+
+def load_script(path):
+    with open(path) as f:
+        return parse_script(f.read())
+
+
+class Simulator:
+    def __init__(self, frames_dir=None, frame_format='png', keep_frames=True, rtc_time=None):
+        sim.reset()
+        sim.install()
+        self.panel = Panel(frames_dir=frames_dir, frame_format=frame_format, keep_frames=keep_frames)
+        self.bmp280 = FakeBMP280()
+        self.battery = FakeBattery()
+        ds1302 = make_ds1302_module()
+        if rtc_time is not None:
+            ds1302.DS1302 = type('FakeDS1302', (FakeDS1302,), {'start_time': rtc_time})
+        sys.modules['DS1302'] = ds1302
+        sys.modules['rotary_irq_rp2'] = make_rotary_module()
+        ScriptedEncoder.instances.clear()
+        self.namespace = None
+        self.clock = None
+        self.encoder = None
+
+    def boot(self):
+        # Execute main.py like the device does after power-up. The main loop
+        # (power manager) is not entered, run(power=True) drives it instead.
+        ns = {'__name__': 'main'}
+        with open(sim.ROOT + '/main.py') as f:
+            exec(compile(f.read(), 'main.py', 'exec'), ns)
+        self.namespace = ns
+        self.clock = ns['clock']
+        self.encoder = ScriptedEncoder.instances[-1]
+        return self
+
+    @property
+    def now_ms(self):
+        return vtime.now_ms()
+
+    @property
+    def state_name(self):
+        state = self.clock._cur_state
+        return state.__class__.__name__ if state is not None else None
+
+    def advance(self, ms):
+        vtime.run_until(vtime.now_us() + int(ms * 1000))
+
+    def inject(self, action):
+        self.encoder.inject(action)
+        vtime.dispatch()
+
+    def run(self, script=(), until_ms=None, power=False):
+        # script: iterable of (virtual ms, action), sorted by time
+        # power: run the main loop of main.py (light sleep between wakeups)
+        if power:
+            self._run_power(script, until_ms)
+            return
+        for at_ms, action in script:
+            vtime.run_until(at_ms * 1000)
+            self.inject(action)
+        if until_ms is not None:
+            vtime.run_until(until_ms * 1000)
+
+    def _run_power(self, script, until_ms):
+        # Encoder actions become timed events, so they wake up a light sleep
+        # like the pin IRQs do on the device
+        pm = self.namespace['power']
+        end_us = 0
+        for at_ms, action in script:
+            vtime.call_at(at_ms * 1000, lambda _, a=action: self.encoder.inject(a))
+            end_us = at_ms * 1000
+        if until_ms is not None:
+            end_us = max(end_us, until_ms * 1000)
+        vtime.call_at(end_us, lambda _: None)  # Wakes up the last sleep at the end
+        while vtime.now_us() < end_us:
+            pm.step()
+
+    def summary(self):
+        panel = self.panel
+        return {
+            'time_ms': self.now_ms,
+            'state': self.state_name,
+            'frames': panel.frame_count,
+            'full_refreshes': panel.refreshes['full'],
+            'partial_refreshes': panel.refreshes['partial'],
+            'panel_busy_ms': panel.busy_ms,
+            'spi_bytes': panel.spi_bytes,
+            'encoder_events': self.encoder.events if self.encoder else 0,
+            'lightsleep_ms': machine.stats['lightsleep_ms'],
+            'lightsleep_calls': machine.stats['lightsleep_calls'],
+        }
@@ -0,0 +1,244 @@
+# devices.py Simulated peripherals: DS1302 RTC, BMP280 sensor and the rotary encoder
+
+import struct
+
+from sim import vtime
+from sim.modules import machine
+
+# Calibration and raw readings from the BMP280 datasheet example (25.08 C, 1006.5 hPa)
+BMP280_CALIBRATION = (27504, 26435, -1000, 36477, -10685, 3024, 2855, 140, -7, 15500, -14600, 6000)
+BMP280_T_RAW = 519888
+BMP280_P_RAW = 415148
+
+
+def _days_from_civil(y, m, d):
+    # Days since 1970-01-01 (proleptic Gregorian calendar)
+    y -= m <= 2
+    era = (y if y >= 0 else y - 399) // 400
+    yoe = y - era * 400
+    doy = (153 * (m + (-3 if m > 2 else 9)) + 2) // 5 + d - 1
+    doe = yoe * 365 + yoe // 4 - yoe // 100 + doy
+    return era * 146097 + doe - 719468
+
+
+def _civil_from_days(z):
+    z += 719468
+    era = (z if z >= 0 else z - 146096) // 146097
+    doe = z - era * 146097
+    yoe = (doe - doe // 1460 + doe // 36524 - doe // 146096) // 365
+    doy = doe - (365 * yoe + yoe // 4 - yoe // 100)
+    mp = (5 * doy + 2) // 153
+    d = doy - (153 * mp + 2) // 5 + 1
+    m = mp + (3 if mp < 10 else -9)
+    return yoe + era * 400 + (m <= 2), m, d
+
+
+class FakeDS1302:
+    # API compatible with lib/DS1302.DS1302, the time runs on the virtual clock
+    start_time = (2021, 5, 1, 6, 12, 34, 50)  # year, month, day, weekday, hour, minute, second
+
+    def __init__(self, clk=None, dio=None, cs=None):
+        self._ram = bytearray(31)
+        self._running = True
+        self.DateTime(self.start_time)
+
+    def _now(self):
+        # Seconds since 1970
+        if not self._running:
+            return self._base
+        return self._base + (vtime.now_us() - self._base_us) // 1_000_000
+
+    def start(self):
+        if not self._running:
+            self._base_us = vtime.now_us()
+            self._running = True
+
+    def stop(self):
+        self._base = self._now()
+        self._running = False
+
+    def DateTime(self, dat=None):
+        if dat is None:
+            days, secs = divmod(self._now(), 86400)
+            year, month, day = _civil_from_days(days)
+            weekday = (days + 4) % 7  # DS1302/ClockData: 0 = Sunday, 1970-01-01 was a Thursday
+            return (year, month, day, weekday, secs // 3600, secs // 60 % 60, secs % 60)
+        year = 2000 + dat[0] % 100
+        days = _days_from_civil(year, max(1, dat[1]), max(1, dat[2]))
+        self._base = days * 86400 + (dat[4] % 24) * 3600 + (dat[5] % 60) * 60 + dat[6] % 60
+        self._base_us = vtime.now_us()
+
+    def Year(self, year=None):
+        return self._field(0, year)
+
+    def Month(self, month=None):
+        return self._field(1, month)
+
+    def Day(self, day=None):
+        return self._field(2, day)
+
+    def Weekday(self, weekday=None):
+        return self._field(3, weekday)
+
+    def Hour(self, hour=None):
+        return self._field(4, hour)
+
+    def Minute(self, minute=None):
+        return self._field(5, minute)
+
+    def Second(self, second=None):
+        return self._field(6, second)
+
+    def _field(self, idx, value):
+        dt = list(self.DateTime())
+        if value is None:
+            return dt[idx]
+        dt[idx] = value
+        self.DateTime(dt)
+
+    def ram(self, reg, dat=None):
+        if dat is None:
+            return self._ram[reg % 31]
+        self._ram[reg % 31] = dat & 0xFF
+
+
+class FakeBMP280:
+    # Register model on the I2C bus, drives the real lib/bmp280 driver
+    def __init__(self, bus_id=1, addr=0x76, t_raw=BMP280_T_RAW, p_raw=BMP280_P_RAW):
+        self.t_raw = t_raw
+        self.p_raw = p_raw
+        self.measurements = 0
+        self._regs = bytearray(256)
+        self._regs[0xD0] = 0x58  # Chip id
+        fmt = ('<H', '<h', '<h', '<H', '<h', '<h', '<h', '<h', '<h', '<h', '<h', '<h')
+        for n, (f, v) in enumerate(zip(fmt, BMP280_CALIBRATION)):
+            self._regs[0x88 + 2 * n:0x8A + 2 * n] = struct.pack(f, v)
+        machine.attach_i2c(bus_id, addr, self)
+
+    def read(self, reg, n):
+        if reg == 0xF7:
+            p, t = self.p_raw, self.t_raw
+            self._regs[0xF7:0xFD] = bytes((p >> 12 & 0xFF, p >> 4 & 0xFF, (p & 0x0F) << 4,
+                                           t >> 12 & 0xFF, t >> 4 & 0xFF, (t & 0x0F) << 4))
+        return self._regs[reg:reg + n]
+
+    def write(self, reg, data):
+        if reg == 0xF4:  # Measurement control
+            self.measurements += 1
+        self._regs[reg:reg + len(data)] = data
+
+
+class FakeBattery:
+    # VSYS / 3 on ADC3 (GP29), a LiPo cell discharging linearly with noise
+    def __init__(self, mv=3950, drain_mv_per_h=20, noise_mv=30, channel=3):
+        self.mv = mv
+        self.drain_mv_per_h = drain_mv_per_h
+        self.noise_mv = noise_mv
+        self.reads = 0
+        self._seed = 12345
+        machine.attach_adc(channel, self.read_u16)
+
+    def _noise(self):
+        self._seed = (self._seed * 1103515245 + 12345) & 0x7FFFFFFF  # Deterministic
+        return self._seed % (2 * self.noise_mv + 1) - self.noise_mv
+
+    def read_u16(self):
+        self.reads += 1
+        mv = self.mv - self.drain_mv_per_h * vtime.now_ms() // 3_600_000 + self._noise()
+        return max(0, min(65535, mv * 65535 // (3 * 3300)))
+
+
+class ScriptedEncoder:
+    # Collects the RotaryIRQ instance created by main.py and injects events the
+    # way rotary.Rotary issues them (scheduled, with the same timings)
+    CLICK_UP_MS = 100
+    DBL_CLICK_MS = 450  # rotary._PERIOD_DBL_CLICK
+    LONG_CLICK_MS = 800  # rotary._PERIOD_LONG_CLICK
+
+    instances = []
+
+    def __init__(self, rotary):
+        self.rotary = rotary
+        self.events = 0
+
+    def _issue(self, event_type, btn_pushed=False):
+        from rotary import Event, _trigger
+        if not self.rotary._listener:
+            return
+        self.events += 1
+        try:
+            vtime.schedule(_trigger, Event(self.rotary, event_type, self.rotary._value, btn_pushed))
+        except RuntimeError:
+            pass  # Dropped like on the device when the schedule queue is full
+
+    def _later(self, ms, event_type, btn_pushed=False):
+        vtime.call_later_ms(ms, lambda _: self._issue(event_type, btn_pushed))
+
+    def inject(self, action):
+        from rotary import Event
+        if action == 'inc':
+            self.rotary._value += 1
+            self._issue(Event.EVENT_ROT_INC)
+        elif action == 'dec':
+            self.rotary._value -= 1
+            self._issue(Event.EVENT_ROT_DEC)
+        elif action == 'click':
+            self._issue(Event.EVENT_BTN_DOWN, True)
+            self._later(self.CLICK_UP_MS, Event.EVENT_BTN_UP)
+            self._later(self.CLICK_UP_MS + self.DBL_CLICK_MS, Event.EVENT_BTN_CLICK)
+        elif action == 'dbl':
+            self._issue(Event.EVENT_BTN_DOWN, True)
+            self._later(self.CLICK_UP_MS, Event.EVENT_BTN_UP)
+            self._later(2 * self.CLICK_UP_MS, Event.EVENT_BTN_DOWN, True)
+            self._later(3 * self.CLICK_UP_MS, Event.EVENT_BTN_UP)
+            self._later(3 * self.CLICK_UP_MS + self.DBL_CLICK_MS, Event.EVENT_BTN_DBL_CLICK)
+        elif action == 'long':
+            self._issue(Event.EVENT_BTN_DOWN, True)
+            self._later(self.LONG_CLICK_MS, Event.EVENT_BTN_LONG_CLICK, True)
+            self._later(self.LONG_CLICK_MS + 200, Event.EVENT_BTN_UP)
+        else:
+            raise ValueError('Unknown encoder action: {}'.format(action))
+
+
+class _Module:
+    # Plain object standing in for a replaced module in sys.modules
+    def __init__(self, name, **attrs):
+        self.__name__ = name
+        for k, v in attrs.items():
+            setattr(self, k, v)
+
+
+def make_rotary_module():
+    # Replacement for lib/rotary_irq_rp2: no pin interrupts, events are injected
+    from rotary import Rotary
+
+    class RotaryIRQ(Rotary):
+        def __init__(self, pin_num_clk, pin_num_dt, min_val=0, max_val=10, start_val=None, reverse=True,
+                     range_mode=Rotary.RANGE_UNBOUNDED, pull_up=False, half_step=False, pin_num_sw=None):
+            super().__init__(min_val, max_val, reverse, range_mode, half_step, start_val, False)
+            self._pin_sw = pin_num_sw
+            ScriptedEncoder.instances.append(ScriptedEncoder(self))
+
+        def _hal_get_clk_value(self):
+            return 0
+
+        def _hal_get_dt_value(self):
+            return 0
+
+        def _hal_get_sw_value(self):
+            return False
+
+        def _hal_enable_irq(self):
+            pass
+
+        def _hal_disable_irq(self):
+            pass
+
+        def _hal_close(self):
+            pass
+
+    return _Module('rotary_irq_rp2', RotaryIRQ=RotaryIRQ)
+
+
+def make_ds1302_module():
+    return _Module('DS1302', DS1302=FakeDS1302)
@@ -0,0 +1 @@
+# Fake MicroPython modules, installed into sys.modules by sim.install()
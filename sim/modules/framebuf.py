@@ -0,0 +1,178 @@
+# framebuf.py Pure Python stand-in for MicroPython's framebuf module
+
+# Only the monochrome formats are implemented, with the same memory layout as
+# the C module, so drivers can send the underlying buffer unchanged. On the
+# MicroPython unix port the built-in module is used instead.
+
+MONO_VLSB = 0
+MVLSB = MONO_VLSB
+RGB565 = 1
+GS4_HMSB = 2
+MONO_HLSB = 3
+MONO_HMSB = 4
+GS2_HMSB = 5
+GS8 = 6
+
+
+class FrameBuffer:
+    def __init__(self, buffer, width, height, format, stride=None):
+        if format not in (MONO_VLSB, MONO_HLSB, MONO_HMSB):
+            raise ValueError('invalid format')
+        if stride is None or stride == 0:
+            stride = width
+        if format in (MONO_HLSB, MONO_HMSB):
+            stride = (stride + 7) & ~7
+        self._fb_buf = buffer
+        self._fb_w = width
+        self._fb_h = height
+        self._fb_format = format
+        self._fb_stride = stride
+
+    # Pixel access without bounds checks
+    def _get(self, x, y):
+        fmt = self._fb_format
+        if fmt == MONO_VLSB:
+            return (self._fb_buf[(y >> 3) * self._fb_stride + x] >> (y & 7)) & 1
+        idx = (x + y * self._fb_stride) >> 3
+        bit = 7 - (x & 7) if fmt == MONO_HLSB else x & 7
+        return (self._fb_buf[idx] >> bit) & 1
+
+    def _set(self, x, y, c):
+        fmt = self._fb_format
+        if fmt == MONO_VLSB:
+            idx = (y >> 3) * self._fb_stride + x
+            bit = y & 7
+        else:
+            idx = (x + y * self._fb_stride) >> 3
+            bit = 7 - (x & 7) if fmt == MONO_HLSB else x & 7
+        if c & 1:
+            self._fb_buf[idx] |= 1 << bit
+        else:
+            self._fb_buf[idx] &= ~(1 << bit) & 0xFF
+
+    def fill(self, c):
+        n = len(self._fb_buf)
+        self._fb_buf[0:n] = (b'\xff' if c & 1 else b'\x00') * n
+
+    def pixel(self, x, y, c=None):
+        if not (0 <= x < self._fb_w and 0 <= y < self._fb_h):
+            return None
+        if c is None:
+            return self._get(x, y)
+        self._set(x, y, c)
+
+    def fill_rect(self, x, y, w, h, c):
+        x0 = max(x, 0)
+        y0 = max(y, 0)
+        x1 = min(x + w, self._fb_w)
+        y1 = min(y + h, self._fb_h)
+        if self._fb_format == MONO_HLSB and x1 > x0:
+            self._fill_rect_hlsb(x0, y0, x1, y1, c)
+            return
+        for yy in range(y0, y1):
+            for xx in range(x0, x1):
+                self._set(xx, yy, c)
+
+    def _fill_rect_hlsb(self, x0, y0, x1, y1, c):
+        buf = self._fb_buf
+        bpr = self._fb_stride >> 3
+        for yy in range(y0, y1):
+            row = yy * bpr
+            xx = x0
+            while xx < x1:
+                idx = row + (xx >> 3)
+                if xx & 7 == 0 and xx + 8 <= x1:  # Whole byte
+                    buf[idx] = 0xFF if c & 1 else 0
+                    xx += 8
+                else:
+                    bit = 1 << (7 - (xx & 7))
+                    if c & 1:
+                        buf[idx] |= bit
+                    else:
+                        buf[idx] &= ~bit & 0xFF
+                    xx += 1
+
+    def hline(self, x, y, w, c):
+        self.fill_rect(x, y, w, 1, c)
+
+    def vline(self, x, y, h, c):
+        self.fill_rect(x, y, 1, h, c)
+
+    def rect(self, x, y, w, h, c, f=False):
+        if f:
+            self.fill_rect(x, y, w, h, c)
+            return
+        self.fill_rect(x, y, w, 1, c)
+        self.fill_rect(x, y + h - 1, w, 1, c)
+        self.fill_rect(x, y, 1, h, c)
+        self.fill_rect(x + w - 1, y, 1, h, c)
+
+    def line(self, x1, y1, x2, y2, c):
+        # Bresenham, as in extmod/modframebuf.c
+        dx = x2 - x1
+        sx = 1 if dx > 0 else -1
+        dx = abs(dx)
+        dy = y2 - y1
+        sy = 1 if dy > 0 else -1
+        dy = abs(dy)
+        steep = dy > dx
+        if steep:
+            x1, y1 = y1, x1
+            dx, dy = dy, dx
+            sx, sy = sy, sx
+        e = 2 * dy - dx
+        w, h = self._fb_w, self._fb_h
+        for _ in range(dx):
+            if steep:
+                if 0 <= y1 < w and 0 <= x1 < h:
+                    self._set(y1, x1, c)
+            elif 0 <= x1 < w and 0 <= y1 < h:
+                self._set(x1, y1, c)
+            while e >= 0:
+                y1 += sy
+                e -= 2 * dx
+            x1 += sx
+            e += 2 * dy
+        if 0 <= x2 < w and 0 <= y2 < h:
+            self._set(x2, y2, c)
+
+    def blit(self, fbuf, x, y, key=-1, palette=None):
+        if isinstance(fbuf, tuple):
+            fbuf = FrameBuffer(*fbuf)
+        if x >= self._fb_w or y >= self._fb_h or -x >= fbuf._fb_w or -y >= fbuf._fb_h:
+            return
+        x0 = max(0, x)
+        y0 = max(0, y)
+        x1 = min(self._fb_w, x + fbuf._fb_w)
+        y1 = min(self._fb_h, y + fbuf._fb_h)
+        for cy in range(y0, y1):
+            for cx in range(x0, x1):
+                col = fbuf._get(cx - x, cy - y)
+                if palette is not None:
+                    col = palette._get(col, 0)
+                if col != key:
+                    self._set(cx, cy, col)
+
+    def scroll(self, xstep, ystep):
+        w, h = self._fb_w, self._fb_h
+        if xstep < 0:
+            sx, xend, dx = 0, w + xstep, 1
+        else:
+            sx, xend, dx = w - 1, xstep - 1, -1
+        if ystep < 0:
+            y, yend, dy = 0, h + ystep, 1
+        else:
+            y, yend, dy = h - 1, ystep - 1, -1
+        while y != yend:
+            x = sx
+            while x != xend:
+                self._set(x, y, self._get(x - xstep, y - ystep))
+                x += dx
+            y += dy
+
+    def text(self, s, x, y, c=1):
+        raise NotImplementedError('FrameBuffer.text is not simulated')
+
+
+def FrameBuffer1(buffer, width, height, format=MONO_VLSB, stride=None):
+    return FrameBuffer(buffer, width, height, format, stride)
@@ -0,0 +1,229 @@
+# machine.py Fake machine module for the host simulator
+
+# Pins are shared per pin id, like the GPIOs they stand for. Simulated devices
+# attach to the buses (SPI/I2C) by bus id and may drive input pins.
+
+from sim import vtime
+
+_pins = {}  # pin id -> _PinState
+_spi_devices = {}  # bus id -> list of devices with a write(data) method
+_i2c_devices = {}  # (bus id, address) -> device with read(reg, n)/write(reg, data)
+_adc_sources = {}  # channel -> callable returning a 16 bit reading
+
+stats = {'lightsleep_ms': 0, 'lightsleep_calls': 0}
+
+
+def reset():
+    _pins.clear()
+    _spi_devices.clear()
+    _i2c_devices.clear()
+    _adc_sources.clear()
+    stats['lightsleep_ms'] = 0
+    stats['lightsleep_calls'] = 0
+
+
+class _PinState:
+    def __init__(self):
+        self.mode = -1
+        self.value = 0
+        self.driver = None  # callable returning the level of an input pin
+        self.handler = None
+        self.trigger = 0
+
+
+def _pin_state(pin_id):
+    state = _pins.get(pin_id)
+    if state is None:
+        state = _PinState()
+        _pins[pin_id] = state
+    return state
+
+
+def drive_pin(pin_id, driver):
+    # Let a simulated device provide the level of an input pin
+    _pin_state(pin_id).driver = driver
+
+
+def pin_value(pin_id):
+    state = _pin_state(pin_id)
+    return state.driver() if state.driver is not None else state.value
+
+
+def attach_spi(bus_id, device):
+    _spi_devices.setdefault(bus_id, []).append(device)
+
+
+def attach_i2c(bus_id, addr, device):
+    _i2c_devices[(bus_id, addr)] = device
+
+
+def attach_adc(channel, source):
+    _adc_sources[channel] = source
+
+
+class Pin:
+    IN = 0
+    OUT = 1
+    OPEN_DRAIN = 2
+    PULL_UP = 1
+    PULL_DOWN = 2
+    IRQ_FALLING = 4
+    IRQ_RISING = 8
+
+    def __init__(self, pin_id, mode=-1, pull=-1, value=None):
+        self._id = pin_id
+        self._state = _pin_state(pin_id)
+        self.init(mode, pull, value=value)
+
+    def init(self, mode=-1, pull=-1, value=None):
+        if mode != -1:
+            self._state.mode = mode
+        if value is not None:
+            self._state.value = 1 if value else 0
+
+    def value(self, v=None):
+        if v is None:
+            return pin_value(self._id)
+        self._state.value = 1 if v else 0
+
+    def __call__(self, v=None):
+        return self.value(v)
+
+    def on(self):
+        self._state.value = 1
+
+    def off(self):
+        self._state.value = 0
+
+    def toggle(self):
+        self._state.value ^= 1
+
+    def irq(self, handler=None, trigger=IRQ_FALLING | IRQ_RISING, hard=False):
+        self._state.handler = handler
+        self._state.trigger = trigger
+
+    def __repr__(self):
+        return 'Pin({})'.format(self._id)
+
+
+class SPI:
+    def __init__(self, bus_id, baudrate=1_000_000, **kwargs):
+        self._id = bus_id
+        self.baudrate = baudrate
+        self.bytes_written = 0
+
+    def init(self, baudrate=None, **kwargs):
+        if baudrate is not None:
+            self.baudrate = baudrate
+
+    def write(self, buf):
+        data = bytes(buf)
+        self.bytes_written += len(data)
+        for device in _spi_devices.get(self._id, ()):
+            device.write(data)
+
+    def deinit(self):
+        pass
+
+
+class I2C:
+    def __init__(self, bus_id, scl=None, sda=None, freq=400_000):
+        self._id = bus_id
+
+    def _device(self, addr):
+        device = _i2c_devices.get((self._id, addr))
+        if device is None:
+            raise OSError(5)  # EIO, like a missing ACK
+        return device
+
+    def scan(self):
+        return sorted(addr for bus, addr in _i2c_devices if bus == self._id)
+
+    def readfrom_mem(self, addr, memaddr, nbytes):
+        return bytes(self._device(addr).read(memaddr, nbytes))
+
+    def writeto_mem(self, addr, memaddr, buf):
+        self._device(addr).write(memaddr, bytes(buf))
+
+
+class ADC:
+    CORE_TEMP = 4
+
+    def __init__(self, pin):
+        channel = pin._id - 26 if isinstance(pin, Pin) else pin
+        self._channel = channel
+
+    def read_u16(self):
+        source = _adc_sources.get(self._channel)
+        return source() if source is not None else 0
+
+
+class Timer:
+    ONE_SHOT = 0
+    PERIODIC = 1
+
+    def __init__(self, timer_id=-1, mode=PERIODIC, period=-1, callback=None, freq=-1):
+        self._handle = None
+        if callback is not None:
+            self.init(mode=mode, period=period, callback=callback, freq=freq)
+
+    def init(self, mode=PERIODIC, period=-1, callback=None, freq=-1, tick_hz=1000):
+        self.deinit()
+        if freq > 0:
+            period_us = 1_000_000 // freq
+        else:
+            period_us = int(period * 1_000_000 // tick_hz)
+        self._mode = mode
+        self._period_us = max(period_us, 1)
+        self._callback = callback
+        self._handle = vtime.call_at(vtime.now_us() + self._period_us, self._fire)
+
+    def _fire(self, _):
+        if self._mode == Timer.PERIODIC:
+            self._handle = vtime.call_at(vtime.now_us() + self._period_us, self._fire)
+        else:
+            self._handle = None
+        if self._callback is not None:
+            self._callback(self)
+
+    def deinit(self):
+        vtime.cancel(self._handle)
+        self._handle = None
+
+
+def lightsleep(time_ms=None):
+    # Wakes up early on the next pending timer or event, like the real thing
+    now = vtime.now_us()
+    target = now + time_ms * 1000 if time_ms is not None else None
+    due = vtime.next_due_us()
+    if due is not None and (target is None or due < target):
+        target = due
+    if target is None:
+        return
+    stats['lightsleep_calls'] += 1
+    stats['lightsleep_ms'] += max(0, target - now) // 1000
+    vtime.advance_to(target)  # Callbacks run once the caller continues
+
+
+def idle():
+    vtime.dispatch()
+
+
+def freq(hz=None):
+    return 125_000_000
+
+
+def unique_id():
+    return b'\x00\x00\x00\x00\x00\x00\x00\x01'
+
+
+def reset_cause():
+    return 1
+
+
+def disable_irq():
+    return 0
+
+
+def enable_irq(state=0):
+    pass
@@ -0,0 +1,39 @@
+# micropython.py Fake micropython module for the host simulator
+
+# The code emitter decorators are no-ops on CPython. On the MicroPython unix
+# port the compiler handles them itself, so only schedule() differs from the
+# built-in module: it queues on the simulator's virtual clock.
+
+from sim import vtime
+
+
+def const(expr):
+    return expr
+
+
+def schedule(func, arg):
+    vtime.schedule(func, arg)
+
+
+def native(func):
+    return func
+
+
+def viper(func):
+    return func
+
+
+def asm_thumb(func):
+    return func
+
+
+def alloc_emergency_exception_buf(size):
+    pass
+
+
+def mem_info(verbose=False):
+    pass
+
+
+def opt_level(level=None):
+    return 0
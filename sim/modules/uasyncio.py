@@ -0,0 +1,36 @@
+# uasyncio.py Minimal fake uasyncio module for the host simulator
+
+# Only what the display driver needs at construction time. The asynchronous
+# display mode is not simulated.
+
+from sim import vtime
+
+
+class Event:
+    def __init__(self):
+        self._flag = False
+
+    def set(self):
+        self._flag = True
+
+    def clear(self):
+        self._flag = False
+
+    def is_set(self):
+        return self._flag
+
+    async def wait(self):
+        while not self._flag:
+            await sleep_ms(1)
+
+
+async def sleep_ms(ms):
+    vtime.sleep_us(int(ms) * 1000)
+
+
+async def sleep(s):
+    vtime.sleep_us(int(s * 1_000_000))
+
+
+def create_task(coro):
+    raise NotImplementedError('uasyncio tasks are not simulated')
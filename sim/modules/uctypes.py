@@ -0,0 +1,12 @@
+# uctypes.py Fake uctypes module for the host simulator
+
+# Raw memory access is not possible on the host. Writer only needs these in
+# its pyboard fast mode, which is never enabled here.
+
+
+def addressof(obj):
+    raise NotImplementedError('uctypes.addressof is not simulated')
+
+
+def bytearray_at(addr, size):
+    raise NotImplementedError('uctypes.bytearray_at is not simulated')
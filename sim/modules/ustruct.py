@@ -0,0 +1,3 @@
+# ustruct.py Fake ustruct module for the host simulator
+
+from struct import calcsize, pack, pack_into, unpack, unpack_from
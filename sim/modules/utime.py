@@ -0,0 +1,45 @@
+# utime.py Fake utime module running on the simulator's virtual clock
+
+from sim import vtime
+
+_MASK = vtime.TICKS_MAX
+_HALF = vtime.TICKS_HALFPERIOD
+
+
+def ticks_us():
+    return vtime.now_us() & _MASK
+
+
+def ticks_ms():
+    return vtime.now_ms() & _MASK
+
+
+ticks_cpu = ticks_us
+
+
+def ticks_add(ticks, delta):
+    return (ticks + delta) & _MASK
+
+
+def ticks_diff(ticks1, ticks2):
+    return ((ticks1 - ticks2 + _HALF) & _MASK) - _HALF
+
+
+def sleep_us(us):
+    vtime.sleep_us(int(us))
+
+
+def sleep_ms(ms):
+    vtime.sleep_us(int(ms) * 1000)
+
+
+def sleep(s):
+    vtime.sleep_us(int(s * 1_000_000))
+
+
+def time():
+    return vtime.now_us() // 1_000_000
+
+
+def time_ns():
+    return vtime.now_us() * 1000
@@ -0,0 +1,180 @@
+# panel.py Simulated Waveshare 1.54" v2 e-paper panel (SSD1681 controller)
+
+# Stand-in for the physical display behind drivers/epaper/epd1in54_V2_fb.EPD:
+# it listens on the SPI bus, decodes commands and RAM writes, drives the busy
+# pin for the duration of a refresh and captures every refreshed frame. The
+# real driver runs unchanged on top of it.
+
+import os
+import struct
+
+from sim import vtime
+from sim.modules import machine
+
+WIDTH = 200
+HEIGHT = 200
+ROW_BYTES = WIDTH // 8
+
+# Typical durations of the real panel (milliseconds)
+FULL_REFRESH_MS = 2000
+PARTIAL_REFRESH_MS = 600
+RESET_MS = 10
+INIT_MS = 100
+
+
+class Frame:
+    def __init__(self, index, time_ms, full, data, spi_bytes):
+        self.index = index
+        self.time_ms = time_ms
+        self.full = full  # Full (0xF7) or partial (0xFF) waveform
+        self.data = data  # MONO_HLSB, 1 = black
+        self.spi_bytes = spi_bytes  # Bytes sent since the previous refresh
+
+    def pbm(self):
+        return b'P4\n%d %d\n' % (WIDTH, HEIGHT) + self.data
+
+    def png(self):
+        import zlib  # Not available on every unix port build, PBM works without
+        raw = bytearray()
+        for row in range(HEIGHT):
+            raw.append(0)  # Filter type none
+            raw.extend(0xFF & ~b for b in self.data[row * ROW_BYTES:(row + 1) * ROW_BYTES])  # PNG: 0 = black
+
+        def chunk(tag, body):
+            return struct.pack('>I', len(body)) + tag + body + struct.pack('>I', zlib.crc32(tag + body))
+
+        ihdr = struct.pack('>IIBBBBB', WIDTH, HEIGHT, 1, 0, 0, 0, 0)  # 1 bit grayscale
+        return b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', ihdr) + chunk(b'IDAT', zlib.compress(bytes(raw))) + chunk(b'IEND', b'')
+
+    def save(self, path):
+        with open(path, 'wb') as f:
+            f.write(self.png() if path.endswith('.png') else self.pbm())
+
+
+class Panel:
+    def __init__(self, spi_id=0, cs=17, dc=16, rst=20, busy=21,
+                 frames_dir=None, frame_format='png', keep_frames=True):
+        self._cs = cs
+        self._dc = dc
+        self.frames_dir = frames_dir
+        self.frame_format = frame_format
+        self.keep_frames = keep_frames
+        self.ram = bytearray(ROW_BYTES * HEIGHT)  # Black/white RAM (0x24), indexed [y][x byte]
+        self.frames = []
+        self.frame_count = 0
+        self.last_frame = None
+        self.spi_bytes = 0  # Total
+        self.cmd_bytes = {}  # Bytes per command (command byte included)
+        self.refreshes = {'full': 0, 'partial': 0}
+        self.busy_ms = 0  # Accumulated busy time
+        self.sleeping = False
+        self._spi_bytes_at_refresh = 0
+        self._busy_until_us = 0
+        self._cmd = None
+        self._data = bytearray()
+        self._update_ctrl = 0xF7
+        self._x_start, self._x_end = 0, ROW_BYTES - 1
+        self._y_start, self._y_end = HEIGHT - 1, 0
+        self._x, self._y = 0, HEIGHT - 1
+        self._entry_mode = 0x03
+        machine.attach_spi(spi_id, self)
+        machine.drive_pin(busy, self._busy_level)
+        if frames_dir:
+            try:
+                os.mkdir(frames_dir)
+            except OSError:
+                pass  # Exists
+
+    def _busy_level(self):
+        return 1 if vtime.now_us() < self._busy_until_us else 0
+
+    def _set_busy(self, ms):
+        self.busy_ms += ms
+        self._busy_until_us = max(self._busy_until_us, vtime.now_us()) + ms * 1000
+
+    def write(self, data):
+        if machine.pin_value(self._cs):
+            return  # Not selected
+        self.spi_bytes += len(data)
+        if machine.pin_value(self._dc) == 0:  # Command
+            for b in data:
+                self._start_command(b)
+        else:
+            self.cmd_bytes[self._cmd] = self.cmd_bytes.get(self._cmd, 0) + len(data)
+            if self._cmd in (0x24, 0x26):
+                self._write_ram(data)
+            else:
+                self._data.extend(data)
+                self._apply_data()
+
+    def _start_command(self, cmd):
+        self._cmd = cmd
+        self._data = bytearray()
+        self.cmd_bytes[cmd] = self.cmd_bytes.get(cmd, 0) + 1
+        if cmd == 0x12:  # SWRESET
+            self.sleeping = False
+            self._set_busy(RESET_MS)
+        elif cmd == 0x20:  # MASTER_ACTIVATION
+            self._activate()
+        elif cmd in (0x24, 0x26):  # RAM writes start at the address counters
+            self._ram_x, self._ram_y = self._x, self._y
+
+    def _apply_data(self):
+        cmd, d = self._cmd, self._data
+        if cmd == 0x11 and len(d) >= 1:
+            self._entry_mode = d[0]
+        elif cmd == 0x44 and len(d) >= 2:
+            self._x_start, self._x_end = d[0] & 0x3F, d[1] & 0x3F
+        elif cmd == 0x45 and len(d) >= 4:
+            self._y_start = d[0] | (d[1] << 8)
+            self._y_end = d[2] | (d[3] << 8)
+        elif cmd == 0x4E and len(d) >= 1:
+            self._x = d[0] & 0x3F
+        elif cmd == 0x4F and len(d) >= 2:
+            self._y = d[0] | (d[1] << 8)
+        elif cmd == 0x22 and len(d) >= 1:
+            self._update_ctrl = d[0]
+        elif cmd == 0x10 and len(d) >= 1 and d[0]:
+            self.sleeping = True
+
+    def _write_ram(self, data):
+        if self._cmd != 0x24:
+            return  # Only the black/white RAM is captured
+        ram = self.ram
+        x_inc = self._entry_mode & 0x01
+        y_inc = self._entry_mode & 0x02
+        x, y = self._ram_x, self._ram_y
+        for b in data:
+            if 0 <= x < ROW_BYTES and 0 <= y < HEIGHT:
+                ram[y * ROW_BYTES + x] = b
+            if x == (self._x_end if x_inc else self._x_start) or not 0 <= x < ROW_BYTES:
+                x = self._x_start if x_inc else self._x_end
+                y += 1 if y_inc else -1
+            else:
+                x += 1 if x_inc else -1
+        self._ram_x, self._ram_y = x, y
+
+    def image(self):
+        # RAM row y is shown on screen row HEIGHT - 1 - y (Y decrement entry mode)
+        data = bytearray(len(self.ram))
+        for y in range(HEIGHT):
+            row = HEIGHT - 1 - y
+            data[row * ROW_BYTES:(row + 1) * ROW_BYTES] = self.ram[y * ROW_BYTES:(y + 1) * ROW_BYTES]
+        return bytes(data)
+
+    def _activate(self):
+        if self._update_ctrl == 0xB1:  # Load temperature and waveform only
+            self._set_busy(INIT_MS)
+            return
+        full = self._update_ctrl != 0xFF
+        self.refreshes['full' if full else 'partial'] += 1
+        self._set_busy(FULL_REFRESH_MS if full else PARTIAL_REFRESH_MS)
+        frame = Frame(self.frame_count, vtime.now_ms(), full, self.image(),
+                      self.spi_bytes - self._spi_bytes_at_refresh)
+        self._spi_bytes_at_refresh = self.spi_bytes
+        self.frame_count += 1
+        self.last_frame = frame
+        if self.keep_frames:
+            self.frames.append(frame)
+        if self.frames_dir:
+            frame.save('{}/frame_{:04d}.{}'.format(self.frames_dir, frame.index, self.frame_format))
@@ -0,0 +1,130 @@
+# vtime.py Virtual time base of the host simulator
+
+# All fake device modules share one virtual clock in microseconds. Time only
+# moves when the simulated code sleeps or when the simulator advances it, so a
+# run is deterministic and independent of the speed of the host.
+#
+# Callbacks of machine.Timer and micropython.schedule are "soft" on the rp2
+# port: they become pending and are executed when the scheduler is unlocked
+# (between bytecodes, while sleeping or while idling in the REPL). The same is
+# done here: pending callbacks are dispatched by sleep() and run_until(), and
+# never recursively from within another callback.
+
+import heapq
+
+TICKS_PERIOD = 1 << 30
+TICKS_MAX = TICKS_PERIOD - 1
+TICKS_HALFPERIOD = TICKS_PERIOD // 2
+
+SCHEDULER_DEPTH = 4  # MICROPY_SCHEDULER_DEPTH default
+
+
+class _State:
+    def __init__(self):
+        self.now_us = 0
+        self.seq = 0
+        self.timers = []  # heap of [due_us, seq, callback, arg, active]
+        self.scheduled = []
+        self.locked = False
+
+
+_s = _State()
+
+
+def reset():
+    global _s
+    _s = _State()
+
+
+def now_us():
+    return _s.now_us
+
+
+def now_ms():
+    return _s.now_us // 1000
+
+
+def call_at(due_us, callback, arg=None):
+    # Returns a handle that can be passed to cancel()
+    _s.seq += 1
+    entry = [due_us, _s.seq, callback, arg, True]
+    heapq.heappush(_s.timers, entry)
+    return entry
+
+
+def call_later_ms(delay_ms, callback, arg=None):
+    return call_at(_s.now_us + int(delay_ms * 1000), callback, arg)
+
+
+def cancel(handle):
+    if handle is not None:
+        handle[4] = False
+
+
+def next_due_us():
+    timers = _s.timers
+    while timers and not timers[0][4]:
+        heapq.heappop(timers)
+    return timers[0][0] if timers else None
+
+
+def schedule(func, arg):
+    if len(_s.scheduled) >= SCHEDULER_DEPTH:
+        raise RuntimeError('schedule queue full')
+    _s.scheduled.append((func, arg))
+
+
+def _run_callback(func, arg):
+    _s.locked = True
+    try:
+        func(arg)
+    finally:
+        _s.locked = False
+
+
+def dispatch():
+    # Run everything that is pending at the current time
+    if _s.locked:
+        return
+    while True:
+        if _s.scheduled:
+            func, arg = _s.scheduled.pop(0)
+            _run_callback(func, arg)
+            continue
+        due = next_due_us()
+        if due is not None and due <= _s.now_us:
+            entry = heapq.heappop(_s.timers)
+            entry[4] = False
+            _run_callback(entry[2], entry[3])
+            continue
+        break
+
+
+def run_until(target_us):
+    # Advance the clock to target_us, firing due callbacks in order
+    while True:
+        dispatch()
+        due = next_due_us()
+        if _s.locked or due is None or due > target_us:
+            break
+        _s.now_us = max(_s.now_us, due)
+    if target_us > _s.now_us:
+        _s.now_us = target_us
+    dispatch()
+
+
+def advance_to(target_us):
+    # Move the clock forward without running anything (light sleep), the due
+    # callbacks run at the next dispatch
+    if target_us > _s.now_us:
+        _s.now_us = target_us
+
+
+def sleep_us(us):
+    if us <= 0:
+        dispatch()
+        return
+    if _s.locked:  # Sleeping inside a callback: pending work has to wait
+        _s.now_us += us
+        return
+    run_until(_s.now_us + us)
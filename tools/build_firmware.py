@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+# build_firmware.py Cross-compile the clock sources and create a frozen module manifest
+
+# Copyright (c) Christof Rath 2021
+# Released under the MIT license see LICENSE
+
+# Every .py file below lib/ is compiled on the device at each power-up unless
+# it is shipped precompiled. This script produces both variants:
+#
+#   mpy       Cross-compile lib/**/*.py with mpy-cross to build/mpy/**/*.mpy.
+#             Copy the content of build/mpy to the device instead of lib/.
+#   manifest  Write build/manifest.py to freeze all modules (fonts included)
+#             into a custom firmware, so that code and font tables run from
+#             flash:
+#               make -C ports/rp2 FROZEN_MANIFEST=<repo>/build/manifest.py
+#   check     Compile the modules that do not depend on device hardware for
+#             the MicroPython unix port, import them and print the import
+#             time of each (requires the `micropython` binary).
+#   all       mpy + manifest (default)
+#
+# main.py stays a plain source file on the device file system.
+#
+# Usage: python3 tools/build_firmware.py [-march armv6m] [--mpy-cross PATH] [all|mpy|manifest|check]
+
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LIB = os.path.join(ROOT, 'lib')
+BUILD = os.path.join(ROOT, 'build')
+MPY_DIR = os.path.join(BUILD, 'mpy')
+UNIX_MPY_DIR = os.path.join(BUILD, 'mpy-unix')
+
+# Modules that can be imported without machine/framebuf (unix port check)
+HOST_MODULES = ('bootprof', 'clockdata', 'metrics', 'tracebuf', 'drivers.fbdiff', 'gui.core.binfont', 'gui.core.draw', 'gui.core.glyphblit', 'gui.core.layout', 'gui.core.scene', 'gui.widgets.clockface', 'gui.fonts.arial_50', 'gui.fonts.freesans20')
+
+
+def sources():
+    for dirpath, dirnames, filenames in os.walk(LIB):
+        dirnames.sort()
+        dirnames[:] = [d for d in dirnames if d != '__pycache__']
+        for name in sorted(filenames):
+            yield os.path.relpath(os.path.join(dirpath, name), LIB)
+
+
+def compile_module(args, rel, out_dir, march=None):
+    src = os.path.join(LIB, rel)
+    dst = os.path.join(out_dir, rel[:-3] + '.mpy')
+    os.makedirs(os.path.dirname(dst), exist_ok=True)
+    cmd = [args.mpy_cross, '-s', rel, '-o', dst, src]
+    if march:
+        cmd.insert(1, '-march=' + march)
+    try:
+        res = subprocess.run(cmd, capture_output=True, text=True)
+    except FileNotFoundError:
+        sys.exit('{} not found (pip install mpy-cross or build it from the MicroPython sources)'.format(args.mpy_cross))
+    if res.returncode:
+        sys.exit('mpy-cross failed for {}:\n{}'.format(rel, res.stderr))
+    return src, dst
+
+
+def build_mpy(args):
+    if os.path.isdir(MPY_DIR):
+        shutil.rmtree(MPY_DIR)
+    count = 0
+    for rel in sources():
+        if rel.endswith('.py'):
+            src, dst = compile_module(args, rel, MPY_DIR, args.march)
+            print('{:<40s} {:7d} -> {:7d} bytes'.format(rel, os.path.getsize(src), os.path.getsize(dst)))
+            count += 1
+        elif rel.endswith('.mpy'):  # Already precompiled (e.g. framebuf_utils.mpy)
+            dst = os.path.join(MPY_DIR, rel)
+            os.makedirs(os.path.dirname(dst), exist_ok=True)
+            shutil.copyfile(os.path.join(LIB, rel), dst)
+    print('Compiled {} modules to {}'.format(count, os.path.relpath(MPY_DIR, ROOT)))
+
+
+def build_manifest(args):
+    os.makedirs(BUILD, exist_ok=True)
+    path = os.path.join(BUILD, 'manifest.py')
+    with open(path, 'w') as f:
+        f.write('# Generated by tools/build_firmware.py, do not edit\n')
+        f.write('include("$(PORT_DIR)/boards/manifest.py")\n\n')
+        for rel in sources():
+            if rel.endswith('.py'):
+                f.write('module({!r}, base_path={!r})\n'.format(rel.replace(os.sep, '/'), LIB))
+    print('Wrote {}'.format(os.path.relpath(path, ROOT)))
+
+
+def check(args):
+    # Compiled without -march: the unix port rejects .mpy files tagged for another architecture
+    for mod in HOST_MODULES:
+        compile_module(args, mod.replace('.', os.sep) + '.py', UNIX_MPY_DIR)
+        code = ('import sys, utime\n'
+                'sys.path.insert(0, {!r})\n'
+                't = utime.ticks_us()\n'
+                'import {}\n'
+                'print(utime.ticks_diff(utime.ticks_us(), t))\n').format(UNIX_MPY_DIR, mod)
+        try:
+            res = subprocess.run([args.micropython, '-c', code], capture_output=True, text=True)
+        except FileNotFoundError:
+            sys.exit('{} not found (build ports/unix of MicroPython)'.format(args.micropython))
+        if res.returncode:
+            sys.exit('Import of {} failed:\n{}'.format(mod, res.stderr or res.stdout))
+        print('{:<40s} {:>8s}us'.format(mod, res.stdout.strip()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build precompiled/frozen clock modules.')
+    parser.add_argument('step', nargs='?', default='all', choices=('all', 'mpy', 'manifest', 'check'))
+    parser.add_argument('-march', default='armv6m', help='mpy-cross target architecture (RP2040: armv6m)')
+    parser.add_argument('--mpy-cross', default='mpy-cross', help='mpy-cross executable')
+    parser.add_argument('--micropython', default='micropython', help='unix port executable for the check step')
+    args = parser.parse_args()
+
+    if args.step in ('all', 'mpy'):
+        build_mpy(args)
+    if args.step in ('all', 'manifest'):
+        build_manifest(args)
+    if args.step == 'check':
+        check(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+# font_to_bin.py Convert a font_to_py module to the binary font container
+
+# Copyright (c) Christof Rath 2021
+# Released under the MIT license see LICENSE
+
+# Writes the container read by lib/gui/core/binfont.py, either as a binary file
+# (load with BinFont('/fonts/freesans20.bin')) or as a Python module holding
+# the bytes, to be frozen into the firmware so the glyphs stay in flash:
+#
+#   from gui.fonts.freesans20_bin import DATA
+#   font = BinFont(DATA)
+#
+# --compress stores the glyphs row delta + PackBits encoded (about 1/3 smaller
+# for the large digits, decoded on rendering).
+#
+# Usage: python3 tools/font_to_bin.py [--compress] lib/gui/fonts/freesans20.py out.bin
+#        python3 tools/font_to_bin.py lib/gui/fonts/freesans20.py lib/gui/fonts/freesans20_bin.py
+
+import argparse
+import importlib.util
+import os
+import struct
+import sys
+
+MAGIC = b'FNT1'
+HEADER = '<4sBBBBHHHH'  # 16 bytes, see binfont.py
+FLAG_HMAP = 1
+FLAG_REVERSE = 2
+FLAG_MONOSPACED = 4
+FLAG_PACKBITS = 8
+
+
+def load_module(path):
+    name = os.path.splitext(os.path.basename(path))[0]
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def packbits(data):
+    # PackBits: n < 128 -> n + 1 literal bytes follow, n > 128 -> next byte 257 - n times
+    out = bytearray()
+    i = 0
+    while i < len(data):
+        j = i + 1
+        while j < len(data) and j - i < 128 and data[j] == data[i]:
+            j += 1
+        if j - i >= 2:
+            out += bytes((257 - (j - i), data[i]))
+            i = j
+            continue
+        j = i + 1  # Literals up to the next repeated pair
+        while j < len(data) and j - i < 128 and not (j + 1 < len(data) and data[j] == data[j + 1]):
+            j += 1
+        out.append(j - i - 1)
+        out += data[i:j]
+        i = j
+    return bytes(out)
+
+
+def compress(glyph, height):
+    # XOR each row with the row above, then PackBits over the whole glyph
+    glyph = bytes(glyph)
+    bpr = len(glyph) // height
+    delta = bytes(b ^ (glyph[i - bpr] if i >= bpr else 0) for i, b in enumerate(glyph))
+    return packbits(delta)
+
+
+def pack(font, compressed=False):
+    # Container bytes for a font_to_py module (or anything with its functions)
+    min_ch, max_ch = font.min_ch(), font.max_ch()
+    chars = [chr(c) for c in range(min_ch, max_ch + 1)] + [chr(max_ch + 1)]  # Last: default glyph
+    glyphs = [font.get_ch(ch) for ch in chars]
+    n = len(glyphs)
+    height = font.height()
+    flags = (FLAG_HMAP if font.hmap() else 0) | (FLAG_REVERSE if font.reverse() else 0) \
+        | (FLAG_MONOSPACED if font.monospaced() else 0) | (FLAG_PACKBITS if compressed else 0)
+    baseline = font.baseline() if hasattr(font, 'baseline') else height
+
+    header = struct.pack(HEADER, MAGIC, flags, height, font.max_width(), baseline, min_ch, max_ch, n, 0)
+    widths = bytes(g[2] for g in glyphs)
+    widths += bytes(-len(widths) % 4)  # Offsets start 4 byte aligned
+    pos = len(header) + len(widths) + 4 * n
+    offsets = []
+    data = bytearray()
+    stored = {}  # Glyph bytes -> offset, chars missing from the charset share the default glyph
+    for glyph, h, w in glyphs:
+        if h != height:
+            raise ValueError('Glyph height {} differs from the font height {}'.format(h, height))
+        glyph = compress(glyph, height) if compressed else bytes(glyph)
+        if glyph not in stored:
+            stored[glyph] = pos + len(data)
+            data += glyph
+        offsets.append(stored[glyph])
+    return header + widths + struct.pack('<{}I'.format(n), *offsets) + bytes(data)
+
+
+def to_module(blob, source):
+    lines = ['# Code generated by tools/font_to_bin.py from {}'.format(os.path.basename(source)),
+             '# Binary font container, load with gui.core.binfont.BinFont(DATA)', '', 'DATA =\\']
+    rows = ["b'" + ''.join('\\x{:02x}'.format(b) for b in blob[i:i + 16]) + "'" for i in range(0, len(blob), 16)]
+    lines.append('\\\n'.join(rows))
+    lines.append('')
+    return '\n'.join(lines)
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description='Convert a font_to_py module to a binary font container.')
+    parser.add_argument('font', help='font_to_py module (.py)')
+    parser.add_argument('out', help='output: .bin for a binary file, .py for a module with the bytes')
+    parser.add_argument('--compress', action='store_true', help='row delta + PackBits encoded glyphs')
+    args = parser.parse_args(argv)
+
+    font = load_module(args.font)
+    blob = pack(font, args.compress)
+    if args.out.endswith('.py'):
+        with open(args.out, 'w') as f:
+            f.write(to_module(blob, args.font))
+    else:
+        with open(args.out, 'wb') as f:
+            f.write(blob)
+    print('{}: {} glyphs, {} bytes'.format(args.out, blob[12] | blob[13] << 8, len(blob)))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
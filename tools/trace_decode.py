@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# trace_decode.py Render a tracebuf dump as a timeline
+
+# Copyright (c) Christof Rath 2021
+# Released under the MIT license see LICENSE
+
+# Input is either the binary file written by tracebuf.dump() or the hex lines
+# printed by tracebuf.print_hex() (copied from the REPL into a text file).
+#
+# Usage: python3 tools/trace_decode.py trace.bin [--abs]
+
+import argparse
+import binascii
+import struct
+import sys
+
+KINDS = {1: 'event', 2: 'state', 3: 'timeout', 4: 'countdown', 5: 'show'}
+BUSY = 0x80
+UNKNOWN_STATE = 0xFF
+TICKS_PERIOD = 1 << 30  # ticks_us wraps at 2**30 on the RP2040
+
+# Rotary event types (rotary.Event)
+EVENT_TYPES = {0: 'None', 1: 'ROT_INC', 2: 'ROT_DEC', 4: 'BTN_UP', 8: 'BTN_DOWN', 16: 'BTN_CLICK',
+               32: 'BTN_DBL_CLICK', 64: 'BTN_TRBL_CLICK', 128: 'BTN_LONG_CLICK'}
+
+
+def load(path):
+    with open(path, 'rb') as f:
+        data = f.read()
+    if not data.startswith(b'TRC1'):
+        data = binascii.unhexlify(b''.join(data.split()))  # print_hex() output
+    if not data.startswith(b'TRC1'):
+        raise ValueError('{} is not a trace dump'.format(path))
+    return data
+
+
+def decode(data):
+    capacity, head, n, n_states = struct.unpack_from('<HHHB', data, 4)
+    pos = 11
+    names = []
+    for _ in range(n_states):
+        size = data[pos]
+        names.append(data[pos + 1:pos + 1 + size].decode())
+        pos += 1 + size
+    ticks = struct.unpack_from('<{}L'.format(capacity), data, pos)
+    pos += 4 * capacity
+    args = struct.unpack_from('<{}H'.format(capacity), data, pos)
+    pos += 2 * capacity
+    kinds = data[pos:pos + capacity]
+    froms = data[pos + capacity:pos + 2 * capacity]
+    tos = data[pos + 2 * capacity:pos + 3 * capacity]
+
+    def state(sid):
+        return names[sid] if sid < len(names) else '?' if sid == UNKNOWN_STATE else '#{}'.format(sid)
+
+    records = []
+    first = (head - n) % capacity  # Oldest record
+    for k in range(n):
+        i = (first + k) % capacity
+        records.append({
+            'ticks_us': ticks[i],
+            'kind': KINDS.get(kinds[i] & ~BUSY, str(kinds[i] & ~BUSY)),
+            'busy': bool(kinds[i] & BUSY),
+            'from': state(froms[i]),
+            'to': state(tos[i]),
+            'arg': args[i],
+        })
+    return records
+
+
+def describe(r):
+    kind = r['kind']
+    if kind == 'event':
+        return '{:<16s} {} -> {}'.format(EVENT_TYPES.get(r['arg'], str(r['arg'])), r['from'], r['to'])
+    if kind == 'state':
+        return '{} -> {}{}'.format(r['from'], r['to'], '  (update display)' if r['arg'] else '')
+    if kind == 'timeout':
+        return '{} -> {}'.format(r['from'], r['to'])
+    if kind == 'countdown' and r['to'] == 'TimerAlarm':
+        return 'T{} finished ({})'.format(r['arg'], r['from'])
+    if kind == 'countdown':
+        return '{:02d}:{:02d} left'.format(r['arg'] // 60, r['arg'] % 60)
+    if kind == 'show':
+        return r['to']
+    return 'arg={}'.format(r['arg'])
+
+
+def render(records, absolute=False, out=sys.stdout):
+    if not records:
+        print('Trace is empty', file=out)
+        return
+    t = 0
+    prev = records[0]['ticks_us']
+    print('{:>12s} {:>10s} {:<9s} {:<4s} {}'.format('t ms', 'delta ms', 'kind', 'epd', 'details'), file=out)
+    for r in records:
+        dt = (r['ticks_us'] - prev) % TICKS_PERIOD
+        t += dt
+        prev = r['ticks_us']
+        print('{:12.3f} {:+10.3f} {:<9s} {:<4s} {}'.format(
+            (r['ticks_us'] if absolute else t) / 1000, dt / 1000, r['kind'],
+            'busy' if r['busy'] else 'idle', describe(r)), file=out)
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description='Render a tracebuf dump as a timeline.')
+    parser.add_argument('dump', help='file written by tracebuf.dump() or hex lines of tracebuf.print_hex()')
+    parser.add_argument('--abs', action='store_true', help='show raw ticks_ms instead of time since the first record')
+    args = parser.parse_args(argv)
+    render(decode(load(args.dump)), args.abs)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])